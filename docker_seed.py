@@ -114,29 +114,36 @@ def load_data_via_api():
         print(f"❌ {e}")
         return False
     
-    # Carregar dados via API
+    # Carregar dados via API em blocos (POST /imoveis/bulk: um insert_many e um evento de indexação por bloco)
     success_count = 0
     error_count = 0
+    bloco = int(os.environ.get("SEED_BULK_SIZE", "1000"))
     
-    for i, imovel in enumerate(imoveis, 1):
+    for inicio in range(0, len(imoveis), bloco):
+        lote = imoveis[inicio:inicio + bloco]
         try:
             response = requests.post(
-                "http://localhost:8001/imoveis/",
-                json=imovel,
-                timeout=10
+                "http://localhost:8001/imoveis/bulk",
+                json=lote,
+                timeout=120
             )
             
-            if response.status_code in [200, 201]:
-                success_count += 1
-                if i % 20 == 0:  # Log a cada 20 imóveis
-                    print(f"📈 Processados: {i}/{len(imoveis)}")
+            if response.status_code == 200:
+                resultado = response.json()
+                for item in resultado["items"]:
+                    if item["status"] == "created":
+                        success_count += 1
+                    else:
+                        error_count += 1
+                        print(f"⚠️  Erro no imóvel {inicio + item['index'] + 1}: {item.get('error', item['status'])}")
+                print(f"📈 Processados: {inicio + len(lote)}/{len(imoveis)}")
             else:
-                error_count += 1
-                print(f"⚠️  Erro no imóvel {i}: {response.status_code}")
+                error_count += len(lote)
+                print(f"⚠️  Erro no bloco {inicio + 1}-{inicio + len(lote)}: {response.status_code}")
                 
         except requests.exceptions.RequestException as e:
-            error_count += 1
-            print(f"❌ Erro na requisição {i}: {e}")
+            error_count += len(lote)
+            print(f"❌ Erro na requisição do bloco {inicio + 1}-{inicio + len(lote)}: {e}")
     
     print(f"\n🎉 Processamento concluído!")
     print(f"✅ Sucessos: {success_count}")
@@ -0,0 +1,127 @@
+import sys
+import os
+import time
+
+# app/ ao path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../src')))
+
+from bson import json_util
+from pymongo.errors import OperationFailure
+from app.services.event_log import coalesce_changes, CHANGE_OPERATIONS
+from app.config import (
+    SEARCH_INDEX_VERSION_KEY, INTEGRADOR_BATCH_SIZE, INTEGRADOR_FLUSH_INTERVAL_MS, CHANGE_STREAM_TOKEN_KEY
+)
+from indexador import Indexador
+
+# Só os campos usados pelo integrador: o estado atual do imóvel é lido em lote pelo Indexador
+CHANGE_STREAM_PIPELINE = [
+    {"$match": {"operationType": {"$in": list(CHANGE_OPERATIONS) + ["invalidate"]}}},
+    {"$project": {"operationType": 1, "documentKey": 1}}
+]
+# Resume token fora do oplog (ChangeStreamHistoryLost) ou não encontrado: não dá para retomar
+RESUME_ERROR_CODES = (280, 286)
+# Espera antes de reabrir o change stream depois de um erro
+RETRY_SECONDS = 5
+
+
+class ChangeStreamIndexer:
+    """
+    Modo change stream do integrador: acompanha o change stream do MongoDB na collection imoveis,
+    então toda escrita é indexada (API, seed.py, edições manuais, delete_all_imoveis), não só as que publicam eventos.
+    As alterações passam pelo mesmo pipeline do listener: micro-lotes coalescidos por documento aplicados pelo Indexador.
+    O resume token é gravado no Redis depois de cada lote aplicado; ao reiniciar, o stream retoma desse ponto.
+    Sem token (primeira execução) ou com o token fora do oplog, faz um sync incremental (content_hash) e segue dali.
+    Requer o MongoDB em replica set.
+    """
+    def __init__(self, batch_size: int = INTEGRADOR_BATCH_SIZE, flush_interval_ms: int = INTEGRADOR_FLUSH_INTERVAL_MS):
+        self.indexador = Indexador()
+        self.collection = self.indexador.mongo.collection
+        self.redis = self.indexador.mongo.redis
+        self.batch_size = batch_size
+        self.flush_interval_ms = flush_interval_ms
+        self.stopping = False
+
+    def stop(self, *_):
+        """Termina o lote atual e sai do loop (SIGTERM/SIGINT)"""
+        self.stopping = True
+
+    def load_token(self):
+        token = self.redis.get(CHANGE_STREAM_TOKEN_KEY)
+        return json_util.loads(token) if token else None
+
+    def save_token(self, token):
+        if token is not None:
+            self.redis.set(CHANGE_STREAM_TOKEN_KEY, json_util.dumps(token))
+
+    def listen(self):
+        print(f"⏳ Acompanhando o change stream de {self.collection.full_name}...")
+        while not self.stopping:
+            try:
+                self._watch(self.load_token())
+            except OperationFailure as e:
+                if e.code not in RESUME_ERROR_CODES:
+                    raise
+                print(f"⚠️ Não foi possível retomar o change stream ({e}); ressincronizando")
+                self.redis.delete(CHANGE_STREAM_TOKEN_KEY)
+            except Exception as e:
+                # Sem gravar o token: o lote que falhou é reentregue ao reabrir o stream
+                print(f"❌ Erro no change stream: {e}; reabrindo em {RETRY_SECONDS}s")
+                time.sleep(RETRY_SECONDS)
+
+    def _watch(self, token):
+        # start_after (e não resume_after) também retoma depois de um invalidate (drop/rename da collection)
+        with self.collection.watch(
+            CHANGE_STREAM_PIPELINE, start_after=token, batch_size=self.batch_size,
+            max_await_time_ms=self.flush_interval_ms
+        ) as stream:
+            if token is None:
+                # Alterações feitas durante o sync são lidas depois dele a partir deste token (reaplicar é idempotente)
+                inicio = stream.resume_token
+                self.resync()
+                self.save_token(inicio)
+            while stream.alive and not self.stopping:
+                lote = self.next_batch(stream)
+                self.process_batch(lote)
+                if stream.resume_token != token:
+                    token = stream.resume_token
+                    self.save_token(token)
+
+    def next_batch(self, stream):
+        """Junta até batch_size alterações chegadas em até flush_interval_ms a partir da primeira"""
+        lote = []
+        deadline = None
+        while len(lote) < self.batch_size and not self.stopping:
+            change = stream.try_next()
+            if change is None:
+                if not lote or time.monotonic() >= deadline:
+                    break
+                continue
+            if not lote:
+                deadline = time.monotonic() + self.flush_interval_ms / 1000
+            lote.append(change)
+            if time.monotonic() >= deadline:
+                break
+        return lote
+
+    def process_batch(self, lote):
+        """Aplica o lote coalescido; uma exceção aqui impede que o resume token avance"""
+        if not lote:
+            return
+        inicio = time.perf_counter()
+        plano = coalesce_changes(lote)
+        # Updates que não mexem no texto indexado (ex.: atributos gravados pelo sync) não geram embeddings
+        self.indexador.apply(plano, skip_unchanged=True)
+        # O ChromaDB mudou: invalida as buscas em cache na API
+        self.redis.incr(SEARCH_INDEX_VERSION_KEY)
+        print(
+            f"📦 Lote de {len(lote)} alterações: {len(plano['upsert'])} upserts, {len(plano['delete'])} deletes"
+            f"{', clear' if plano['clear'] else ''} em {(time.perf_counter() - inicio) * 1000:.0f} ms"
+        )
+
+    def resync(self):
+        """Sync incremental MongoDB -> ChromaDB: só reindexa o que mudou e remove o que não existe mais"""
+        print("🔄 Sincronizando o ChromaDB com o MongoDB antes de seguir o change stream...")
+        stats = self.indexador.indexing_service.sync_from_mongo(self.indexador.mongo)
+        self.redis.incr(SEARCH_INDEX_VERSION_KEY)
+        print(f"✅ Sync concluído: {stats['synced']} indexados, {stats['unchanged']} inalterados, "
+              f"{stats['deleted']} removidos")
@@ -0,0 +1,56 @@
+import sys
+import os
+
+# app/ ao path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../src')))
+
+from app.repositories.chroma_repository import ChromaRepository
+from app.services.indexing_service import IndexingService
+from app.database import get_mongo_repo, init_embedding_service
+from app.models import ImovelInDB
+
+
+class Indexador:
+    """
+    Aplica no ChromaDB um plano já coalescido (ver coalesce_events): usado pelo listener e por cada worker do pool.
+    Usa os mesmos componentes da API e do worker de jobs (EmbeddingService configurado em database.py
+    e IndexingService.build_document/build_metadata), então os vetores não dependem do caminho de indexação.
+    """
+    def __init__(self):
+        self.mongo = get_mongo_repo()
+
+        chroma_path = os.getenv("CHROMA_PATH", "./chroma_db")
+        self.chroma = ChromaRepository(chroma_path)
+
+        # Carrega e aquece o modelo uma vez por processo
+        self.embedding_service = init_embedding_service()
+        self.indexing_service = IndexingService(embedding_service=self.embedding_service, chroma_repo=self.chroma)
+
+    def apply(self, plano, skip_unchanged: bool = False):
+        """
+        Um clear, um delete em lote e um encode + upsert em lote com o estado atual dos imóveis no MongoDB.
+        skip_unchanged=True só gera embeddings dos imóveis cujo content_hash mudou (ex.: updates só de atributos).
+        """
+        if plano.get("clear"):
+            self.chroma.clear()
+        if plano["delete"]:
+            self.chroma.delete_documents(plano["delete"])
+        if plano["upsert"]:
+            imoveis = self.mongo.get_imoveis_by_ids(plano["upsert"])
+            pendentes = [ImovelInDB(**imovel) for imovel in imoveis]
+            if skip_unchanged:
+                pendentes = self.indexing_service.changed_imoveis(pendentes)
+            self.indexing_service.upsert_imoveis(pendentes)
+            # Removidos do MongoDB depois do evento: o delete correspondente pode estar em outro lote
+            encontrados = {imovel["id"] for imovel in imoveis}
+            self.chroma.delete_documents([item_id for item_id in plano["upsert"] if item_id not in encontrados])
+
+    def apply_each(self, planos):
+        """Aplica [(entry_id, plano)] um a um, isolando as entradas com problema; retorna {entry_id: erro} das que falharam"""
+        falhas = {}
+        for entry_id, plano in planos:
+            try:
+                self.apply(plano)
+            except Exception as e:
+                falhas[entry_id] = str(e)
+        return falhas
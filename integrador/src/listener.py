@@ -1,55 +1,131 @@
+from abc import ABC, abstractmethod
 import redis
-import json
+import socket
 import sys
 import os
+import time
 
 # app/ ao path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../src')))
 
-from app.repositories.mongo_repository import MongoRepository
-from app.repositories.chroma_repository import ChromaRepository
+from app.services.event_log import EventLog, parse_event, coalesce_events
+from app.config import SEARCH_INDEX_VERSION_KEY, INTEGRADOR_BATCH_SIZE, INTEGRADOR_FLUSH_INTERVAL_MS
+from indexador import Indexador
 
 
-class RedisListener:
-    def __init__(self):
+class StreamConsumer(ABC):
+    """
+    Leitura do stream de eventos dos imóveis (EventLog) pelo consumer group do integrador.
+    Várias réplicas podem rodar com nomes de consumidor diferentes: o Redis distribui as entradas
+    entre elas, e cada evento só é confirmado (XACK) depois de aplicado no ChromaDB.
+    As subclasses definem process_batch.
+    """
+    def __init__(self, consumer_name: str = None, batch_size: int = INTEGRADOR_BATCH_SIZE,
+                 flush_interval_ms: int = INTEGRADOR_FLUSH_INTERVAL_MS):
         redis_url = os.getenv("REDIS_URL", "redis://localhost:6379")
         redis_host = redis_url.split("://")[1].split(":")[0]
         redis_port = int(redis_url.split(":")[-1])
         
         self.redis = redis.Redis(host=redis_host, port=redis_port, decode_responses=True)
-        self.pubsub = self.redis.pubsub()
-        self.pubsub.subscribe('imoveis.create', 'imoveis.update', 'imoveis.delete')
-
-        MONGO_URI = os.getenv("MONGO_CONNECTION_STRING", "mongodb://localhost:27017/")
-        MONGO_DB_NAME = os.getenv("MONGO_DATABASE_NAME", "spd_imoveis")
-        self.mongo = MongoRepository(MONGO_URI, MONGO_DB_NAME)
-        
-        chroma_path = os.getenv("CHROMA_PATH", "./chroma_db")
-        self.chroma = ChromaRepository(chroma_path)
+        self.events = EventLog(self.redis)
+        # Nome estável por réplica: ao reiniciar, ela retoma as próprias entregas sem ack
+        self.consumer = consumer_name or os.getenv("INTEGRADOR_CONSUMER_NAME", socket.gethostname())
+        self.batch_size = batch_size
+        self.flush_interval_ms = flush_interval_ms
+        self.stopping = False
 
     def listen(self):
-        print("⏳ Aguardando eventos Redis...")
-        for message in self.pubsub.listen():
-            if message['type'] != 'message':
-                continue
+        self.events.ensure_group()
+        replay_from = os.getenv("INTEGRADOR_REPLAY_FROM")
+        if replay_from:
+            # Reprocessa o histórico retido no stream a partir desse id ("0" = desde o início), uma vez por id
+            if self.events.replay_from(replay_from):
+                print(f"⏪ Reprocessando eventos a partir de {replay_from}")
+            else:
+                print(f"⏭️ Replay a partir de {replay_from} já aplicado; ignorando INTEGRADOR_REPLAY_FROM")
 
-            channel = message['channel']
-            data = json.loads(message['data'])
-            imovel_id = data.get('_id')
-            print(f"📩 Evento recebido: {channel} com ID {imovel_id}")
+        print(f"⏳ Aguardando eventos no stream {self.events.stream} (consumidor {self.consumer})...")
+        self.process_batch(self.events.read_pending(self.consumer, count=self.batch_size))
+        while not self.stopping:
+            self.process_batch(self.next_batch())
 
+    def stop(self, *_):
+        """Termina o lote atual e sai do loop (SIGTERM/SIGINT)"""
+        self.stopping = True
+
+    def next_batch(self):
+        """
+        Junta até batch_size entradas: espera a primeira e, a partir dela, acumula
+        as que chegarem dentro de flush_interval_ms (como o QueryBatcher da API)
+        """
+        batch = self.events.claim_stale(self.consumer, count=self.batch_size, in_flight=self.in_flight())
+        if not batch:
+            batch = self.events.read(self.consumer, count=self.batch_size, block_ms=1000)
+        deadline = time.monotonic() + self.flush_interval_ms / 1000
+        while batch and len(batch) < self.batch_size:
+            restante_ms = int((deadline - time.monotonic()) * 1000)
+            if restante_ms <= 0:
+                break
+            batch += self.events.read(self.consumer, count=self.batch_size - len(batch), block_ms=restante_ms)
+        return batch
+
+    def parse_entries(self, entries):
+        """(entry_id, campos, ação, IDs) de cada entrada; as que não podem ser lidas vão direto para o dead letter"""
+        lidas = []
+        for entry_id, campos in entries:
             try:
-                self.process_event(channel, data, imovel_id)
-            except Exception as e:
-                print(f"❌ Erro ao processar evento: {e}")
-
-
-    def process_event(self, channel, data, imovel_id):
-        if 'create' in channel:
-            self.chroma.add_documents([imovel_id], [data['descricao']], [data])
-        elif 'update' in channel:
-            self.chroma.update_document(imovel_id, data['descricao'], data)
-        elif 'delete' in channel:
-            self.chroma.delete_document(imovel_id)
-        else:
-            print(f"⚠️ Evento desconhecido: {channel}")
+                acao, ids = parse_event(campos)
+            except (ValueError, TypeError) as e:
+                # Reentregar não adianta: sem isso ela voltaria a cada reinício (read_pending)
+                self.events.dead_letter(entry_id, campos, error=str(e))
+                continue
+            lidas.append((entry_id, campos, acao, ids))
+        return lidas
+
+    def in_flight(self):
+        """Entradas já lidas e ainda em processamento: claim_stale não as reassume"""
+        return ()
+
+    @abstractmethod
+    def process_batch(self, entries):
+        """Aplica um lote de entradas (entry_id, campos) e confirma as que terminaram"""
+
+
+class RedisListener(StreamConsumer):
+    """Processo único: os eventos são aplicados em micro-lotes coalescidos por documento (ver coalesce_events)"""
+    def __init__(self, consumer_name: str = None, batch_size: int = INTEGRADOR_BATCH_SIZE,
+                 flush_interval_ms: int = INTEGRADOR_FLUSH_INTERVAL_MS):
+        super().__init__(consumer_name, batch_size, flush_interval_ms)
+        self.indexador = Indexador()
+
+    def process_batch(self, entries):
+        """
+        Aplica o lote já coalescido por documento e confirma todas as entradas de uma vez.
+        Se o lote falhar, reaplica entrada por entrada: só as que falham de novo ficam sem ack e voltam
+        por claim_stale (até EVENTS_MAX_DELIVERIES), sem levar junto as entradas válidas do lote.
+        """
+        lidas = self.parse_entries(entries)
+        if not lidas:
+            return
+        inicio = time.perf_counter()
+        plano = coalesce_events([campos for _, campos, _, _ in lidas])
+        try:
+            self.indexador.apply(plano)
+            falhas = {}
+        except Exception as e:
+            print(f"❌ Erro ao processar lote de {len(lidas)} eventos: {e}; reaplicando um a um")
+            falhas = self.indexador.apply_each([
+                (entry_id, coalesce_events([campos])) for entry_id, campos, _, _ in lidas
+            ])
+            for entry_id, erro in falhas.items():
+                print(f"❌ Evento {entry_id} continua falhando: {erro}")
+
+        aplicadas = [entry_id for entry_id, _, _, _ in lidas if entry_id not in falhas]
+        if aplicadas:
+            # O ChromaDB mudou: invalida as buscas em cache na API
+            self.redis.incr(SEARCH_INDEX_VERSION_KEY)
+            self.events.ack(aplicadas)
+        print(
+            f"📦 Lote de {len(lidas)} eventos: {len(plano['upsert'])} upserts, {len(plano['delete'])} deletes"
+            f"{', clear' if plano['clear'] else ''}, {len(falhas)} sem ack em {(time.perf_counter() - inicio) * 1000:.0f} ms"
+        )
@@ -1,5 +1,26 @@
-from listener import RedisListener
+import signal
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../src')))
+
+from app.config import INTEGRADOR_WORKERS, INTEGRADOR_SOURCE
 
 if __name__ == '__main__':
-    listener = RedisListener()
-    listener.listen()
+    if INTEGRADOR_SOURCE == "changestream":
+        # Change stream do MongoDB em vez do stream de eventos da API (processo único)
+        from change_stream import ChangeStreamIndexer
+        indexer = ChangeStreamIndexer()
+        signal.signal(signal.SIGTERM, indexer.stop)
+        signal.signal(signal.SIGINT, indexer.stop)
+        indexer.listen()
+    elif INTEGRADOR_WORKERS > 1:
+        # Vários processos, cada um com o seu modelo; eventos distribuídos por hash do _id
+        from worker_pool import ShardedDispatcher
+        ShardedDispatcher(workers=INTEGRADOR_WORKERS).listen()
+    else:
+        from listener import RedisListener
+        listener = RedisListener()
+        signal.signal(signal.SIGTERM, listener.stop)
+        signal.signal(signal.SIGINT, listener.stop)
+        listener.listen()
@@ -0,0 +1,260 @@
+import multiprocessing
+import queue
+import signal
+import sys
+import os
+import time
+
+# app/ ao path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../src')))
+
+from app.services.event_log import coalesce_actions, shard_for, ACTION_UPSERT, ACTION_DELETE, ACTION_CLEAR
+from app.repositories.chroma_repository import ChromaRepository
+from app.config import (
+    SEARCH_INDEX_VERSION_KEY, INTEGRADOR_BATCH_SIZE, INTEGRADOR_FLUSH_INTERVAL_MS, INTEGRADOR_WORKERS,
+    INTEGRADOR_QUEUE_SIZE
+)
+from listener import StreamConsumer
+
+# Intervalo entre publicações das métricas dos workers no Redis
+METRICS_INTERVAL_SECONDS = 5
+
+
+def _worker_main(indice: int, fila, resultados, batch_size: int):
+    """
+    Processo worker: carrega o próprio modelo e aplica, em ordem, os lotes da sua fila.
+    Lotes já enfileirados são juntados (até batch_size ações) e coalescidos antes de aplicar.
+    """
+    # Ctrl+C chega a todo o grupo de processos: quem coordena o desligamento é o dispatcher
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    from indexador import Indexador
+    indexador = Indexador()
+
+    encerrar = False
+    while not encerrar:
+        mensagem = fila.get()
+        if mensagem is None:
+            break
+        mensagens = [mensagem]
+        while sum(len(itens) for _, itens in mensagens) < batch_size:
+            try:
+                proxima = fila.get_nowait()
+            except queue.Empty:
+                break
+            if proxima is None:
+                encerrar = True
+                break
+            mensagens.append(proxima)
+
+        inicio = time.perf_counter()
+        itens = [item for _, itens_mensagem in mensagens for item in itens_mensagem]
+        entry_ids = list(dict.fromkeys(entry_id for entry_id, _, _ in itens))
+        try:
+            indexador.apply(coalesce_actions([(acao, item_id) for _, acao, item_id in itens]))
+            falhas = {}
+        except Exception:
+            # Reaplica entrada por entrada: só as que falham de novo ficam sem ack
+            por_entrada = {}
+            for entry_id, acao, item_id in itens:
+                por_entrada.setdefault(entry_id, []).append((acao, item_id))
+            falhas = indexador.apply_each([
+                (entry_id, coalesce_actions(acoes)) for entry_id, acoes in por_entrada.items()
+            ])
+        resultados.put((indice, entry_ids, falhas, {
+            "actions": len(itens),
+            "batch_ms": (time.perf_counter() - inicio) * 1000,
+            # Tempo desde que o lote mais antigo foi enfileirado pelo dispatcher
+            "lag_ms": (time.time() - mensagens[0][0]) * 1000
+        }))
+
+
+class ShardedDispatcher(StreamConsumer):
+    """
+    Modo pool do integrador: um dispatcher lê o stream e distribui as ações por hash do _id
+    (shard_for) entre N processos worker, cada um com a sua cópia do modelo.
+    Todas as ações de um documento caem sempre no mesmo worker, e cada worker consome a sua fila
+    em ordem, então a ordem por documento é preservada. Uma entrada do stream só recebe ack
+    quando todos os workers envolvidos terminaram a sua parte sem erro.
+    Filas limitadas (INTEGRADOR_QUEUE_SIZE) fazem o dispatcher parar de ler quando os workers atrasam.
+    """
+    def __init__(self, workers: int = INTEGRADOR_WORKERS, queue_size: int = INTEGRADOR_QUEUE_SIZE,
+                 consumer_name: str = None, batch_size: int = INTEGRADOR_BATCH_SIZE,
+                 flush_interval_ms: int = INTEGRADOR_FLUSH_INTERVAL_MS):
+        super().__init__(consumer_name, batch_size, flush_interval_ms)
+        self.workers = workers
+        self.context = multiprocessing.get_context("spawn")
+        self.filas = [self.context.Queue(maxsize=queue_size) for _ in range(workers)]
+        self.resultados = self.context.Queue()
+        self.processos = [None] * workers
+        # entry_id -> {"shards": workers com ações pendentes, "ok": sem erro até agora}
+        self.pendentes = {}
+        self.metricas = [
+            {"processed": 0, "errors": 0, "batches": 0, "backpressure_waits": 0, "restarts": 0,
+             "batch_ms": 0.0, "lag_ms": 0.0}
+            for _ in range(workers)
+        ]
+        self.metricas_publicadas_em = 0.0
+        # O clear é aplicado pelo dispatcher, depois que os workers terminam o que veio antes dele
+        self.chroma = ChromaRepository(os.getenv("CHROMA_PATH", "./chroma_db"))
+
+    def _start_worker(self, indice: int):
+        processo = self.context.Process(
+            target=_worker_main, args=(indice, self.filas[indice], self.resultados, self.batch_size),
+            name=f"integrador-worker-{indice}", daemon=True
+        )
+        processo.start()
+        self.processos[indice] = processo
+
+    def listen(self):
+        for indice in range(self.workers):
+            self._start_worker(indice)
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        print(f"🧵 Pool com {self.workers} workers")
+        try:
+            super().listen()
+        finally:
+            self.shutdown()
+
+    def process_batch(self, entries):
+        """Distribui as ações do lote pelos workers; acks saem em collect_results"""
+        por_worker = {}
+        for entry_id, _, acao, ids in self.parse_entries(entries):
+            if entry_id in self.pendentes:
+                continue  # já está com um worker (ex.: relida por read_pending)
+            if acao == ACTION_CLEAR:
+                self._dispatch(por_worker)
+                por_worker = {}
+                self._clear(entry_id)
+                continue
+            if acao not in (ACTION_UPSERT, ACTION_DELETE) or not ids:
+                self.events.ack([entry_id])
+                continue
+
+            shards = set()
+            for item_id in ids:
+                shard = shard_for(item_id, self.workers)
+                por_worker.setdefault(shard, []).append((entry_id, acao, item_id))
+                shards.add(shard)
+            self.pendentes[entry_id] = {"shards": shards, "ok": True}
+
+        self._dispatch(por_worker)
+        self.collect_results()
+
+    def _dispatch(self, por_worker):
+        enviado_em = time.time()
+        for shard, itens in por_worker.items():
+            while True:
+                try:
+                    self.filas[shard].put((enviado_em, itens), timeout=0.5)
+                    break
+                except queue.Full:
+                    # Backpressure: a fila do worker está cheia; processa resultados enquanto espera
+                    self.metricas[shard]["backpressure_waits"] += 1
+                    self.collect_results(timeout=0.1)
+
+    def _clear(self, entry_id: str):
+        """Evento clear: espera os workers terminarem o que veio antes e limpa o ChromaDB uma única vez"""
+        self.drain()
+        self.chroma.clear()
+        self.redis.incr(SEARCH_INDEX_VERSION_KEY)
+        self.events.ack([entry_id])
+        print("🧹 ChromaDB limpo (evento clear)")
+
+    def collect_results(self, timeout: float = 0.0):
+        """Contabiliza os lotes concluídos pelos workers e confirma as entradas terminadas"""
+        concluidas = []
+        while True:
+            try:
+                indice, entry_ids, falhas, metricas = self.resultados.get(timeout=timeout) if timeout \
+                    else self.resultados.get_nowait()
+            except queue.Empty:
+                break
+            timeout = 0.0
+            self._record(indice, metricas, falhas)
+            for entry_id, erro in falhas.items():
+                print(f"❌ Worker {indice}: erro ao processar o evento {entry_id}: {erro}")
+            for entry_id in entry_ids:
+                pendente = self.pendentes.get(entry_id)
+                if pendente is None:
+                    continue
+                pendente["shards"].discard(indice)
+                pendente["ok"] = pendente["ok"] and entry_id not in falhas
+                if not pendente["shards"]:
+                    del self.pendentes[entry_id]
+                    if pendente["ok"]:
+                        concluidas.append(entry_id)
+                    # Com erro, fica sem ack e volta por claim_stale
+
+        if concluidas:
+            # O ChromaDB mudou: invalida as buscas em cache na API
+            self.redis.incr(SEARCH_INDEX_VERSION_KEY)
+            self.events.ack(concluidas)
+        self._check_workers()
+        self._publish_metrics()
+
+    def in_flight(self):
+        return self.pendentes
+
+    def _record(self, indice: int, metricas, falhas):
+        atual = self.metricas[indice]
+        atual["batches"] += 1
+        atual["processed"] += metricas["actions"]
+        atual["errors"] += len(falhas)
+        atual["batch_ms"] = metricas["batch_ms"]
+        atual["lag_ms"] = metricas["lag_ms"]
+
+    def _check_workers(self):
+        """Reinicia workers que morreram; as entradas que estavam com eles voltam via claim_stale"""
+        for indice, processo in enumerate(self.processos):
+            if processo is None or processo.is_alive() or self.stopping:
+                continue
+            print(f"⚠️ Worker {indice} terminou (exit code {processo.exitcode}); reiniciando")
+            for entry_id in [e for e, pendente in self.pendentes.items() if indice in pendente["shards"]]:
+                del self.pendentes[entry_id]
+            self.metricas[indice]["restarts"] += 1
+            self._start_worker(indice)
+
+    def _publish_metrics(self, force: bool = False):
+        agora = time.time()
+        if not force and agora - self.metricas_publicadas_em < METRICS_INTERVAL_SECONDS:
+            return
+        self.metricas_publicadas_em = agora
+        for indice, metricas in enumerate(self.metricas):
+            processo = self.processos[indice]
+            try:
+                profundidade = self.filas[indice].qsize()
+            except NotImplementedError:  # macOS
+                profundidade = None
+            self.events.report_worker(f"{self.consumer}:{indice}", {
+                **metricas,
+                "queue_depth": profundidade,
+                "alive": processo is not None and processo.is_alive(),
+                "updated_at": agora
+            })
+
+    def drain(self, timeout: float = None):
+        """Espera os workers concluírem todas as entradas despachadas"""
+        limite = None if timeout is None else time.monotonic() + timeout
+        while self.pendentes and (limite is None or time.monotonic() < limite):
+            self.collect_results(timeout=0.5)
+
+    def shutdown(self, timeout: float = 30.0):
+        """Desligamento gracioso: termina o que já foi despachado, confirma e encerra os workers"""
+        print("🛑 Encerrando o pool: aguardando os workers concluírem os lotes em andamento...")
+        self.stopping = True
+        self.drain(timeout)
+        for fila in self.filas:
+            try:
+                fila.put(None, timeout=1)
+            except queue.Full:
+                pass
+        for processo in self.processos:
+            if processo is None:
+                continue
+            processo.join(timeout=5)
+            if processo.is_alive():
+                processo.terminate()
+        self._publish_metrics(force=True)
+        if self.pendentes:
+            print(f"⚠️ {len(self.pendentes)} eventos sem ack; serão reentregues na próxima execução")
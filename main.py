@@ -1,7 +1,14 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Depends
 from contextlib import asynccontextmanager
-from src.app.routers import imoveis, search, corretores, cidades
+from src.app.routers import imoveis, search, corretores, cidades, jobs
 from src.app.services.ollama_health_service import OllamaHealthService
+from src.app.repositories.mongo_repository import MongoRepository
+from src.app.services.event_log import EventLog
+from src.app.database import (
+    init_embedding_service, embedding_service_status, init_connections, close_connections, close_async_connections,
+    get_mongo_repo, get_event_log
+)
+import asyncio
 import logging
 
 logger = logging.getLogger(__name__)
@@ -11,6 +18,28 @@ async def lifespan(app: FastAPI):
     # Startup
     logger.info("🚀 Iniciando SPD Imóveis API...")
     
+    # Pools de conexão compartilhados (MongoDB e Redis)
+    init_connections()
+    
+    # Índices do MongoDB (texto, atributos dos imóveis, corretores e cidades)
+    try:
+        indices = await asyncio.to_thread(get_mongo_repo().ensure_indexes)
+        for indice, erro in indices["errors"].items():
+            logger.error(f"❌ Índice {indice} não pôde ser criado: {erro}")
+        logger.info(f"✅ Índices do MongoDB verificados: {len(indices['created'])}")
+        normalizadas = await asyncio.to_thread(get_mongo_repo().normalize_cidades_estado)
+        if normalizadas:
+            logger.info(f"✅ Siglas de estado normalizadas em {normalizadas} cidades")
+    except Exception as e:
+        logger.error(f"❌ Erro ao criar índices no MongoDB: {e}")
+    
+    # Carregar e aquecer o modelo de embeddings uma única vez por processo
+    try:
+        embedding_service = await asyncio.to_thread(init_embedding_service)
+        logger.info(f"✅ Modelo de embeddings pronto: {embedding_service.model_name}")
+    except Exception as e:
+        logger.error(f"❌ Erro ao carregar modelo de embeddings: {e}")
+    
     # Verificar e iniciar Ollama se necessário
     ollama_service = OllamaHealthService()
     if not ollama_service.start_ollama_if_needed():
@@ -23,6 +52,8 @@ async def lifespan(app: FastAPI):
     
     # Shutdown
     logger.info("🛑 Finalizando SPD Imóveis API...")
+    close_connections()
+    await close_async_connections()
 
 app = FastAPI(
     title="SPD Imóveis API", 
@@ -34,6 +65,7 @@ app.include_router(imoveis.router)
 app.include_router(search.router)
 app.include_router(corretores.router)
 app.include_router(cidades.router)
+app.include_router(jobs.router)
 
 @app.get("/")
 def root():
@@ -44,3 +76,18 @@ def ollama_health():
     """Endpoint para verificar status do Ollama."""
     ollama_service = OllamaHealthService()
     return ollama_service.get_ollama_status()
+
+@app.get("/health/indexes")
+def indexes_health(mongo_repo: MongoRepository = Depends(get_mongo_repo)):
+    """Relatório dos índices do MongoDB: declarados que faltam, não declarados e sem uso."""
+    return mongo_repo.index_report()
+
+@app.get("/health/events")
+def events_health(events: EventLog = Depends(get_event_log)):
+    """Stream de eventos do integrador: tamanho, pendências sem ack e atraso (lag) do consumer group."""
+    return events.stats()
+
+@app.get("/health/embedding")
+def embedding_health():
+    """Endpoint para verificar se o modelo de embeddings está carregado e aquecido."""
+    return embedding_service_status()
@@ -0,0 +1,131 @@
+"""
+Extração de atributos tipados dos imóveis (preço, quartos, área, bairro, cidade, tipo, finalidade).
+
+O texto livre das especificações ("R$ 2.000,00", "Preço: 350000", "80m²", "3 quartos",
+"Setor Bueno, Goiânia - GO") é convertido em campos que podem ser filtrados no ChromaDB
+(where) e no MongoDB. Campos de texto são guardados normalizados (minúsculas, sem acento)
+para que o filtro não dependa de como o usuário digitou.
+"""
+from typing import Any, Dict, List, Optional
+import re
+import unicodedata
+
+# Campos extraídos; só os encontrados aparecem no resultado (ChromaDB não aceita None em metadata)
+CAMPOS_ATRIBUTOS = ["preco", "quartos", "area_m2", "bairro", "cidade", "estado", "tipo", "finalidade"]
+
+# Ordem importa: "casa de condominio" antes de "casa"
+TIPOS_IMOVEL = [
+    "casa de condominio", "apartamento", "cobertura", "kitnet", "loft", "flat", "studio", "duplex",
+    "triplex", "sobrado", "terreno", "lote", "chacara", "sala comercial", "sala", "galpao", "casa"
+]
+
+# Preço com rótulo ("Preço: R$ 1.200.000,00", "Valor 350000") tem prioridade sobre um "R$" solto
+_PRECO_ROTULO = re.compile(r"\b(?:pre[cç]o|valor)\b[^\d\n]{0,20}?(\d[\d.,]*)", re.IGNORECASE)
+_PRECO_VALOR = re.compile(r"r\$\s*(\d[\d.,]*)", re.IGNORECASE)
+# Outros valores da mesma linha ("Condomínio: R$ 450", "IPTU R$ 80", "Taxa de limpeza R$ 90") não são o preço
+_OUTROS_VALORES = re.compile(r"\b(?:condom[ií]nio|iptu|taxa\b[^\d\n$]{0,20}?)\s*:?\s*(?:r\$|\d)", re.IGNORECASE)
+_QUARTOS = re.compile(r"(\d+)\s*(?:quartos?|dormit[oó]rios?)\b", re.IGNORECASE)
+_AREA = re.compile(r"(\d+(?:[.,]\d+)?)\s*m(?:²|2)\b", re.IGNORECASE)
+_ENDERECO = re.compile(r"^\s*([^,]+?)\s*,\s*([^,-]+?)\s*-\s*([A-Za-z]{2})\s*$")
+_BAIRRO_TEXTO = re.compile(
+    r"\b(?:no|na)\s+((?:setor|jardim|parque|vila|residencial|bairro|alto|cidade|condom[ií]nio)\b[^,.\-]*)",
+    re.IGNORECASE
+)
+
+def normalizar_texto(valor: str) -> str:
+    """Minúsculas, sem acentos e com espaços colapsados (mesma regra nos dados e nos filtros)"""
+    sem_acento = unicodedata.normalize("NFKD", valor).encode("ascii", "ignore").decode("ascii")
+    return " ".join(sem_acento.lower().split())
+
+def parse_numero(texto: str) -> Optional[float]:
+    """Converte "2.000", "2,000.00", "1.234,56" ou "350000" em float"""
+    texto = texto.strip(".,")
+    if not texto:
+        return None
+    if "." in texto and "," in texto:
+        # O último separador é o decimal
+        if texto.rfind(",") > texto.rfind("."):
+            texto = texto.replace(".", "").replace(",", ".")
+        else:
+            texto = texto.replace(",", "")
+    elif "," in texto:
+        partes = texto.split(",")
+        texto = texto.replace(",", ".") if len(partes) == 2 and len(partes[1]) != 3 else texto.replace(",", "")
+    elif "." in texto:
+        partes = texto.split(".")
+        if len(partes) > 2 or len(partes[1]) == 3:
+            texto = texto.replace(".", "")
+    try:
+        return float(texto)
+    except ValueError:
+        return None
+
+def extrair_preco(textos: List[str]) -> Optional[float]:
+    """
+    Preço do imóvel: primeiro um valor rotulado (Preço/Valor); na falta dele, o primeiro "R$" de um texto
+    sem outros valores (condomínio, IPTU, taxas), que não podem ser confundidos com o preço
+    """
+    for texto in textos:
+        match = _PRECO_ROTULO.search(texto)
+        # "Valor do condomínio: R$ 450" tem rótulo, mas não é o preço
+        if match and not _OUTROS_VALORES.search(match.group(0)):
+            preco = parse_numero(match.group(1))
+            if preco:
+                return preco
+    for texto in textos:
+        if _OUTROS_VALORES.search(texto):
+            continue
+        match = _PRECO_VALOR.search(texto)
+        if match:
+            preco = parse_numero(match.group(1))
+            if preco:
+                return preco
+    return None
+
+def extrair_atributos(titulo: str, descricao: str, especificacoes: List[str]) -> Dict[str, Any]:
+    """Extrai os atributos tipados; as especificações têm prioridade sobre título e descrição"""
+    atributos: Dict[str, Any] = {}
+    textos = [e for e in especificacoes if e] + [titulo or "", descricao or ""]
+
+    preco = extrair_preco(textos)
+    if preco:
+        atributos["preco"] = preco
+
+    for texto in textos:
+        if "quartos" not in atributos:
+            match = _QUARTOS.search(texto)
+            if match:
+                atributos["quartos"] = int(match.group(1))
+        if "area_m2" not in atributos:
+            match = _AREA.search(texto)
+            if match:
+                area = parse_numero(match.group(1))
+                if area:
+                    atributos["area_m2"] = area
+
+    for especificacao in especificacoes:
+        match = _ENDERECO.match(especificacao or "")
+        if match:
+            atributos["bairro"] = normalizar_texto(match.group(1))
+            atributos["cidade"] = normalizar_texto(match.group(2))
+            atributos["estado"] = match.group(3).upper()
+            break
+
+    if "bairro" not in atributos:
+        match = _BAIRRO_TEXTO.search(titulo or "") or _BAIRRO_TEXTO.search(descricao or "")
+        if match:
+            atributos["bairro"] = normalizar_texto(match.group(1))
+
+    cabecalho = normalizar_texto(" ".join([titulo or ""] + [e for e in especificacoes[:1] if e]))
+    for tipo in TIPOS_IMOVEL:
+        if re.search(rf"\b{tipo}\b", cabecalho):
+            atributos["tipo"] = tipo
+            break
+
+    texto_completo = normalizar_texto(" ".join(textos))
+    if re.search(r"\b(aluguel|alugar|locacao)\b", texto_completo):
+        atributos["finalidade"] = "aluguel"
+    elif re.search(r"\b(venda|vender|a venda)\b", texto_completo):
+        atributos["finalidade"] = "venda"
+
+    return atributos
@@ -0,0 +1,17 @@
+from celery import Celery
+from .config import CELERY_BROKER_URL, CELERY_RESULT_BACKEND, JOB_WORKER_CONCURRENCY, JOB_RESULT_TTL_SECONDS
+
+# Worker: celery -A src.app.tasks worker --loglevel=info
+celery_app = Celery("spd_imoveis", broker=CELERY_BROKER_URL, backend=CELERY_RESULT_BACKEND)
+
+celery_app.conf.update(
+    task_serializer="json",
+    result_serializer="json",
+    accept_content=["json"],
+    task_track_started=True,
+    # Um job longo por vez em cada processo do worker; não reserva jobs que outro worker poderia pegar
+    task_acks_late=True,
+    worker_prefetch_multiplier=1,
+    worker_concurrency=JOB_WORKER_CONCURRENCY,
+    result_expires=JOB_RESULT_TTL_SECONDS
+)
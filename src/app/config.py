@@ -5,16 +5,86 @@ load_dotenv()
 
 MONGO_URI = os.getenv("MONGO_CONNECTION_STRING", "mongodb://localhost:27017/")
 MONGO_DB_NAME = os.getenv("MONGO_DATABASE_NAME", "spd_imoveis")
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "50"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
 
 CHROMA_HOST = os.getenv("CHROMA_HOST", "localhost")
 CHROMA_PORT = int(os.getenv("CHROMA_PORT", "7777"))
 CHROMA_COLLECTION_NAME = os.getenv("CHROMA_COLLECTION_NAME", "imoveis")
+# Diretório do ChromaDB embutido (jobs em background e integrador)
+CHROMA_PATH = os.getenv("CHROMA_PATH", "./chroma_db")
 
 REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379")
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", "50"))
+
+# Fila de jobs em background (Celery sobre o Redis)
+CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL", REDIS_URL)
+CELERY_RESULT_BACKEND = os.getenv("CELERY_RESULT_BACKEND", REDIS_URL)
+JOB_WORKER_CONCURRENCY = int(os.getenv("JOB_WORKER_CONCURRENCY", "2"))
+# Tempo máximo que um job segura a vaga do seu tipo (proteção contra workers mortos)
+JOB_LOCK_TTL_SECONDS = int(os.getenv("JOB_LOCK_TTL_SECONDS", "21600"))
+JOB_RESULT_TTL_SECONDS = int(os.getenv("JOB_RESULT_TTL_SECONDS", "86400"))
+
+# Log de eventos de escrita dos imóveis (Redis Stream consumido pelo integrador via consumer group)
+EVENTS_STREAM_KEY = os.getenv("EVENTS_STREAM_KEY", "imoveis.events")
+# Versão do formato das entradas ({"v", "op", "ids"}); o integrador ignora versões que não conhece
+EVENTS_SCHEMA_VERSION = "1"
+# Tamanho aproximado retido no stream (XADD MAXLEN ~); eventos mais antigos deixam de ser reprocessáveis
+EVENTS_STREAM_MAXLEN = int(os.getenv("EVENTS_STREAM_MAXLEN", "100000"))
+EVENTS_CONSUMER_GROUP = os.getenv("EVENTS_CONSUMER_GROUP", "integrador")
+# Entregas não confirmadas há mais que isso são reassumidas por outro consumidor (réplica morta)
+EVENTS_CLAIM_IDLE_MS = int(os.getenv("EVENTS_CLAIM_IDLE_MS", "60000"))
+# Após esse número de entregas sem ack o evento vai para o stream de dead letter
+EVENTS_MAX_DELIVERIES = int(os.getenv("EVENTS_MAX_DELIVERIES", "5"))
+# Micro-lotes do integrador: até BATCH_SIZE eventos ou FLUSH_INTERVAL_MS após o primeiro evento do lote
+INTEGRADOR_BATCH_SIZE = int(os.getenv("INTEGRADOR_BATCH_SIZE", "256"))
+INTEGRADOR_FLUSH_INTERVAL_MS = int(os.getenv("INTEGRADOR_FLUSH_INTERVAL_MS", "500"))
+# Modo pool: N processos (cada um com o seu modelo), eventos distribuídos por hash do _id; 1 = processo único
+INTEGRADOR_WORKERS = int(os.getenv("INTEGRADOR_WORKERS", "1"))
+# Lotes em espera por worker; com a fila cheia o dispatcher para de ler o stream (backpressure)
+INTEGRADOR_QUEUE_SIZE = int(os.getenv("INTEGRADOR_QUEUE_SIZE", "8"))
+# Origem das alterações indexadas: "events" (stream publicado pela API) ou "changestream"
+# (change stream do MongoDB na collection imoveis; captura qualquer escrita, inclusive seed e edições manuais)
+INTEGRADOR_SOURCE = os.getenv("INTEGRADOR_SOURCE", "events")
+# Resume token do change stream, gravado após cada lote aplicado para retomar do mesmo ponto ao reiniciar
+CHANGE_STREAM_TOKEN_KEY = os.getenv("CHANGE_STREAM_TOKEN_KEY", "imoveis.changestream.token")
 
 EMBEDDING_MODEL_NAME = os.getenv("EMBEDDING_MODEL_NAME", "all-MiniLM-L6-v2")
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+# Threads dedicadas ao encode de consultas no caminho assíncrono da busca
+EMBEDDING_EXECUTOR_WORKERS = int(os.getenv("EMBEDDING_EXECUTOR_WORKERS", "2"))
+
+# Micro-batching das consultas concorrentes: espera até MAX_WAIT_MS (0 desliga) ou MAX_SIZE consultas por lote
+EMBEDDING_MICROBATCH_MAX_WAIT_MS = float(os.getenv("EMBEDDING_MICROBATCH_MAX_WAIT_MS", "3"))
+EMBEDDING_MICROBATCH_MAX_SIZE = int(os.getenv("EMBEDDING_MICROBATCH_MAX_SIZE", "32"))
+
+# Cache de embeddings de consultas: LRU em memória por processo + camada opcional no Redis (compartilhada)
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "1024"))
+EMBEDDING_CACHE_TTL_SECONDS = int(os.getenv("EMBEDDING_CACHE_TTL_SECONDS", "3600"))
+EMBEDDING_CACHE_REDIS = os.getenv("EMBEDDING_CACHE_REDIS", "False").lower() == "true"
+
+# Documentos lidos do MongoDB e enviados ao ChromaDB por bloco na sincronização
+SYNC_CHUNK_SIZE = int(os.getenv("SYNC_CHUNK_SIZE", "256"))
+
+# Cache de respostas do /search/ (por processo); a chave inclui a versão do índice guardada no Redis
+SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", "512"))
+SEARCH_CACHE_TTL_SECONDS = int(os.getenv("SEARCH_CACHE_TTL_SECONDS", "300"))
+SEARCH_INDEX_VERSION_KEY = "search:index_version"
+
+# Busca híbrida: constante k do reciprocal-rank fusion e candidatos por ranking (n_results × multiplicador)
+SEARCH_RRF_K = int(os.getenv("SEARCH_RRF_K", "60"))
+SEARCH_HYBRID_CANDIDATES_MULTIPLIER = int(os.getenv("SEARCH_HYBRID_CANDIDATES_MULTIPLIER", "3"))
 
 API_HOST = os.getenv("API_HOST", "0.0.0.0")
 API_PORT = int(os.getenv("API_PORT", "8000"))
 
+# Tamanho máximo de página nos endpoints de listagem (?limit=)
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "500"))
+
+# Itens por insert_many/bulk_write nos endpoints /bulk (um evento de indexação por bloco)
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", "500"))
+
+# Documentos por lote ao ler a collection em streaming (exportação)
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "500"))
+
 DEBUG = os.getenv("DEBUG", "True").lower() == "true"
@@ -1,9 +1,114 @@
+import threading
+import redis
+from pymongo import MongoClient, AsyncMongoClient
 from .repositories.mongo_repository import MongoRepository
+from .repositories.async_mongo_repository import AsyncMongoRepository
 from .repositories.chroma_repository import ChromaRepository
-from .config import MONGO_URI, MONGO_DB_NAME, CHROMA_HOST, CHROMA_PORT
+from .services.embedding_service import EmbeddingService
+from .services.job_service import JobService
+from .services.search_cache import SearchCache
+from .services.event_log import EventLog
+from .config import (
+    MONGO_URI, MONGO_DB_NAME, MONGO_MAX_POOL_SIZE, MONGO_MIN_POOL_SIZE,
+    REDIS_URL, REDIS_MAX_CONNECTIONS,
+    CHROMA_HOST, CHROMA_PORT, EMBEDDING_MODEL_NAME, EMBEDDING_CACHE_REDIS
+)
+
+# Instância única do modelo de embeddings por processo
+_embedding_service = None
+_embedding_lock = threading.Lock()
+
+# Cache de buscas do processo (memória local, versão do índice no Redis)
+_search_cache = None
+
+# Pools de conexão compartilhados pela aplicação (criados no lifespan)
+_mongo_client = None
+_async_mongo_client = None
+_redis_client = None
+_connections_lock = threading.Lock()
+
+def init_connections():
+    """Cria os pools de conexão do MongoDB e do Redis (chamado no startup da API)"""
+    global _mongo_client, _redis_client
+    with _connections_lock:
+        if _mongo_client is None:
+            _mongo_client = MongoClient(
+                MONGO_URI,
+                maxPoolSize=MONGO_MAX_POOL_SIZE,
+                minPoolSize=MONGO_MIN_POOL_SIZE
+            )
+        if _redis_client is None:
+            pool = redis.ConnectionPool.from_url(
+                REDIS_URL,
+                max_connections=REDIS_MAX_CONNECTIONS,
+                decode_responses=True
+            )
+            _redis_client = redis.Redis(connection_pool=pool)
+
+def close_connections():
+    """Fecha os pools de conexão (chamado no shutdown da API)"""
+    global _mongo_client, _redis_client
+    with _connections_lock:
+        if _mongo_client is not None:
+            _mongo_client.close()
+            _mongo_client = None
+        if _redis_client is not None:
+            _redis_client.connection_pool.disconnect()
+            _redis_client = None
+
+async def close_async_connections():
+    """Fecha o cliente assíncrono do MongoDB (precisa rodar no event loop da API)"""
+    global _async_mongo_client
+    if _async_mongo_client is not None:
+        client, _async_mongo_client = _async_mongo_client, None
+        await client.close()
+
+def get_async_mongo_client() -> AsyncMongoClient:
+    """Cliente pymongo assíncrono; criado sob demanda dentro do event loop que vai usá-lo"""
+    global _async_mongo_client
+    if _async_mongo_client is None:
+        _async_mongo_client = AsyncMongoClient(
+            MONGO_URI,
+            maxPoolSize=MONGO_MAX_POOL_SIZE,
+            minPoolSize=MONGO_MIN_POOL_SIZE
+        )
+    return _async_mongo_client
+
+def get_mongo_client() -> MongoClient:
+    if _mongo_client is None:
+        init_connections()
+    return _mongo_client
+
+def get_redis_client() -> redis.Redis:
+    """Dependência FastAPI: cliente Redis do pool compartilhado"""
+    if _redis_client is None:
+        init_connections()
+    return _redis_client
 
 def get_mongo_repo():
-    return MongoRepository(uri=MONGO_URI, db_name=MONGO_DB_NAME)
+    """Dependência FastAPI: repositório sobre o pool compartilhado (não abre novas conexões)"""
+    return MongoRepository(db_name=MONGO_DB_NAME, client=get_mongo_client(), redis_client=get_redis_client())
+
+def get_async_mongo_repo() -> AsyncMongoRepository:
+    """Dependência FastAPI: repositório assíncrono para as rotas async (busca)"""
+    return AsyncMongoRepository(db_name=MONGO_DB_NAME, client=get_async_mongo_client())
+
+def get_job_service() -> JobService:
+    """Dependência FastAPI: controle dos jobs em background (lock, cancelamento e status no Redis)"""
+    return JobService(get_redis_client())
+
+def get_event_log() -> EventLog:
+    """Dependência FastAPI: stream de eventos de escrita consumido pelo integrador"""
+    return EventLog(get_redis_client())
+
+def get_search_cache() -> SearchCache:
+    """Dependência FastAPI: cache de respostas do /search/ compartilhado pelo processo"""
+    global _search_cache
+    if _search_cache is None:
+        with _connections_lock:
+            if _search_cache is None:
+                _search_cache = SearchCache(get_redis_client())
+    return _search_cache
 
 def get_chroma_repo():
     try:
@@ -12,3 +117,27 @@ def get_chroma_repo():
     except:
         # Fallback para ChromaDB local
         return ChromaRepository(path="./chroma_db")
+
+def init_embedding_service(warm_up: bool = True) -> EmbeddingService:
+    """Carrega o modelo de embeddings uma única vez (chamado no startup da API)"""
+    global _embedding_service
+    with _embedding_lock:
+        if _embedding_service is None:
+            _embedding_service = EmbeddingService(
+                model_name=EMBEDDING_MODEL_NAME,
+                redis_client=get_redis_client() if EMBEDDING_CACHE_REDIS else None
+            )
+        if warm_up and not _embedding_service.is_ready:
+            _embedding_service.warm_up()
+    return _embedding_service
+
+def get_embedding_service() -> EmbeddingService:
+    """Dependência FastAPI: retorna o modelo compartilhado, carregando sob demanda se preciso"""
+    if _embedding_service is not None:
+        return _embedding_service
+    return init_embedding_service()
+
+def embedding_service_status() -> dict:
+    if _embedding_service is None:
+        return {"ready": False, "model_name": EMBEDDING_MODEL_NAME, "loaded": False}
+    return {**_embedding_service.get_status(), "loaded": True}
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel
 from typing import Optional, List
 from bson import ObjectId
 
@@ -66,3 +66,16 @@ class CidadeInDB(Cidade):
         json_encoders = {
             ObjectId: str
         }
+
+class SearchFilters(BaseModel):
+    """Filtros da busca semântica, aplicados no ChromaDB (where) antes do ranking por similaridade"""
+    preco_min: Optional[float] = None
+    preco_max: Optional[float] = None
+    quartos_min: Optional[int] = None
+    quartos_max: Optional[int] = None
+    area_min: Optional[float] = None
+    area_max: Optional[float] = None
+    bairro: Optional[str] = None
+    cidade: Optional[str] = None
+    tipo: Optional[str] = None  # Ex: "apartamento", "casa", "kitnet"
+    finalidade: Optional[str] = None  # "venda" ou "aluguel"
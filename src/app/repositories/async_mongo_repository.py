@@ -0,0 +1,54 @@
+from pymongo import AsyncMongoClient
+from bson import ObjectId
+from typing import List, Dict, Any, Optional, Tuple
+
+class AsyncMongoRepository:
+    """Acesso assíncrono (pymongo async) aos imóveis, usado no caminho de busca para não bloquear o event loop"""
+    def __init__(self, db_name: str, client: AsyncMongoClient):
+        self.client = client
+        self.db = self.client[db_name]
+        self.collection = self.db.imoveis
+
+    @staticmethod
+    def _to_dict(result: Dict[str, Any]) -> Dict[str, Any]:
+        result["id"] = str(result["_id"])
+        del result["_id"]
+        return result
+
+    async def get_imoveis_by_ids(self, imovel_ids: List[str],
+                                 projection: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Busca vários imóveis em uma única consulta ($in), preservando a ordem dos IDs recebidos"""
+        object_ids = [ObjectId(imovel_id) for imovel_id in imovel_ids if ObjectId.is_valid(imovel_id)]
+        if not object_ids:
+            return []
+
+        por_id = {}
+        async for result in self.collection.find({"_id": {"$in": object_ids}}, projection):
+            imovel = self._to_dict(result)
+            por_id[imovel["id"]] = imovel
+
+        return [por_id[imovel_id] for imovel_id in imovel_ids if imovel_id in por_id]
+
+    @staticmethod
+    def _text_query(query: str, filtro: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        # $text usa o índice imoveis_text (stemming em português, sem diferenciar acentos nem caixa);
+        # a consulta do usuário é tratada como termos de busca, nunca como expressão regular
+        return {"$text": {"$search": query}, **(filtro or {})}
+
+    async def text_search_ids(self, query: str, limit: int,
+                              filtro: Optional[Dict[str, Any]] = None) -> List[Tuple[str, float]]:
+        """Ranking lexical pelo índice de texto (ver INDEXES em mongo_repository.py): [(id, textScore)]"""
+        cursor = self.collection.find(
+            self._text_query(query, filtro),
+            {"score": {"$meta": "textScore"}}
+        ).sort([("score", {"$meta": "textScore"})]).limit(limit)
+        return [(str(result["_id"]), result["score"]) async for result in cursor]
+
+    async def search_imoveis_text(self, query: str, limit: int, projection: Optional[Dict[str, Any]] = None,
+                                  filtro: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Busca textual pelo índice de texto, ordenada por relevância (fallback quando o ChromaDB falha)"""
+        cursor = self.collection.find(
+            self._text_query(query, filtro),
+            {**(projection or {}), "text_score": {"$meta": "textScore"}}
+        ).sort([("text_score", {"$meta": "textScore"})]).limit(limit)
+        return [self._to_dict(result) async for result in cursor]
@@ -1,6 +1,5 @@
 import chromadb
-from typing import List, Dict, Any
-from uuid import UUID
+from typing import List, Dict, Any, Optional, Iterator
 
 class ChromaRepository:
     def __init__(self, path: str = None, host: str = None, port: int = None):
@@ -12,35 +11,74 @@ class ChromaRepository:
             self.client = chromadb.PersistentClient(path=path or "./chroma_db")
         self.collection = self.client.get_or_create_collection(name="imoveis")
 
-    def add_documents(self, ids: List[str], documents: List[str], metadatas: List[Dict[str, Any]]):
+    def add_documents(self, ids: List[str], documents: List[str], metadatas: List[Dict[str, Any]],
+                      embeddings: Optional[List[List[float]]] = None):
+        # Com embeddings informados o ChromaDB não recalcula os vetores com a função padrão dele
         self.collection.add(
             ids=ids,
             documents=documents,
-            metadatas=metadatas
+            metadatas=metadatas,
+            embeddings=embeddings
         )
 
-    def query(self, query_embeddings: List[List[float]], n_results: int = 5) -> List[Dict[str, Any]]:
+    def query(self, query_embeddings: List[List[float]], n_results: int = 5,
+              where: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        # Com where o ChromaDB descarta os candidatos pela metadata antes de calcular a similaridade
         return self.collection.query(
             query_embeddings=query_embeddings,
-            n_results=n_results
+            n_results=n_results,
+            where=where or None
         )
     
-    def update_document(self, id: str, document: str, metadata: Dict[str, Any]):
+    def update_document(self, id: str, document: str, metadata: Dict[str, Any],
+                        embedding: Optional[List[float]] = None):
         """Atualiza um documento existente"""
         self.collection.update(
             ids=[id],
             documents=[document],
-            metadatas=[metadata]
+            metadatas=[metadata],
+            embeddings=[embedding] if embedding is not None else None
         )
     
+    def get_metadatas(self, ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Retorna {id: metadata} dos documentos já indexados (IDs ausentes são ignorados)"""
+        if not ids:
+            return {}
+        result = self.collection.get(ids=ids, include=["metadatas"])
+        return dict(zip(result["ids"], result["metadatas"] or []))
+
+    def iter_ids(self, batch_size: int = 1000) -> Iterator[str]:
+        """Percorre os IDs indexados em páginas, sem carregar documentos nem embeddings"""
+        offset = 0
+        while True:
+            result = self.collection.get(include=[], limit=batch_size, offset=offset)
+            ids = result["ids"]
+            if not ids:
+                break
+            yield from ids
+            offset += len(ids)
+
+    def delete_documents(self, ids: List[str]):
+        """Remove vários documentos do ChromaDB"""
+        if ids:
+            self.collection.delete(ids=ids)
+
     def delete_document(self, id: str):
         """Remove um documento do ChromaDB"""
         self.collection.delete(ids=[id])
     
-    def upsert_documents(self, ids: List[str], documents: List[str], metadatas: List[Dict[str, Any]]):
+    def clear(self):
+        """Remove todos os documentos (apaga e recria a collection)"""
+        name = self.collection.name
+        self.client.delete_collection(name=name)
+        self.collection = self.client.get_or_create_collection(name=name)
+
+    def upsert_documents(self, ids: List[str], documents: List[str], metadatas: List[Dict[str, Any]],
+                         embeddings: Optional[List[List[float]]] = None):
         """Insere ou atualiza documentos"""
         self.collection.upsert(
             ids=ids,
             documents=documents,
-            metadatas=metadatas
+            metadatas=metadatas,
+            embeddings=embeddings
         )
@@ -1,29 +1,256 @@
-from pymongo import MongoClient
+from pymongo import MongoClient, ASCENDING, TEXT, UpdateOne, IndexModel
+from pymongo.errors import BulkWriteError
 from bson import ObjectId
-from typing import List, Dict, Any
-from ..models import ImovelInDB
-from ..config import REDIS_URL
+from bson.errors import InvalidId
+from typing import List, Dict, Any, Optional, Iterator, Tuple
+from ..services.event_log import EventLog, ACTION_UPSERT, ACTION_DELETE, ACTION_CLEAR
+from ..atributos import extrair_atributos, CAMPOS_ATRIBUTOS
+from ..config import REDIS_URL, SEARCH_INDEX_VERSION_KEY, BULK_CHUNK_SIZE
 import redis
 
+# Índice de texto dos imóveis (busca lexical/híbrida); o MongoDB permite apenas um por collection
+IMOVEIS_TEXT_INDEX = "imoveis_text"
+
+# Índices declarados por collection: criados no startup (ensure_indexes) e conferidos em index_report
+INDEXES = {
+    "imoveis": [
+        IndexModel(
+            [("titulo", TEXT), ("especificacoes", TEXT), ("descricao", TEXT)],
+            name=IMOVEIS_TEXT_INDEX,
+            weights={"titulo": 3, "especificacoes": 2, "descricao": 1},
+            default_language="portuguese"
+        ),
+        IndexModel([("preco", ASCENDING)], name="preco"),
+        IndexModel([("quartos", ASCENDING), ("preco", ASCENDING)], name="quartos_preco"),
+        IndexModel([("cidade", ASCENDING), ("bairro", ASCENDING)], name="cidade_bairro"),
+    ],
+    "corretores": [
+        IndexModel([("creci", ASCENDING)], name="creci", unique=True),
+        IndexModel([("cidades_atendidas", ASCENDING)], name="cidades_atendidas"),
+    ],
+    "cidades": [
+        IndexModel([("estado", ASCENDING), ("nome", ASCENDING)], name="estado_nome"),
+        IndexModel([("regiao", ASCENDING), ("populacao", ASCENDING)], name="regiao_populacao"),
+    ],
+}
+
 class MongoRepository:
-    def __init__(self, uri: str, db_name: str):
-        self.client = MongoClient(uri)
+    def __init__(self, uri: str = None, db_name: str = None, client: MongoClient = None, redis_client: redis.Redis = None):
+        # Reutiliza o pool de conexões da aplicação quando fornecido (ver database.py)
+        self.client = client if client is not None else MongoClient(uri)
         self.db = self.client[db_name]
         self.collection = self.db.imoveis
         self.corretores_collection = self.db.corretores
         self.cidades_collection = self.db.cidades
-        self.redis = redis.from_url(REDIS_URL, decode_responses=True)
+        self.redis = redis_client if redis_client is not None else redis.from_url(REDIS_URL, decode_responses=True)
+        self.events = EventLog(self.redis)
+
+    def ensure_indexes(self) -> Dict[str, Any]:
+        """
+        Cria os índices declarados em INDEXES que ainda não existem (create_indexes é idempotente).
+        Falhas ficam no resultado em vez de interromper o startup (ex.: CRECI duplicado impede o índice único).
+        O índice de texto usa stemming em português e, por ser v3, ignora acentos e caixa.
+        """
+        resultado = {"created": [], "errors": {}}
+        for nome_collection, indices in INDEXES.items():
+            collection = self.db[nome_collection]
+            for indice in indices:
+                nome = indice.document["name"]
+                try:
+                    collection.create_indexes([indice])
+                    resultado["created"].append(f"{nome_collection}.{nome}")
+                except Exception as e:
+                    resultado["errors"][f"{nome_collection}.{nome}"] = str(e)
+        return resultado
+
+    def index_report(self) -> Dict[str, Any]:
+        """Por collection: índices declarados que faltam, índices existentes não declarados e índices sem uso ($indexStats)"""
+        relatorio = {}
+        for nome_collection, indices in INDEXES.items():
+            collection = self.db[nome_collection]
+            declarados = {indice.document["name"] for indice in indices}
+            existentes = {indice["name"] for indice in collection.list_indexes()} - {"_id_"}
+            try:
+                acessos = {
+                    stats["name"]: stats["accesses"]["ops"]
+                    for stats in collection.aggregate([{"$indexStats": {}}])
+                }
+            except Exception:
+                acessos = {}
+            relatorio[nome_collection] = {
+                "missing": sorted(declarados - existentes),
+                "undeclared": sorted(existentes - declarados),
+                "unused": sorted(nome for nome in existentes if acessos.get(nome) == 0),
+                "accesses": {nome: acessos[nome] for nome in sorted(existentes) if nome in acessos}
+            }
+        return relatorio
+
+    @staticmethod
+    def _keyset_query(filtro: Optional[Dict[str, Any]], after: Optional[str]) -> Dict[str, Any]:
+        query = dict(filtro or {})
+        if after:
+            if not ObjectId.is_valid(after):
+                raise InvalidId(f"Cursor inválido: {after}")
+            query["_id"] = {"$gt": ObjectId(after)}
+        return query
+
+    def _find_page(self, collection, filtro: Optional[Dict[str, Any]] = None, limit: Optional[int] = None,
+                   after: Optional[str] = None, projection: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Paginação por chave (keyset) sobre o _id: retorna os documentos com _id > after, em ordem crescente"""
+        cursor = collection.find(self._keyset_query(filtro, after), projection).sort("_id", ASCENDING)
+        if limit:
+            cursor = cursor.limit(limit)
+
+        results = []
+        for result in cursor:
+            result["id"] = str(result["_id"])
+            del result["_id"]
+            results.append(result)
+        return results
+
+    @staticmethod
+    def _bulk_errors(erro: BulkWriteError) -> Dict[int, str]:
+        # Com ordered=False o MongoDB segue após uma falha e informa o índice de cada operação rejeitada
+        return {falha["index"]: falha["errmsg"] for falha in erro.details.get("writeErrors", [])}
+
+    def _bulk_insert(self, collection, documentos: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """insert_many com ordered=False: resultado por documento ("created" com o id, ou "error")"""
+        if not documentos:
+            return []
+        for documento in documentos:
+            documento["_id"] = ObjectId()
+        falhas = {}
+        try:
+            collection.insert_many(documentos, ordered=False)
+        except BulkWriteError as e:
+            falhas = self._bulk_errors(e)
+        return [
+            {"id": str(documento["_id"]), "status": "error", "error": falhas[i]} if i in falhas
+            else {"id": str(documento["_id"]), "status": "created"}
+            for i, documento in enumerate(documentos)
+        ]
+
+    def _existing_ids(self, collection, ids: List[str]) -> set:
+        object_ids = [ObjectId(item_id) for item_id in ids if ObjectId.is_valid(item_id)]
+        if not object_ids:
+            return set()
+        return {str(result["_id"]) for result in collection.find({"_id": {"$in": object_ids}}, {"_id": 1})}
+
+    def _bulk_update(self, collection, atualizacoes: List[Tuple[str, Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """bulk_write de UpdateOne com ordered=False: resultado por item ("updated", "not_found" ou "error")"""
+        if not atualizacoes:
+            return []
+        existentes = self._existing_ids(collection, [item_id for item_id, _ in atualizacoes])
+        resultados = [
+            {"id": item_id, "status": "updated"} if item_id in existentes else {"id": item_id, "status": "not_found"}
+            for item_id, _ in atualizacoes
+        ]
+        posicoes = [i for i, resultado in enumerate(resultados) if resultado["status"] == "updated"]
+        if not posicoes:
+            return resultados
+        try:
+            collection.bulk_write(
+                [UpdateOne({"_id": ObjectId(atualizacoes[i][0])}, atualizacoes[i][1]) for i in posicoes],
+                ordered=False
+            )
+        except BulkWriteError as e:
+            for indice, mensagem in self._bulk_errors(e).items():
+                resultados[posicoes[indice]].update(status="error", error=mensagem)
+        return resultados
+
+    def _bulk_delete(self, collection, ids: List[str]) -> List[Dict[str, Any]]:
+        """Um único delete_many ($in) para o bloco: resultado por id ("deleted" ou "not_found")"""
+        if not ids:
+            return []
+        existentes = self._existing_ids(collection, ids)
+        if existentes:
+            collection.delete_many({"_id": {"$in": [ObjectId(item_id) for item_id in existentes]}})
+        return [
+            {"id": item_id, "status": "deleted" if item_id in existentes else "not_found"}
+            for item_id in ids
+        ]
+
+    @staticmethod
+    def _chunks(itens: List[Any], chunk_size: int) -> Iterator[List[Any]]:
+        for i in range(0, len(itens), chunk_size):
+            yield itens[i:i + chunk_size]
+
+    def _publish(self, op: str, ids: List[str] = ()):
+        """
+        Único ponto de publicação dos eventos de escrita dos imóveis (um evento por escrita ou por bloco):
+        registra no stream do integrador e invalida o cache de buscas (nova versão do índice)
+        """
+        self.events.publish(op, ids)
+        self.redis.incr(SEARCH_INDEX_VERSION_KEY)
+
+    @staticmethod
+    def _com_atributos(imovel: Dict[str, Any]) -> Dict[str, Any]:
+        """Cópia do imóvel com os atributos tipados extraídos das especificações (preço, quartos...)"""
+        atributos = extrair_atributos(imovel.get("titulo", ""), imovel.get("descricao", ""),
+                                      imovel.get("especificacoes", []))
+        return {**imovel, **atributos}
+
+    @staticmethod
+    def _update_atributos(campos: Dict[str, Any]) -> Dict[str, Any]:
+        """$set dos campos e $unset dos atributos tipados que deixaram de existir"""
+        update = {"$set": campos}
+        ausentes = {campo: "" for campo in CAMPOS_ATRIBUTOS if campo not in campos}
+        if ausentes:
+            update["$unset"] = ausentes
+        return update
 
     def add_imovel(self, imovel: Dict[str, Any]) -> str:
-        imovel_copy = imovel.copy()
+        imovel_copy = self._com_atributos(imovel)
         result = self.collection.insert_one(imovel_copy)
 
         if result.inserted_id:
-            # Publish the creation event to Redis
-            self.redis.publish('imoveis.create', str(result.inserted_id))
+            self._publish(ACTION_UPSERT, [str(result.inserted_id)])
 
         return str(result.inserted_id)
 
+    def add_imoveis(self, imoveis: List[Dict[str, Any]]) -> List[str]:
+        """Insere vários imóveis com um único insert_many (sem eventos no Redis: quem chama indexa)"""
+        if not imoveis:
+            return []
+        result = self.collection.insert_many([self._com_atributos(imovel) for imovel in imoveis])
+        self.redis.incr(SEARCH_INDEX_VERSION_KEY)
+        return [str(inserted_id) for inserted_id in result.inserted_ids]
+
+    def _publish_bulk(self, op: str, resultados: List[Dict[str, Any]], status: str):
+        """Um evento por bloco, com os IDs efetivamente gravados (o integrador indexa em lote)"""
+        ids = [resultado["id"] for resultado in resultados if resultado["status"] == status]
+        if ids:
+            self._publish(op, ids)
+
+    def bulk_add_imoveis(self, imoveis: List[Dict[str, Any]], chunk_size: int = BULK_CHUNK_SIZE) -> List[Dict[str, Any]]:
+        """Insere em blocos de chunk_size (insert_many, ordered=False); resultado por imóvel, na ordem recebida"""
+        resultados = []
+        for bloco in self._chunks(imoveis, chunk_size):
+            resultados_bloco = self._bulk_insert(self.collection, [self._com_atributos(imovel) for imovel in bloco])
+            self._publish_bulk(ACTION_UPSERT, resultados_bloco, "created")
+            resultados += resultados_bloco
+        return resultados
+
+    def bulk_update_imoveis(self, atualizacoes: List[Tuple[str, Dict[str, Any]]],
+                            chunk_size: int = BULK_CHUNK_SIZE) -> List[Dict[str, Any]]:
+        """Atualiza [(id, imóvel)] em blocos (bulk_write, ordered=False); resultado por item"""
+        resultados = []
+        for bloco in self._chunks(atualizacoes, chunk_size):
+            resultados_bloco = self._bulk_update(self.collection, [
+                (imovel_id, self._update_atributos(self._com_atributos(imovel))) for imovel_id, imovel in bloco
+            ])
+            self._publish_bulk(ACTION_UPSERT, resultados_bloco, "updated")
+            resultados += resultados_bloco
+        return resultados
+
+    def bulk_delete_imoveis(self, imovel_ids: List[str], chunk_size: int = BULK_CHUNK_SIZE) -> List[Dict[str, Any]]:
+        resultados = []
+        for bloco in self._chunks(imovel_ids, chunk_size):
+            resultados_bloco = self._bulk_delete(self.collection, bloco)
+            self._publish_bulk(ACTION_DELETE, resultados_bloco, "deleted")
+            resultados += resultados_bloco
+        return resultados
+
     def get_imovel_by_id(self, imovel_id: str) -> Dict[str, Any]:
         result = self.collection.find_one({"_id": ObjectId(imovel_id)})
         if result:
@@ -31,6 +258,20 @@ class MongoRepository:
             del result["_id"]
         return result
 
+    def get_imoveis_by_ids(self, imovel_ids: List[str], projection: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Busca vários imóveis em uma única consulta ($in), preservando a ordem dos IDs recebidos"""
+        object_ids = [ObjectId(imovel_id) for imovel_id in imovel_ids if ObjectId.is_valid(imovel_id)]
+        if not object_ids:
+            return []
+
+        por_id = {}
+        for result in self.collection.find({"_id": {"$in": object_ids}}, projection):
+            result["id"] = str(result["_id"])
+            del result["_id"]
+            por_id[result["id"]] = result
+
+        return [por_id[imovel_id] for imovel_id in imovel_ids if imovel_id in por_id]
+
     def get_all_imoveis(self) -> List[Dict[str, Any]]:
         results = list(self.collection.find())
         for result in results:
@@ -38,21 +279,75 @@ class MongoRepository:
             del result["_id"]
         return results
 
+    def get_imoveis_page(self, limit: Optional[int] = None, after: Optional[str] = None,
+                         projection: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        return self._find_page(self.collection, limit=limit, after=after, projection=projection)
+
+    def iter_imoveis(self, batch_size: int = 500, projection: Optional[Dict[str, Any]] = None) -> Iterator[Dict[str, Any]]:
+        """Percorre a collection via cursor, trazendo no máximo batch_size documentos por vez do servidor"""
+        cursor = self.collection.find({}, projection).sort("_id", ASCENDING).batch_size(batch_size)
+        try:
+            for result in cursor:
+                result["id"] = str(result["_id"])
+                del result["_id"]
+                yield result
+        finally:
+            cursor.close()
+
+    def count_imoveis(self) -> int:
+        # Contagem pelos metadados da collection, sem varrer os documentos
+        return self.collection.estimated_document_count()
+
     def update_imovel(self, imovel_id: str, imovel: Dict[str, Any]):
-        self.collection.update_one({"_id": ObjectId(imovel_id)}, {"$set": imovel})
-        # Publish the update event to Redis
-        self.redis.publish('imoveis.update', str(imovel_id))
+        update = self._update_atributos(self._com_atributos(imovel))
+        self.collection.update_one({"_id": ObjectId(imovel_id)}, update)
+        self._publish(ACTION_UPSERT, [str(imovel_id)])
+
+    def set_atributos_imoveis(self, atributos_por_id: Dict[str, Dict[str, Any]]):
+        """Grava os atributos tipados de vários imóveis com um único bulk_write"""
+        operacoes = [
+            UpdateOne({"_id": ObjectId(imovel_id)}, self._update_atributos(atributos))
+            for imovel_id, atributos in atributos_por_id.items() if ObjectId.is_valid(imovel_id)
+        ]
+        if operacoes:
+            self.collection.bulk_write(operacoes, ordered=False)
 
     def delete_imovel(self, imovel_id: str):
         self.collection.delete_one({"_id": ObjectId(imovel_id)})
-        # Publish the delete event to Redis
-        self.redis.publish('imoveis.delete', str(imovel_id))
+        self._publish(ACTION_DELETE, [str(imovel_id)])
+    
+    def delete_all_imoveis(self) -> int:
+        deleted_count = self.collection.delete_many({}).deleted_count
+        self._publish(ACTION_CLEAR)
+        return deleted_count
     
     def add_corretor(self, corretor: Dict[str, Any]) -> str:
         corretor_copy = corretor.copy()
         result = self.corretores_collection.insert_one(corretor_copy)
         return str(result.inserted_id)
     
+    def bulk_add_corretores(self, corretores: List[Dict[str, Any]], chunk_size: int = BULK_CHUNK_SIZE) -> List[Dict[str, Any]]:
+        """Insere em blocos; CRECI duplicado vira erro do item, sem interromper os demais"""
+        resultados = []
+        for bloco in self._chunks(corretores, chunk_size):
+            resultados += self._bulk_insert(self.corretores_collection, [corretor.copy() for corretor in bloco])
+        return resultados
+
+    def bulk_update_corretores(self, atualizacoes: List[Tuple[str, Dict[str, Any]]],
+                               chunk_size: int = BULK_CHUNK_SIZE) -> List[Dict[str, Any]]:
+        resultados = []
+        for bloco in self._chunks(atualizacoes, chunk_size):
+            resultados += self._bulk_update(self.corretores_collection, [
+                (corretor_id, {"$set": corretor}) for corretor_id, corretor in bloco
+            ])
+        return resultados
+
+    def bulk_delete_corretores(self, corretor_ids: List[str], chunk_size: int = BULK_CHUNK_SIZE) -> List[Dict[str, Any]]:
+        resultados = []
+        for bloco in self._chunks(corretor_ids, chunk_size):
+            resultados += self._bulk_delete(self.corretores_collection, bloco)
+        return resultados
+
     def get_corretor_by_id(self, corretor_id: str) -> Dict[str, Any]:
         result = self.corretores_collection.find_one({"_id": ObjectId(corretor_id)})
         if result:
@@ -67,17 +362,108 @@ class MongoRepository:
             del result["_id"]
         return results
     
+    def get_corretores_page(self, limit: Optional[int] = None, after: Optional[str] = None,
+                            projection: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        return self._find_page(self.corretores_collection, limit=limit, after=after, projection=projection)
+
+    def count_corretores(self, filtro: Optional[Dict[str, Any]] = None) -> int:
+        if not filtro:
+            return self.corretores_collection.estimated_document_count()
+        return self.corretores_collection.count_documents(filtro)
+
+    @staticmethod
+    def corretores_filter(cidade: Optional[str] = None, ativo: Optional[bool] = None) -> Dict[str, Any]:
+        """Filtro do MongoDB para corretores por cidade atendida (índice multikey cidades_atendidas) e status"""
+        filtro: Dict[str, Any] = {}
+        if cidade:
+            filtro["cidades_atendidas"] = cidade
+        if ativo is not None:
+            filtro["ativo"] = ativo
+        return filtro
+
+    def find_corretores(self, filtro: Optional[Dict[str, Any]] = None, limit: Optional[int] = None,
+                        after: Optional[str] = None, projection: Optional[Dict[str, Any]] = None,
+                        expand_cidades: bool = False) -> List[Dict[str, Any]]:
+        """
+        Página de corretores que atendem ao filtro (ver corretores_filter).
+        Com expand_cidades, um $lookup pelo _id das cidades devolve em "cidades" o id, nome e estado
+        de cada cidade atendida, na mesma consulta.
+        """
+        if not expand_cidades:
+            return self._find_page(self.corretores_collection, filtro, limit=limit, after=after, projection=projection)
+
+        pipeline: List[Dict[str, Any]] = [
+            {"$match": self._keyset_query(filtro, after)},
+            {"$sort": {"_id": ASCENDING}},
+        ]
+        if limit:
+            pipeline.append({"$limit": limit})
+        pipeline += [
+            # cidades_atendidas guarda os IDs como string; IDs inválidos viram null e não casam com nenhuma cidade
+            {"$addFields": {"_cidades_oids": {"$map": {
+                "input": {"$ifNull": ["$cidades_atendidas", []]},
+                "in": {"$convert": {"input": "$$this", "to": "objectId", "onError": None, "onNull": None}}
+            }}}},
+            {"$lookup": {"from": "cidades", "localField": "_cidades_oids", "foreignField": "_id", "as": "cidades"}},
+            {"$project": {"_cidades_oids": 0}},
+            {"$addFields": {"cidades": {"$map": {
+                "input": "$cidades",
+                "in": {"id": {"$toString": "$$this._id"}, "nome": "$$this.nome", "estado": "$$this.estado"}
+            }}}},
+        ]
+        if projection:
+            pipeline.append({"$project": {**projection, "cidades": 1}})
+
+        results = []
+        for result in self.corretores_collection.aggregate(pipeline):
+            result["id"] = str(result["_id"])
+            del result["_id"]
+            results.append(result)
+        return results
+    
     def update_corretor(self, corretor_id: str, corretor: Dict[str, Any]):
         self.corretores_collection.update_one({"_id": ObjectId(corretor_id)}, {"$set": corretor})
     
     def delete_corretor(self, corretor_id: str):
         self.corretores_collection.delete_one({"_id": ObjectId(corretor_id)})
     
+    @staticmethod
+    def _normalizar_estado(estado: str) -> str:
+        # A sigla é gravada e consultada sempre em maiúsculas, para o filtro usar o índice estado_nome
+        return estado.strip().upper()
+
     def add_cidade(self, cidade: Dict[str, Any]) -> str:
-        cidade_copy = cidade.copy()
+        cidade_copy = self._cidade_normalizada(cidade)
         result = self.cidades_collection.insert_one(cidade_copy)
         return str(result.inserted_id)
     
+    def _cidade_normalizada(self, cidade: Dict[str, Any]) -> Dict[str, Any]:
+        cidade_copy = cidade.copy()
+        if cidade_copy.get("estado"):
+            cidade_copy["estado"] = self._normalizar_estado(cidade_copy["estado"])
+        return cidade_copy
+
+    def bulk_add_cidades(self, cidades: List[Dict[str, Any]], chunk_size: int = BULK_CHUNK_SIZE) -> List[Dict[str, Any]]:
+        resultados = []
+        for bloco in self._chunks(cidades, chunk_size):
+            resultados += self._bulk_insert(self.cidades_collection, [self._cidade_normalizada(c) for c in bloco])
+        return resultados
+
+    def bulk_update_cidades(self, atualizacoes: List[Tuple[str, Dict[str, Any]]],
+                            chunk_size: int = BULK_CHUNK_SIZE) -> List[Dict[str, Any]]:
+        resultados = []
+        for bloco in self._chunks(atualizacoes, chunk_size):
+            resultados += self._bulk_update(self.cidades_collection, [
+                (cidade_id, {"$set": self._cidade_normalizada(cidade)}) for cidade_id, cidade in bloco
+            ])
+        return resultados
+
+    def bulk_delete_cidades(self, cidade_ids: List[str], chunk_size: int = BULK_CHUNK_SIZE) -> List[Dict[str, Any]]:
+        resultados = []
+        for bloco in self._chunks(cidade_ids, chunk_size):
+            resultados += self._bulk_delete(self.cidades_collection, bloco)
+        return resultados
+
     def get_cidade_by_id(self, cidade_id: str) -> Dict[str, Any]:
         result = self.cidades_collection.find_one({"_id": ObjectId(cidade_id)})
         if result:
@@ -92,8 +478,49 @@ class MongoRepository:
             del result["_id"]
         return results
     
+    def get_cidades_page(self, limit: Optional[int] = None, after: Optional[str] = None,
+                         projection: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        return self._find_page(self.cidades_collection, limit=limit, after=after, projection=projection)
+
+    def count_cidades(self, filtro: Optional[Dict[str, Any]] = None) -> int:
+        if not filtro:
+            return self.cidades_collection.estimated_document_count()
+        return self.cidades_collection.count_documents(filtro)
+
+    @staticmethod
+    def cidades_filter(estado: Optional[str] = None, regiao: Optional[str] = None,
+                       populacao_min: Optional[int] = None, populacao_max: Optional[int] = None) -> Dict[str, Any]:
+        """Filtro do MongoDB para cidades por estado, região e faixa de população"""
+        filtro: Dict[str, Any] = {}
+        if estado:
+            filtro["estado"] = MongoRepository._normalizar_estado(estado)
+        if regiao:
+            filtro["regiao"] = regiao
+        intervalo = {}
+        if populacao_min is not None:
+            intervalo["$gte"] = populacao_min
+        if populacao_max is not None:
+            intervalo["$lte"] = populacao_max
+        if intervalo:
+            filtro["populacao"] = intervalo
+        return filtro
+
+    def find_cidades(self, filtro: Optional[Dict[str, Any]] = None, limit: Optional[int] = None,
+                     after: Optional[str] = None, projection: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Página de cidades que atendem ao filtro (ver cidades_filter), resolvida no MongoDB"""
+        return self._find_page(self.cidades_collection, filtro, limit=limit, after=after, projection=projection)
+
+    def normalize_cidades_estado(self) -> int:
+        """Converte para maiúsculas as siglas gravadas antes da normalização; retorna quantas cidades mudaram"""
+        result = self.cidades_collection.update_many(
+            {"estado": {"$regex": "[a-z]|^\\s|\\s$"}},
+            [{"$set": {"estado": {"$toUpper": {"$trim": {"input": "$estado"}}}}}]
+        )
+        return result.modified_count
+
     def update_cidade(self, cidade_id: str, cidade: Dict[str, Any]):
-        self.cidades_collection.update_one({"_id": ObjectId(cidade_id)}, {"$set": cidade})
+        cidade_copy = self._cidade_normalizada(cidade)
+        self.cidades_collection.update_one({"_id": ObjectId(cidade_id)}, {"$set": cidade_copy})
     
     def delete_cidade(self, cidade_id: str):
         self.cidades_collection.delete_one({"_id": ObjectId(cidade_id)})
@@ -0,0 +1,82 @@
+from fastapi import HTTPException, Request
+from pydantic import BaseModel, ValidationError
+from typing import List, Dict, Any, Callable, Optional, Type
+import asyncio
+import json
+
+NDJSON_MEDIA_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+
+async def read_bulk_items(request: Request) -> List[Any]:
+    """Lê o corpo de um /bulk: array JSON ou NDJSON (um item por linha, Content-Type application/x-ndjson)"""
+    corpo = await request.body()
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    try:
+        if content_type in NDJSON_MEDIA_TYPES:
+            return [json.loads(linha) for linha in corpo.decode("utf-8").splitlines() if linha.strip()]
+        itens = json.loads(corpo or b"[]")
+    except (ValueError, UnicodeDecodeError) as e:
+        raise HTTPException(status_code=400, detail=f"Corpo inválido: {e}")
+    if not isinstance(itens, list):
+        raise HTTPException(status_code=400, detail="O corpo deve ser um array JSON ou NDJSON")
+    return itens
+
+def _invalid(index: int, erro: str) -> Dict[str, Any]:
+    return {"index": index, "status": "invalid", "error": erro}
+
+def _bulk_response(resultados: List[Dict[str, Any]]) -> Dict[str, Any]:
+    counts: Dict[str, int] = {}
+    for resultado in resultados:
+        counts[resultado["status"]] = counts.get(resultado["status"], 0) + 1
+    return {"total": len(resultados), "counts": counts, "items": resultados}
+
+async def _apply(itens_validos: List[tuple], resultados: List[Optional[Dict[str, Any]]],
+                 operacao: Callable[[List[Any]], List[Dict[str, Any]]]) -> Dict[str, Any]:
+    # O repositório é síncrono (pymongo): roda em thread para não bloquear o event loop
+    if itens_validos:
+        gravados = await asyncio.to_thread(operacao, [item for _, item in itens_validos])
+        for (index, _), resultado in zip(itens_validos, gravados):
+            resultados[index] = {"index": index, **resultado}
+    return _bulk_response(resultados)
+
+async def bulk_create(request: Request, model: Type[BaseModel],
+                      operacao: Callable[[List[Dict[str, Any]]], List[Dict[str, Any]]]) -> Dict[str, Any]:
+    """Valida cada item com o model e grava os válidos; itens inválidos não impedem os demais"""
+    itens = await read_bulk_items(request)
+    resultados: List[Optional[Dict[str, Any]]] = [None] * len(itens)
+    validos = []
+    for index, item in enumerate(itens):
+        try:
+            validos.append((index, model.model_validate(item).model_dump()))
+        except ValidationError as e:
+            resultados[index] = _invalid(index, str(e))
+    return await _apply(validos, resultados, operacao)
+
+async def bulk_update(request: Request, model: Type[BaseModel],
+                      operacao: Callable[[List[tuple]], List[Dict[str, Any]]]) -> Dict[str, Any]:
+    """Como bulk_create, mas cada item traz o "id" do documento a atualizar"""
+    itens = await read_bulk_items(request)
+    resultados: List[Optional[Dict[str, Any]]] = [None] * len(itens)
+    validos = []
+    for index, item in enumerate(itens):
+        if not isinstance(item, dict) or not item.get("id"):
+            resultados[index] = _invalid(index, "Campo 'id' obrigatório")
+            continue
+        campos = {campo: valor for campo, valor in item.items() if campo != "id"}
+        try:
+            validos.append((index, (str(item["id"]), model.model_validate(campos).model_dump())))
+        except ValidationError as e:
+            resultados[index] = _invalid(index, str(e))
+    return await _apply(validos, resultados, operacao)
+
+async def bulk_delete(request: Request, operacao: Callable[[List[str]], List[Dict[str, Any]]]) -> Dict[str, Any]:
+    """Remove os IDs recebidos (strings ou objetos com "id")"""
+    itens = await read_bulk_items(request)
+    resultados: List[Optional[Dict[str, Any]]] = [None] * len(itens)
+    validos = []
+    for index, item in enumerate(itens):
+        item_id = item.get("id") if isinstance(item, dict) else item
+        if not isinstance(item_id, str) or not item_id:
+            resultados[index] = _invalid(index, "ID ausente ou inválido")
+            continue
+        validos.append((index, item_id))
+    return await _apply(validos, resultados, operacao)
@@ -1,74 +1,122 @@
-from fastapi import APIRouter, HTTPException
-from typing import List
-from ..models import Cidade, CidadeInDB
-from ..config import MONGO_URI, MONGO_DB_NAME
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from functools import partial
+from typing import Optional
+from ..models import Cidade
+from ..config import MAX_PAGE_SIZE
+from ..database import get_mongo_repo
+from ..repositories.mongo_repository import MongoRepository
+from .bulk import bulk_create, bulk_update, bulk_delete
+from .pagination import paginate
 
 router = APIRouter()
 
 @router.post("/cidades/")
-def create_cidade(cidade: Cidade):
-    from ..repositories.mongo_repository import MongoRepository
-    
-    mongo_repo = MongoRepository(uri=MONGO_URI, db_name=MONGO_DB_NAME)
+def create_cidade(cidade: Cidade, mongo_repo: MongoRepository = Depends(get_mongo_repo)):
     cidade_dict = cidade.model_dump()
     cidade_id = mongo_repo.add_cidade(cidade_dict)
-    
+
     return {**cidade_dict, "id": cidade_id}
 
+@router.post("/cidades/bulk")
+async def bulk_create_cidades(request: Request, mongo_repo: MongoRepository = Depends(get_mongo_repo)):
+    """Carga em massa (array JSON ou NDJSON); resultado por item, na ordem recebida"""
+    return await bulk_create(request, Cidade, mongo_repo.bulk_add_cidades)
+
+@router.put("/cidades/bulk")
+async def bulk_update_cidades(request: Request, mongo_repo: MongoRepository = Depends(get_mongo_repo)):
+    """Atualização em massa: itens com "id" e os campos de Cidade; resultado por item"""
+    return await bulk_update(request, Cidade, mongo_repo.bulk_update_cidades)
+
+@router.delete("/cidades/bulk")
+async def bulk_delete_cidades(request: Request, mongo_repo: MongoRepository = Depends(get_mongo_repo)):
+    """Remoção em massa: array (ou NDJSON) de IDs; resultado por item"""
+    return await bulk_delete(request, mongo_repo.bulk_delete_cidades)
+
 @router.get("/cidades/")
-def read_cidades():
-    from ..repositories.mongo_repository import MongoRepository
-    
-    mongo_repo = MongoRepository(uri=MONGO_URI, db_name=MONGO_DB_NAME)
-    return mongo_repo.get_all_cidades()
+def read_cidades(
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    fields: Optional[str] = None,
+    estado: Optional[str] = None,
+    regiao: Optional[str] = None,
+    populacao_min: Optional[int] = Query(None, ge=0),
+    populacao_max: Optional[int] = Query(None, ge=0),
+    mongo_repo: MongoRepository = Depends(get_mongo_repo)
+):
+    """
+    Lista cidades paginando por _id (?limit=&after=) com projeção opcional (?fields=a,b)
+    e filtros resolvidos no MongoDB (?estado=&regiao=&populacao_min=&populacao_max=)
+    """
+    filtro = mongo_repo.cidades_filter(estado, regiao, populacao_min, populacao_max)
+    if not filtro:
+        return paginate(response, mongo_repo.get_cidades_page, mongo_repo.count_cidades, limit, after, fields)
+    return paginate(
+        response, partial(mongo_repo.find_cidades, filtro), partial(mongo_repo.count_cidades, filtro),
+        limit, after, fields
+    )
 
 @router.get("/cidades/{cidade_id}")
-def read_cidade(cidade_id: str):
-    from ..repositories.mongo_repository import MongoRepository
-    
-    mongo_repo = MongoRepository(uri=MONGO_URI, db_name=MONGO_DB_NAME)
+def read_cidade(cidade_id: str, mongo_repo: MongoRepository = Depends(get_mongo_repo)):
     db_cidade = mongo_repo.get_cidade_by_id(cidade_id)
     if db_cidade is None:
         raise HTTPException(status_code=404, detail="Cidade not found")
     return db_cidade
 
+@router.get("/cidades/{cidade_id}/corretores")
+def read_corretores_by_cidade(
+    cidade_id: str,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    fields: Optional[str] = None,
+    ativo: Optional[bool] = None,
+    expand: Optional[str] = Query(None, pattern="^cidades$"),
+    mongo_repo: MongoRepository = Depends(get_mongo_repo)
+):
+    """Corretores que atendem a cidade (índice multikey cidades_atendidas), paginados como /corretores/"""
+    if mongo_repo.get_cidade_by_id(cidade_id) is None:
+        raise HTTPException(status_code=404, detail="Cidade not found")
+
+    filtro = mongo_repo.corretores_filter(cidade_id, ativo)
+    return paginate(
+        response, partial(mongo_repo.find_corretores, filtro, expand_cidades=bool(expand)),
+        partial(mongo_repo.count_corretores, filtro), limit, after, fields
+    )
+
 @router.put("/cidades/{cidade_id}")
-def update_cidade(cidade_id: str, cidade: Cidade):
-    from ..repositories.mongo_repository import MongoRepository
-    
-    mongo_repo = MongoRepository(uri=MONGO_URI, db_name=MONGO_DB_NAME)
-    
+def update_cidade(cidade_id: str, cidade: Cidade, mongo_repo: MongoRepository = Depends(get_mongo_repo)):
     db_cidade = mongo_repo.get_cidade_by_id(cidade_id)
     if db_cidade is None:
         raise HTTPException(status_code=404, detail="Cidade not found")
-    
+
     cidade_dict = cidade.model_dump()
     mongo_repo.update_cidade(cidade_id, cidade_dict)
-    
+
     return {**cidade_dict, "id": cidade_id}
 
 @router.delete("/cidades/{cidade_id}")
-def delete_cidade(cidade_id: str):
-    from ..repositories.mongo_repository import MongoRepository
-    
-    mongo_repo = MongoRepository(uri=MONGO_URI, db_name=MONGO_DB_NAME)
-    
+def delete_cidade(cidade_id: str, mongo_repo: MongoRepository = Depends(get_mongo_repo)):
     db_cidade = mongo_repo.get_cidade_by_id(cidade_id)
     if db_cidade is None:
         raise HTTPException(status_code=404, detail="Cidade not found")
-    
+
     mongo_repo.delete_cidade(cidade_id)
-    
+
     return {"message": "Cidade deleted successfully", "id": cidade_id}
 
 @router.get("/cidades/estado/{estado}")
-def read_cidades_by_estado(estado: str):
-    """Busca todas as cidades de um estado específico"""
-    from ..repositories.mongo_repository import MongoRepository
-    
-    mongo_repo = MongoRepository(uri=MONGO_URI, db_name=MONGO_DB_NAME)
-    all_cidades = mongo_repo.get_all_cidades()
-    
-    cidades_estado = [c for c in all_cidades if c.get("estado", "").upper() == estado.upper()]
-    
-    return cidades_estado
\ No newline at end of file
+def read_cidades_by_estado(
+    estado: str,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    fields: Optional[str] = None,
+    mongo_repo: MongoRepository = Depends(get_mongo_repo)
+):
+    """Busca as cidades de um estado específico (filtro no MongoDB pelo índice estado_nome)"""
+    filtro = mongo_repo.cidades_filter(estado=estado)
+    return paginate(
+        response, partial(mongo_repo.find_cidades, filtro), partial(mongo_repo.count_cidades, filtro),
+        limit, after, fields
+    )
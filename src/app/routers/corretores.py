@@ -1,62 +1,92 @@
-from fastapi import APIRouter, HTTPException
-from typing import List
-from ..models import Corretor, CorretorInDB
-from ..config import MONGO_URI, MONGO_DB_NAME
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from functools import partial
+from typing import Optional
+from pymongo.errors import DuplicateKeyError
+from ..models import Corretor
+from ..config import MAX_PAGE_SIZE
+from ..database import get_mongo_repo
+from ..repositories.mongo_repository import MongoRepository
+from .bulk import bulk_create, bulk_update, bulk_delete
+from .pagination import paginate
 
 router = APIRouter()
 
 @router.post("/corretores/")
-def create_corretor(corretor: Corretor):
-    from ..repositories.mongo_repository import MongoRepository
-    
-    mongo_repo = MongoRepository(uri=MONGO_URI, db_name=MONGO_DB_NAME)
+def create_corretor(corretor: Corretor, mongo_repo: MongoRepository = Depends(get_mongo_repo)):
     corretor_dict = corretor.model_dump()
-    corretor_id = mongo_repo.add_corretor(corretor_dict)
-    
+    try:
+        corretor_id = mongo_repo.add_corretor(corretor_dict)
+    except DuplicateKeyError:
+        raise HTTPException(status_code=409, detail=f"CRECI {corretor.creci} já cadastrado")
+
     return {**corretor_dict, "id": corretor_id}
 
+@router.post("/corretores/bulk")
+async def bulk_create_corretores(request: Request, mongo_repo: MongoRepository = Depends(get_mongo_repo)):
+    """Carga em massa (array JSON ou NDJSON); CRECI duplicado é reportado no item, sem abortar os demais"""
+    return await bulk_create(request, Corretor, mongo_repo.bulk_add_corretores)
+
+@router.put("/corretores/bulk")
+async def bulk_update_corretores(request: Request, mongo_repo: MongoRepository = Depends(get_mongo_repo)):
+    """Atualização em massa: itens com "id" e os campos de Corretor; resultado por item"""
+    return await bulk_update(request, Corretor, mongo_repo.bulk_update_corretores)
+
+@router.delete("/corretores/bulk")
+async def bulk_delete_corretores(request: Request, mongo_repo: MongoRepository = Depends(get_mongo_repo)):
+    """Remoção em massa: array (ou NDJSON) de IDs; resultado por item"""
+    return await bulk_delete(request, mongo_repo.bulk_delete_corretores)
+
 @router.get("/corretores/")
-def read_corretores():
-    from ..repositories.mongo_repository import MongoRepository
-    
-    mongo_repo = MongoRepository(uri=MONGO_URI, db_name=MONGO_DB_NAME)
-    return mongo_repo.get_all_corretores()
+def read_corretores(
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    fields: Optional[str] = None,
+    cidade: Optional[str] = None,
+    ativo: Optional[bool] = None,
+    expand: Optional[str] = Query(None, pattern="^cidades$"),
+    mongo_repo: MongoRepository = Depends(get_mongo_repo)
+):
+    """
+    Lista corretores paginando por _id (?limit=&after=) com projeção opcional (?fields=a,b),
+    filtro por cidade atendida (?cidade=<id>) e status (?ativo=), e ?expand=cidades para
+    trazer nome e estado das cidades atendidas na mesma resposta
+    """
+    filtro = mongo_repo.corretores_filter(cidade, ativo)
+    if not filtro and not expand:
+        return paginate(response, mongo_repo.get_corretores_page, mongo_repo.count_corretores, limit, after, fields)
+    return paginate(
+        response, partial(mongo_repo.find_corretores, filtro, expand_cidades=bool(expand)),
+        partial(mongo_repo.count_corretores, filtro), limit, after, fields
+    )
 
 @router.get("/corretores/{corretor_id}")
-def read_corretor(corretor_id: str):
-    from ..repositories.mongo_repository import MongoRepository
-    
-    mongo_repo = MongoRepository(uri=MONGO_URI, db_name=MONGO_DB_NAME)
+def read_corretor(corretor_id: str, mongo_repo: MongoRepository = Depends(get_mongo_repo)):
     db_corretor = mongo_repo.get_corretor_by_id(corretor_id)
     if db_corretor is None:
         raise HTTPException(status_code=404, detail="Corretor not found")
     return db_corretor
 
 @router.put("/corretores/{corretor_id}")
-def update_corretor(corretor_id: str, corretor: Corretor):
-    from ..repositories.mongo_repository import MongoRepository
-    
-    mongo_repo = MongoRepository(uri=MONGO_URI, db_name=MONGO_DB_NAME)
-    
+def update_corretor(corretor_id: str, corretor: Corretor, mongo_repo: MongoRepository = Depends(get_mongo_repo)):
     db_corretor = mongo_repo.get_corretor_by_id(corretor_id)
     if db_corretor is None:
         raise HTTPException(status_code=404, detail="Corretor not found")
-    
+
     corretor_dict = corretor.model_dump()
-    mongo_repo.update_corretor(corretor_id, corretor_dict)
-    
+    try:
+        mongo_repo.update_corretor(corretor_id, corretor_dict)
+    except DuplicateKeyError:
+        raise HTTPException(status_code=409, detail=f"CRECI {corretor.creci} já cadastrado")
+
     return {**corretor_dict, "id": corretor_id}
 
 @router.delete("/corretores/{corretor_id}")
-def delete_corretor(corretor_id: str):
-    from ..repositories.mongo_repository import MongoRepository
-    
-    mongo_repo = MongoRepository(uri=MONGO_URI, db_name=MONGO_DB_NAME)
-    
+def delete_corretor(corretor_id: str, mongo_repo: MongoRepository = Depends(get_mongo_repo)):
     db_corretor = mongo_repo.get_corretor_by_id(corretor_id)
     if db_corretor is None:
         raise HTTPException(status_code=404, detail="Corretor not found")
 
     mongo_repo.delete_corretor(corretor_id)
-    
-    return {"message": "Corretor deleted successfully", "id": corretor_id}
\ No newline at end of file
+
+    return {"message": "Corretor deleted successfully", "id": corretor_id}
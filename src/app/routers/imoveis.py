@@ -1,32 +1,39 @@
-from fastapi import APIRouter, Depends, HTTPException
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from typing import List, Optional
 from ..models import Imovel, ImovelInDB
-from ..database import get_mongo_repo, get_chroma_repo
+from ..config import MAX_PAGE_SIZE, EXPORT_BATCH_SIZE, SYNC_CHUNK_SIZE, EMBEDDING_BATCH_SIZE
+from ..database import get_mongo_repo, get_embedding_service, get_job_service, get_search_cache
+from ..repositories.mongo_repository import MongoRepository
+from ..repositories.chroma_repository import ChromaRepository
 from ..services.indexing_service import IndexingService
 from ..services.embedding_service import EmbeddingService
-from ..config import REDIS_URL
-import redis
+from ..services.job_service import JobService
+from ..services.search_cache import SearchCache
+from ..tasks import sync_imoveis_job, seed_imoveis_job, clear_imoveis_job, JOB_SYNC, JOB_SEED, JOB_CLEAR
+from .bulk import bulk_create, bulk_update, bulk_delete
+from .pagination import paginate, parse_fields
+from .jobs import enqueue_job
 import json
+import zlib
 
 router = APIRouter()
 
 @router.post("/imoveis/sync-single/{imovel_id}")
-def sync_single_imovel(imovel_id: str):
+def sync_single_imovel(
+    imovel_id: str,
+    embedding_service: EmbeddingService = Depends(get_embedding_service),
+    mongo_repo: MongoRepository = Depends(get_mongo_repo),
+    search_cache: SearchCache = Depends(get_search_cache)
+):
     """Sincroniza um imóvel específico do MongoDB para o ChromaDB"""
     try:
-        from ..repositories.mongo_repository import MongoRepository
-        from ..repositories.chroma_repository import ChromaRepository
-        from ..config import MONGO_URI, MONGO_DB_NAME
-        from bson import ObjectId
-        
-        mongo_repo = MongoRepository(uri=MONGO_URI, db_name=MONGO_DB_NAME)
         chroma_repo = ChromaRepository(path="./chroma_db")
-        
+
         imovel_data = mongo_repo.get_imovel_by_id(imovel_id)
         if not imovel_data:
             return {"error": f"Imóvel {imovel_id} não encontrado no MongoDB"}
-        
-        from ..models import ImovelInDB
+
         imovel = ImovelInDB(
             id=str(imovel_data["id"]),
             titulo=imovel_data["titulo"],
@@ -34,178 +41,201 @@ def sync_single_imovel(imovel_id: str):
             especificacoes=imovel_data.get("especificacoes", [])
         )
 
-        embedding_service = EmbeddingService()
         indexing_service = IndexingService(embedding_service=embedding_service, chroma_repo=chroma_repo)
         indexing_service.index_single_imovel(imovel)
-        
+        search_cache.bump_version()
+
         return {
             "message": f"Imóvel {imovel_id} sincronizado com sucesso",
             "titulo": imovel.titulo,
             "id": imovel_id
         }
-        
+
     except Exception as e:
         return {"error": f"Erro na sincronização: {str(e)}", "imovel_id": imovel_id}
 
 @router.post("/imoveis/sync")
-def sync_mongo_to_chroma():
-    """Sincroniza todos os imóveis do MongoDB para o ChromaDB"""
+def sync_mongo_to_chroma(
+    response: Response,
+    chunk_size: int = Query(SYNC_CHUNK_SIZE, ge=1, le=5000),
+    batch_size: int = Query(EMBEDDING_BATCH_SIZE, ge=1, le=1024),
+    full: bool = False,
+    background: bool = False,
+    embedding_service: EmbeddingService = Depends(get_embedding_service),
+    mongo_repo: MongoRepository = Depends(get_mongo_repo),
+    job_service: JobService = Depends(get_job_service),
+    search_cache: SearchCache = Depends(get_search_cache)
+):
+    """
+    Sincroniza o MongoDB com o ChromaDB em blocos (encode e upsert em lote).
+    Por padrão é incremental: só reindexa imóveis novos/alterados e remove os excluídos.
+    Use ?full=true para forçar a reindexação de todos.
+    Com ?background=true roda como job no worker e responde 202 com o job_id (acompanhe em /jobs/{job_id}).
+    """
+    if background:
+        return enqueue_job(response, job_service, JOB_SYNC, sync_imoveis_job,
+                           chunk_size=chunk_size, batch_size=batch_size, full=full)
+
     try:
-        from ..repositories.mongo_repository import MongoRepository
-        from ..repositories.chroma_repository import ChromaRepository
-        from ..config import MONGO_URI, MONGO_DB_NAME
-        from bson import ObjectId
-        
-        mongo_repo = MongoRepository(uri=MONGO_URI, db_name=MONGO_DB_NAME)
         chroma_repo = ChromaRepository(path="./chroma_db")
-        
-        imoveis_data = mongo_repo.get_all_imoveis()
-        
-        if not imoveis_data:
-            return {"message": "Nenhum imóvel encontrado no MongoDB", "synced": 0}
-        
-        from ..models import ImovelInDB
-        imoveis = []
-        for data in imoveis_data:
-            try:
-                imovel = ImovelInDB(
-                    id=str(data["id"]),
-                    titulo=data["titulo"],
-                    descricao=data["descricao"],
-                    especificacoes=data.get("especificacoes", [])
-                )
-                imoveis.append(imovel)
-            except Exception as e:
-                print(f"Erro ao processar imóvel {data.get('id', 'N/A')}: {e}")
-                continue
-        
-        embedding_service = EmbeddingService()
         indexing_service = IndexingService(embedding_service=embedding_service, chroma_repo=chroma_repo)
-        
-        synced_count = 0
-        for imovel in imoveis:
-            try:
-                indexing_service.index_single_imovel(imovel)
-                synced_count += 1
-            except Exception as e:
-                print(f"Erro ao indexar imóvel {imovel.id}: {e}")
-                continue
-        
+
+        stats = indexing_service.sync_from_mongo(mongo_repo, chunk_size=chunk_size, batch_size=batch_size, full=full)
+        search_cache.bump_version()
+
+        if not stats["total"]:
+            return {"message": "Nenhum imóvel encontrado no MongoDB", "synced": 0}
+
         return {
-            "message": f"Sincronização concluída: {synced_count}/{len(imoveis_data)} imóveis indexados",
-            "synced": synced_count,
-            "total": len(imoveis_data)
+            "message": (
+                f"Sincronização concluída: {stats['synced']}/{stats['total']} imóveis indexados, "
+                f"{stats['unchanged']} inalterados, {stats['deleted']} removidos do índice"
+            ),
+            **stats
         }
-        
+
     except Exception as e:
         return {"error": f"Erro na sincronização: {str(e)}", "synced": 0}
 
 @router.post("/imoveis/")
-def create_imovel(imovel: Imovel):
-    from ..repositories.mongo_repository import MongoRepository
-    from ..config import MONGO_URI, MONGO_DB_NAME
-    
-    mongo_repo = MongoRepository(uri=MONGO_URI, db_name=MONGO_DB_NAME)
+def create_imovel(imovel: Imovel, mongo_repo: MongoRepository = Depends(get_mongo_repo)):
+    """Cria o imóvel; o repositório registra o evento de indexação no stream do integrador"""
     imovel_dict = imovel.model_dump()
-    imovel_id = mongo_repo.add_imovel(imovel_dict) 
-    
-    # Publish to Redis
-    r = redis.from_url(REDIS_URL)
-    r.publish("imoveis.create", json.dumps({
-        "_id": imovel_id,
-        "descricao": imovel_dict["descricao"],
-        **imovel_dict
-    }))
-    
+    imovel_id = mongo_repo.add_imovel(imovel_dict)
+
     return {**imovel_dict, "id": imovel_id}
 
+@router.post("/imoveis/bulk")
+async def bulk_create_imoveis(request: Request, mongo_repo: MongoRepository = Depends(get_mongo_repo)):
+    """Carga em massa (array JSON ou NDJSON): insert_many por bloco e um evento de indexação por bloco"""
+    return await bulk_create(request, Imovel, mongo_repo.bulk_add_imoveis)
+
+@router.put("/imoveis/bulk")
+async def bulk_update_imoveis(request: Request, mongo_repo: MongoRepository = Depends(get_mongo_repo)):
+    """Atualização em massa: itens com "id" e os campos de Imovel; resultado por item"""
+    return await bulk_update(request, Imovel, mongo_repo.bulk_update_imoveis)
+
+@router.delete("/imoveis/bulk")
+async def bulk_delete_imoveis(request: Request, mongo_repo: MongoRepository = Depends(get_mongo_repo)):
+    """Remoção em massa: array (ou NDJSON) de IDs; resultado por item"""
+    return await bulk_delete(request, mongo_repo.bulk_delete_imoveis)
+
+@router.post("/imoveis/seed")
+def seed_imoveis(
+    imoveis: List[Imovel],
+    response: Response,
+    chunk_size: int = Query(SYNC_CHUNK_SIZE, ge=1, le=5000),
+    job_service: JobService = Depends(get_job_service)
+):
+    """Carga em massa em background: insere no MongoDB e indexa no ChromaDB (responde 202 com o job_id)"""
+    return enqueue_job(response, job_service, JOB_SEED, seed_imoveis_job,
+                       imoveis=[imovel.model_dump() for imovel in imoveis], chunk_size=chunk_size)
+
 @router.get("/imoveis/")
-def read_imoveis():
-    from ..repositories.mongo_repository import MongoRepository
-    from ..config import MONGO_URI, MONGO_DB_NAME
-    
-    mongo_repo = MongoRepository(uri=MONGO_URI, db_name=MONGO_DB_NAME)
-    return mongo_repo.get_all_imoveis()
+def read_imoveis(
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    fields: Optional[str] = None,
+    mongo_repo: MongoRepository = Depends(get_mongo_repo)
+):
+    """Lista imóveis paginando por _id (?limit=&after=) com projeção opcional (?fields=a,b)"""
+    return paginate(response, mongo_repo.get_imoveis_page, mongo_repo.count_imoveis, limit, after, fields)
+
+def _ndjson_chunks(documentos, batch_size: int):
+    """Agrupa os documentos em blocos de linhas NDJSON (um bloco por lote do cursor)"""
+    linhas = []
+    for documento in documentos:
+        linhas.append(json.dumps(documento, ensure_ascii=False, default=str))
+        if len(linhas) >= batch_size:
+            yield ("\n".join(linhas) + "\n").encode("utf-8")
+            linhas = []
+    if linhas:
+        yield ("\n".join(linhas) + "\n").encode("utf-8")
+
+def _gzip_chunks(chunks):
+    compressor = zlib.compressobj(wbits=31)  # wbits=31 -> formato gzip
+    for chunk in chunks:
+        comprimido = compressor.compress(chunk)
+        if comprimido:
+            yield comprimido
+    yield compressor.flush()
+
+@router.get("/imoveis/export")
+def export_imoveis(
+    gzip: bool = False,
+    batch_size: int = Query(EXPORT_BATCH_SIZE, ge=1, le=10000),
+    fields: Optional[str] = None,
+    mongo_repo: MongoRepository = Depends(get_mongo_repo)
+):
+    """
+    Exporta o catálogo completo em NDJSON (um imóvel por linha), lendo direto do cursor do MongoDB.
+    O uso de memória é limitado a um lote de batch_size documentos, independente do tamanho da collection.
+    """
+    documentos = mongo_repo.iter_imoveis(batch_size=batch_size, projection=parse_fields(fields))
+    chunks = _ndjson_chunks(documentos, batch_size)
+
+    if gzip:
+        return StreamingResponse(
+            _gzip_chunks(chunks),
+            media_type="application/gzip",
+            headers={"Content-Disposition": 'attachment; filename="imoveis.ndjson.gz"'}
+        )
+    return StreamingResponse(
+        chunks,
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="imoveis.ndjson"'}
+    )
 
 @router.get("/imoveis/{imovel_id}")
-def read_imovel(imovel_id: str):
-    from ..repositories.mongo_repository import MongoRepository
-    from ..config import MONGO_URI, MONGO_DB_NAME
-    
-    mongo_repo = MongoRepository(uri=MONGO_URI, db_name=MONGO_DB_NAME)
+def read_imovel(imovel_id: str, mongo_repo: MongoRepository = Depends(get_mongo_repo)):
     db_imovel = mongo_repo.get_imovel_by_id(imovel_id)
     if db_imovel is None:
         raise HTTPException(status_code=404, detail="Imovel not found")
     return db_imovel
 
 @router.put("/imoveis/{imovel_id}")
-def update_imovel(imovel_id: str, imovel: Imovel):
-    from ..repositories.mongo_repository import MongoRepository
-    from ..config import MONGO_URI, MONGO_DB_NAME
-    
-    mongo_repo = MongoRepository(uri=MONGO_URI, db_name=MONGO_DB_NAME)
-    
+def update_imovel(
+    imovel_id: str,
+    imovel: Imovel,
+    mongo_repo: MongoRepository = Depends(get_mongo_repo)
+):
     db_imovel = mongo_repo.get_imovel_by_id(imovel_id)
     if db_imovel is None:
         raise HTTPException(status_code=404, detail="Imovel not found")
-    
+
     imovel_dict = imovel.model_dump()
     mongo_repo.update_imovel(imovel_id, imovel_dict)
-    
-    # Publish to Redis
-    r = redis.from_url(REDIS_URL)
-    r.publish("imoveis.update", json.dumps({
-        "_id": imovel_id,
-        "descricao": imovel_dict["descricao"],
-        **imovel_dict
-    }))
-    
+
     return {**imovel_dict, "id": imovel_id}
 
 @router.delete("/imoveis/all")
-def delete_all_imoveis():
-    """Limpa todos os imóveis do MongoDB"""
-    from ..repositories.mongo_repository import MongoRepository
-    from ..config import MONGO_URI, MONGO_DB_NAME
-    
-    mongo_repo = MongoRepository(uri=MONGO_URI, db_name=MONGO_DB_NAME)
-    
-    # Conta quantos imóveis existem antes de deletar
-    imoveis_antes = mongo_repo.get_all_imoveis()
-    count_antes = len(imoveis_antes)
-    
-    # Limpa a collection
-    mongo_repo.collection.delete_many({})
-    
-    # Publish to Redis
-    r = redis.from_url(REDIS_URL)
-    r.publish("imoveis.clear", json.dumps({
-        "action": "clear_all",
-        "deleted_count": count_antes
-    }))
-    
+def delete_all_imoveis(
+    response: Response,
+    background: bool = False,
+    mongo_repo: MongoRepository = Depends(get_mongo_repo),
+    job_service: JobService = Depends(get_job_service)
+):
+    """
+    Limpa todos os imóveis do MongoDB.
+    Com ?background=true roda como job, limpando também o ChromaDB, e responde 202 com o job_id.
+    """
+    if background:
+        return enqueue_job(response, job_service, JOB_CLEAR, clear_imoveis_job)
+
+    count_antes = mongo_repo.delete_all_imoveis()
+
     return {
-        "message": f"Todos os imóveis foram removidos do MongoDB", 
+        "message": f"Todos os imóveis foram removidos do MongoDB",
         "deleted_count": count_antes
     }
 
 @router.delete("/imoveis/{imovel_id}")
-def delete_imovel(imovel_id: str):
-    from ..repositories.mongo_repository import MongoRepository
-    from ..config import MONGO_URI, MONGO_DB_NAME
-    
-    mongo_repo = MongoRepository(uri=MONGO_URI, db_name=MONGO_DB_NAME)
-    
+def delete_imovel(imovel_id: str, mongo_repo: MongoRepository = Depends(get_mongo_repo)):
     db_imovel = mongo_repo.get_imovel_by_id(imovel_id)
     if db_imovel is None:
         raise HTTPException(status_code=404, detail="Imovel not found")
-    
+
     mongo_repo.delete_imovel(imovel_id)
-    
-    # Publish to Redis
-    r = redis.from_url(REDIS_URL)
-    r.publish("imoveis.delete", json.dumps({
-        "_id": imovel_id
-    }))
-    
-    return {"message": "Imovel deleted successfully", "id": imovel_id}
\ No newline at end of file
+
+    return {"message": "Imovel deleted successfully", "id": imovel_id}
@@ -0,0 +1,31 @@
+from fastapi import APIRouter, Depends, HTTPException, Response
+from ..database import get_job_service
+from ..services.job_service import JobService
+
+router = APIRouter()
+
+def enqueue_job(response: Response, job_service: JobService, kind: str, task, **kwargs) -> dict:
+    """Enfileira um job e responde 202 com o ID; 409 se já houver um job do mesmo tipo em andamento"""
+    job_id = job_service.enqueue(kind, task, **kwargs)
+    if job_id is None:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Já existe um job '{kind}' em andamento: {job_service.active_job(kind)}"
+        )
+    response.status_code = 202
+    return {"job_id": job_id, "kind": kind, "status_url": f"/jobs/{job_id}"}
+
+@router.get("/jobs/{job_id}")
+def read_job(job_id: str, job_service: JobService = Depends(get_job_service)):
+    """Status e progresso de um job (PENDING, STARTED, PROGRESS, SUCCESS, FAILURE, CANCELLED...)"""
+    status = job_service.get_status(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return status
+
+@router.delete("/jobs/{job_id}")
+def cancel_job(job_id: str, job_service: JobService = Depends(get_job_service)):
+    """Solicita o cancelamento; um job em execução para ao fim do bloco atual"""
+    if not job_service.cancel(job_id):
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {"message": "Cancelamento solicitado", "job_id": job_id}
@@ -0,0 +1,29 @@
+from fastapi import HTTPException, Response
+from bson.errors import InvalidId
+from typing import List, Dict, Any, Optional
+
+def parse_fields(fields: Optional[str]) -> Optional[Dict[str, int]]:
+    """Converte ?fields=titulo,descricao em uma projeção do MongoDB (o id sempre é retornado)"""
+    if not fields:
+        return None
+    campos = [campo.strip() for campo in fields.split(",") if campo.strip() and campo.strip() != "id"]
+    if not campos:
+        return {"_id": 1}
+    return {campo: 1 for campo in campos}
+
+def paginate(response: Response, fetch_page, count, limit: Optional[int], after: Optional[str],
+             fields: Optional[str]) -> List[Dict[str, Any]]:
+    """
+    Executa a consulta paginada e preenche os headers de paginação:
+    - X-Total-Count: total de documentos da collection
+    - X-Next-Cursor: valor para ?after= da próxima página (apenas se a página veio cheia)
+    """
+    try:
+        items = fetch_page(limit=limit, after=after, projection=parse_fields(fields))
+    except InvalidId as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    response.headers["X-Total-Count"] = str(count())
+    if limit and len(items) == limit:
+        response.headers["X-Next-Cursor"] = items[-1]["id"]
+    return items
@@ -1,66 +1,89 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query
 from typing import List, Dict, Any
 from pydantic import BaseModel
-from ..services.search_service import SearchService
+from ..models import SearchFilters
+from ..services.search_service import SearchService, SEARCH_MODE_SEMANTIC, HYDRATION_PROJECTION
 from ..services.embedding_service import EmbeddingService
 from ..services.llm_reranking_service import LLMRerankingService
-from ..database import get_chroma_repo, get_mongo_repo
+from ..services.search_cache import SearchCache
+from ..database import get_mongo_repo, get_async_mongo_repo, get_embedding_service, get_search_cache
+from ..repositories.mongo_repository import MongoRepository
+from ..repositories.async_mongo_repository import AsyncMongoRepository
+from ..repositories.chroma_repository import ChromaRepository
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+SEARCH_TYPES = {
+    "semantic": "semantic_cosine_similarity",
+    "lexical": "lexical_text_index",
+    "hybrid": "hybrid_reciprocal_rank_fusion"
+}
+
 @router.get("/search-test")
 def search_test():
     return {"message": "Search endpoint is working", "test": True}
 
 @router.get("/search/")
-def search_imoveis(query: str = "casa com piscina", n_results: int = 30):
+async def search_imoveis(
+    query: str = "casa com piscina",
+    n_results: int = 30,
+    mode: str = Query(SEARCH_MODE_SEMANTIC, pattern="^(semantic|lexical|hybrid)$"),
+    filters: SearchFilters = Depends(),
+    embedding_service: EmbeddingService = Depends(get_embedding_service),
+    async_mongo_repo: AsyncMongoRepository = Depends(get_async_mongo_repo),
+    search_cache: SearchCache = Depends(get_search_cache)
+):
     """
     Busca semântica por imóveis - Implementação correta da arquitetura
     Fluxo: Query → Embedding → ChromaDB (similaridade cosseno) → MongoDB (conteúdo completo)
+    mode=lexical usa o índice de texto do MongoDB; mode=hybrid combina os dois rankings por reciprocal-rank fusion.
+    Filtros opcionais (?preco_max=2000&quartos_min=3&cidade=Goiânia...) são aplicados no ChromaDB antes do ranking.
+    Respostas repetidas saem do cache enquanto a versão do índice não mudar.
+    A rota é assíncrona: encode, ChromaDB e MongoDB não prendem uma thread do servidor por busca.
     """
+    index_version = await asyncio.to_thread(search_cache.index_version)
+    filtros = filters.model_dump(exclude_none=True)
+    cache_filters = {**filtros, "mode": mode}
+    # Mesma chave do cache de embeddings: consultas que geram vetores diferentes não dividem a resposta
+    query_key = embedding_service.cache_key(query)
+    cached = search_cache.get(query_key, n_results, cache_filters, index_version)
+    if cached is not None:
+        return {**cached, "cached": True}
+
     try:
-        from ..repositories.mongo_repository import MongoRepository
-        from ..repositories.chroma_repository import ChromaRepository
-        from ..config import MONGO_URI, MONGO_DB_NAME
-        
-        mongo_repo = MongoRepository(uri=MONGO_URI, db_name=MONGO_DB_NAME)
-        chroma_repo = ChromaRepository(path="./chroma_db")
+        chroma_repo = await asyncio.to_thread(ChromaRepository, path="./chroma_db")
         
-        embedding_service = EmbeddingService()
         search_service = SearchService(
             embedding_service=embedding_service, 
             chroma_repo=chroma_repo, 
-            mongo_repo=mongo_repo
+            async_mongo_repo=async_mongo_repo
         )
         
-        results = search_service.search(query=query, n_results=n_results)
+        results = await search_service.asearch(query=query, n_results=n_results, filters=filters, mode=mode)
         
-        return {
+        response = {
             "query": query,
             "results": results,
             "total_found": len(results),
-            "search_type": "semantic_cosine_similarity", #
-            "architecture": "ChromaDB (embeddings) + MongoDB (content)"
+            "search_type": SEARCH_TYPES[mode],
+            "architecture": "ChromaDB (embeddings) + MongoDB (content)",
+            "filters": filtros,
+            "timings_ms": search_service.timings
         }
+        search_cache.set(query_key, n_results, cache_filters, index_version, response)
+        return {**response, "cached": False}
         
     except Exception as e:
-        from pymongo import MongoClient
-        
+        # Respostas de fallback/erro não entram no cache
+        logger.warning(f"Busca semântica falhou, usando o índice de texto: {e}")
         try:
-            client = MongoClient("mongodb://localhost:27017")
-            db = client["spd_imoveis"]
-            collection = db["imoveis"]
-            
-            fallback_results = list(collection.find({
-                "$or": [
-                    {"titulo": {"$regex": query, "$options": "i"}},
-                    {"descricao": {"$regex": query, "$options": "i"}}
-                ]
-            }).limit(n_results))
-            
-            for result in fallback_results:
-                result["id"] = str(result["_id"])
-                del result["_id"]
+            fallback_results = await async_mongo_repo.search_imoveis_text(
+                query, n_results, projection=HYDRATION_PROJECTION, filtro=SearchService.build_mongo_filter(filters)
+            )
             
             return {
                 "query": query,
@@ -85,7 +108,7 @@ class FeedbackRequest(BaseModel):
     remaining_properties: List[Dict[str, Any]]
 
 @router.post("/rerank/")
-def rerank_with_feedback(feedback: FeedbackRequest):
+def rerank_with_feedback(feedback: FeedbackRequest, mongo_repo: MongoRepository = Depends(get_mongo_repo)):
     """
     Re-ranking inteligente usando LLM baseado no feedback do usuário
     """
@@ -99,11 +122,6 @@ def rerank_with_feedback(feedback: FeedbackRequest):
             remaining_properties=feedback.remaining_properties
         )
         
-        from ..repositories.mongo_repository import MongoRepository
-        from ..config import MONGO_URI, MONGO_DB_NAME
-        
-        mongo_repo = MongoRepository(uri=MONGO_URI, db_name=MONGO_DB_NAME)
-        
         enhanced_results = []
         decision_reasoning = ""
         
@@ -113,13 +131,15 @@ def rerank_with_feedback(feedback: FeedbackRequest):
         else:
             selected_properties = llm_response if isinstance(llm_response, list) else []
         
+        reasons = {}
         for item in selected_properties:
             imovel_id = item.get("id")
-            if imovel_id:
-                imovel_data = mongo_repo.get_imovel_by_id(imovel_id)
-                if imovel_data:
-                    imovel_data["llm_reason"] = item.get("reason", "Selecionado pela IA")
-                    enhanced_results.append(imovel_data)
+            if imovel_id and imovel_id not in reasons:
+                reasons[imovel_id] = item.get("reason", "Selecionado pela IA")
+        
+        for imovel_data in mongo_repo.get_imoveis_by_ids(list(reasons)):
+            imovel_data["llm_reason"] = reasons[imovel_data["id"]]
+            enhanced_results.append(imovel_data)
         
         return {
             "query": feedback.query,
@@ -138,11 +158,15 @@ def rerank_with_feedback(feedback: FeedbackRequest):
             "error": f"Erro no re-ranking: {str(e)}"
         }
 
+@router.get("/search/cache")
+def search_cache_stats(search_cache: SearchCache = Depends(get_search_cache)):
+    """Estatísticas do cache de buscas (hits, misses, versão do índice)"""
+    return search_cache.stats()
+
 @router.delete("/search/clear")
-def clear_chroma_db():
+def clear_chroma_db(search_cache: SearchCache = Depends(get_search_cache)):
     """Limpa todos os dados do ChromaDB"""
     try:
-        from ..repositories.chroma_repository import ChromaRepository
         from ..config import CHROMA_HOST, CHROMA_PORT
         
         # Tenta usar ChromaDB via HTTP primeiro, depois local
@@ -170,6 +194,7 @@ def clear_chroma_db():
         
         # Recria a collection
         chroma_repo.collection = chroma_repo.client.get_or_create_collection(name="imoveis")
+        search_cache.bump_version()
         
         return {
             "message": "ChromaDB limpo com sucesso",
@@ -1,10 +1,52 @@
-from typing import List
-import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
 from sentence_transformers import SentenceTransformer
+import asyncio
+import hashlib
+import json
 import os
+import threading
+import time
+import logging
+
+from ..config import (
+    EMBEDDING_MODEL_NAME, EMBEDDING_BATCH_SIZE, EMBEDDING_CACHE_SIZE, EMBEDDING_CACHE_TTL_SECONDS,
+    EMBEDDING_EXECUTOR_WORKERS, EMBEDDING_MICROBATCH_MAX_WAIT_MS, EMBEDDING_MICROBATCH_MAX_SIZE
+)
+from .query_batcher import QueryBatcher
+from .ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
 
 class EmbeddingService:
-    def __init__(self, model_name: str = "all-MiniLM-L6-v2"):
+    def __init__(self, model_name: str = EMBEDDING_MODEL_NAME, cache_size: int = EMBEDDING_CACHE_SIZE,
+                 cache_ttl_seconds: int = EMBEDDING_CACHE_TTL_SECONDS, redis_client=None,
+                 microbatch_max_wait_ms: float = EMBEDDING_MICROBATCH_MAX_WAIT_MS,
+                 microbatch_max_size: int = EMBEDDING_MICROBATCH_MAX_SIZE):
+        self.model_name = model_name
+        self._lock = threading.Lock()
+        self._ready = False
+        self.load_time_seconds = None
+        self.warmup_time_seconds = None
+
+        # Cache de consultas (embed_query): memória local e, se houver redis_client, camada compartilhada
+        self.query_cache = TTLCache(max_size=cache_size, ttl_seconds=cache_ttl_seconds)
+        self.redis = redis_client
+        self.redis_hits = 0
+
+        # Encode é CPU-bound: no caminho assíncrono roda nestas threads, fora do event loop
+        self._executor = ThreadPoolExecutor(max_workers=EMBEDDING_EXECUTOR_WORKERS, thread_name_prefix="embedding")
+
+        # Consultas concorrentes que erram o cache são agrupadas em um único encode
+        self.batcher = None
+        if microbatch_max_wait_ms > 0 and microbatch_max_size > 1:
+            self.batcher = QueryBatcher(
+                encode_fn=lambda texts: self.create_embeddings(texts, batch_size=len(texts)),
+                max_wait_ms=microbatch_max_wait_ms,
+                max_batch_size=microbatch_max_size
+            )
+
+        inicio = time.perf_counter()
         try:
             cache_dir = "./models"
             os.makedirs(cache_dir, exist_ok=True)
@@ -13,6 +55,10 @@ class EmbeddingService:
             print(f"Erro ao carregar modelo: {e}")
             self.model = None
             self._setup_simple_embedding()
+        self.load_time_seconds = time.perf_counter() - inicio
+        # Só modelos uncased (e o TF-IDF) ignoram a caixa: nos demais ela faz parte da chave do cache
+        tokenizer = getattr(self.model, "tokenizer", None)
+        self.uncased = self.model is None or getattr(tokenizer, "do_lower_case", False) is True
 
     def _setup_simple_embedding(self):
         """Setup de embedding simples usando TF-IDF como fallback"""
@@ -20,17 +66,129 @@ class EmbeddingService:
         self.vectorizer = TfidfVectorizer(max_features=384, stop_words=None)
         self._is_fitted = False
 
-    def create_embeddings(self, texts: List[str]) -> List[List[float]]:
+    def warm_up(self):
+        """Executa um encode inicial para carregar pesos e kernels antes do primeiro request"""
+        inicio = time.perf_counter()
         if self.model is not None:
-            return self.model.encode(texts).tolist()
+            self.create_embeddings(["aquecimento do modelo de embeddings"])
+        self.warmup_time_seconds = time.perf_counter() - inicio
+        self._ready = True
+        logger.info(f"Modelo {self.model_name} aquecido em {self.warmup_time_seconds:.2f}s")
+
+    @property
+    def is_ready(self) -> bool:
+        return self._ready
+
+    def get_status(self) -> dict:
+        """Retorna o estado do modelo de embeddings (usado no health check)"""
+        return {
+            "ready": self._ready,
+            "model_name": self.model_name,
+            "backend": "sentence_transformers" if self.model is not None else "tfidf_fallback",
+            "load_time_seconds": self.load_time_seconds,
+            "warmup_time_seconds": self.warmup_time_seconds,
+            "query_cache": self.cache_stats(),
+            "query_batching": self.batcher.stats() if self.batcher else {"enabled": False}
+        }
+
+    def cache_stats(self) -> dict:
+        return {**self.query_cache.stats(), "redis_enabled": self.redis is not None, "redis_hits": self.redis_hits}
+
+    def cache_key(self, text: str) -> str:
+        """
+        Chave dos caches de embeddings e de respostas da busca: espaços normalizados
+        e, se o modelo for uncased, caixa também
+        """
+        key = " ".join(text.split())
+        return key.lower() if self.uncased else key
+
+    def _redis_key(self, query: str) -> str:
+        digest = hashlib.sha1(query.encode("utf-8")).hexdigest()
+        return f"embedding:{self.model_name}:{digest}"
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embedding de uma consulta de busca, com cache LRU (memória → Redis → modelo)"""
+        key = self.cache_key(text)
+        embedding = self.query_cache.get((self.model_name, key))
+        if embedding is not None:
+            return embedding
+        return self._embed_query_uncached(key, text)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        """
+        Versão assíncrona de embed_query: hits do cache local respondem direto;
+        o encode aguarda o lote do micro-batching sem ocupar uma thread por consulta.
+        """
+        key = self.cache_key(text)
+        embedding = self.query_cache.get((self.model_name, key))
+        if embedding is not None:
+            return embedding
+
+        loop = asyncio.get_running_loop()
+        if self.batcher is None:
+            return await loop.run_in_executor(self._executor, self._embed_query_uncached, key, text)
+
+        if self.redis is not None:
+            embedding = await loop.run_in_executor(self._executor, self._get_shared, key)
+            if embedding is not None:
+                return embedding
+
+        embedding = await asyncio.wrap_future(self.batcher.submit(text))
+        self.query_cache.set((self.model_name, key), embedding)
+        if self.redis is not None:
+            loop.run_in_executor(self._executor, self._set_shared, key, embedding)
+        return embedding
+
+    def _get_shared(self, query: str) -> Optional[List[float]]:
+        """Camada do Redis: um hit também é guardado no cache local"""
+        try:
+            cached = self.redis.get(self._redis_key(query))
+        except Exception as e:
+            logger.warning(f"Cache de embeddings no Redis indisponível: {e}")
+            return None
+        if not cached:
+            return None
+        embedding = json.loads(cached)
+        self.redis_hits += 1
+        self.query_cache.set((self.model_name, query), embedding)
+        return embedding
+
+    def _set_shared(self, query: str, embedding: List[float]):
+        try:
+            self.redis.set(self._redis_key(query), json.dumps(embedding), ex=self.query_cache.ttl_seconds)
+        except Exception as e:
+            logger.warning(f"Cache de embeddings no Redis indisponível: {e}")
+
+    def _embed_query_uncached(self, key: str, text: str) -> List[float]:
+        """Encode do texto original; key (cache_key) identifica o vetor nos caches"""
+        if self.redis is not None:
+            embedding = self._get_shared(key)
+            if embedding is not None:
+                return embedding
+
+        if self.batcher is not None:
+            embedding = self.batcher.encode(text)
+        else:
+            embedding = self.create_embeddings([text])[0]
+        self.query_cache.set((self.model_name, key), embedding)
+
+        if self.redis is not None:
+            self._set_shared(key, embedding)
+        return embedding
+
+    def create_embeddings(self, texts: List[str], batch_size: Optional[int] = None) -> List[List[float]]:
+        if self.model is not None:
+            return self.model.encode(texts, batch_size=batch_size or EMBEDDING_BATCH_SIZE).tolist()
         else:
             return self._create_tfidf_embeddings(texts) #Só estamos usando TD-IDF pois o Ollama tá com problema
 
     def _create_tfidf_embeddings(self, texts: List[str]) -> List[List[float]]:
         """Criar embeddings usando TF-IDF como fallback"""
-        if not self._is_fitted:
-            self.vectorizer.fit(texts)
-            self._is_fitted = True
-        
-        vectors = self.vectorizer.transform(texts)
-        return vectors.toarray().tolist()
\ No newline at end of file
+        # O vetorizador não é thread-safe durante o fit
+        with self._lock:
+            if not self._is_fitted:
+                self.vectorizer.fit(texts)
+                self._is_fitted = True
+
+            vectors = self.vectorizer.transform(texts)
+        return vectors.toarray().tolist()
@@ -0,0 +1,257 @@
+from typing import List, Dict, Any, Optional, Tuple, Collection
+from redis.exceptions import ResponseError
+from ..config import (
+    EVENTS_STREAM_KEY, EVENTS_STREAM_MAXLEN, EVENTS_CONSUMER_GROUP, EVENTS_CLAIM_IDLE_MS, EVENTS_MAX_DELIVERIES,
+    EVENTS_SCHEMA_VERSION
+)
+import json
+import logging
+import redis
+import zlib
+
+logger = logging.getLogger(__name__)
+
+# (id da entrada no stream, campos {"v": ..., "op": ..., "ids": ...})
+Entry = Tuple[str, Dict[str, str]]
+
+# Operações de um evento, aplicadas pelo integrador
+ACTION_UPSERT = "upsert"
+ACTION_DELETE = "delete"
+ACTION_CLEAR = "clear"
+ACTIONS = (ACTION_UPSERT, ACTION_DELETE, ACTION_CLEAR)
+
+def parse_event(campos: Dict[str, str]) -> Tuple[Optional[str], List[str]]:
+    """
+    Traduz uma entrada do stream em (ação, IDs); (None, []) para eventos desconhecidos.
+    Levanta ValueError se a entrada estiver malformada (ex.: ids que não são uma lista JSON).
+    """
+    if "v" in campos:
+        if campos["v"] != EVENTS_SCHEMA_VERSION or campos.get("op") not in ACTIONS:
+            return None, []
+        ids = json.loads(campos.get("ids") or "[]")
+        if not isinstance(ids, list):
+            raise ValueError(f"ids deve ser uma lista JSON: {campos.get('ids')!r}")
+        return campos["op"], [str(item_id) for item_id in ids]
+
+    # Formato anterior ({"type": "imoveis.<ação>", "data": ...}), ainda retido no stream após a atualização
+    tipo = campos.get("type", "")
+    bruto = campos.get("data") or ""
+    try:
+        data = json.loads(bruto)
+    except ValueError:
+        data = bruto  # payload com o ID puro
+    if not isinstance(data, dict):
+        data = {"_id": str(data)}
+
+    if tipo == "imoveis.bulk":
+        return data.get("action"), [str(item_id) for item_id in data.get("ids", [])]
+    if tipo == "imoveis.clear":
+        return ACTION_CLEAR, []
+    if tipo in ("imoveis.create", "imoveis.update"):
+        return ACTION_UPSERT, [str(data["_id"])] if data.get("_id") else []
+    if tipo == "imoveis.delete":
+        return ACTION_DELETE, [str(data["_id"])] if data.get("_id") else []
+    return None, []
+
+# Tipos de alteração do change stream do MongoDB -> ação no ChromaDB
+CHANGE_OPERATIONS = {
+    "insert": ACTION_UPSERT,
+    "update": ACTION_UPSERT,
+    "replace": ACTION_UPSERT,
+    "delete": ACTION_DELETE,
+    "drop": ACTION_CLEAR,
+    "rename": ACTION_CLEAR,
+    "dropDatabase": ACTION_CLEAR
+}
+
+def parse_change(change: Dict[str, Any]) -> Tuple[Optional[str], List[str]]:
+    """Traduz uma alteração do change stream em (ação, IDs), no mesmo formato de parse_event"""
+    acao = CHANGE_OPERATIONS.get(change.get("operationType"))
+    if acao == ACTION_CLEAR:
+        return acao, []
+    item_id = (change.get("documentKey") or {}).get("_id")
+    if acao is None or item_id is None:
+        return None, []
+    return acao, [str(item_id)]
+
+def shard_for(item_id: str, shards: int) -> int:
+    """Worker responsável pelo documento: estável entre processos (crc32, não o hash() aleatorizado do Python)"""
+    return zlib.crc32(item_id.encode("utf-8")) % shards
+
+def coalesce_actions(acoes: List[Tuple[str, str]]) -> Dict[str, List[str]]:
+    """Reduz [(ação, id)] em ordem ao estado final de cada documento: vale a última ação de cada id"""
+    finais: Dict[str, str] = {}
+    for acao, item_id in acoes:
+        finais.pop(item_id, None)  # reinsere no fim para manter a ordem da última ação
+        finais[item_id] = acao
+    return {
+        "upsert": [item_id for item_id, acao in finais.items() if acao == ACTION_UPSERT],
+        "delete": [item_id for item_id, acao in finais.items() if acao == ACTION_DELETE]
+    }
+
+def coalesce_events(lote: List[Dict[str, str]]) -> Dict[str, Any]:
+    """
+    Reduz um lote de eventos ao estado final de cada documento, na ordem do stream:
+    create/update seguidos viram um upsert, qualquer sequência que termina em delete vira delete
+    e um clear descarta tudo que veio antes dele no lote.
+    Retorna {"clear": bool, "upsert": [ids], "delete": [ids], "ignored": n}.
+    """
+    return _coalesce([parse_event(campos) for campos in lote])
+
+def coalesce_changes(lote: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Como coalesce_events, para um lote de alterações do change stream do MongoDB"""
+    return _coalesce([parse_change(change) for change in lote])
+
+def _coalesce(eventos: List[Tuple[Optional[str], List[str]]]) -> Dict[str, Any]:
+    clear = False
+    acoes: List[Tuple[str, str]] = []
+    ignorados = 0
+    for acao, ids in eventos:
+        if acao == ACTION_CLEAR:
+            clear = True
+            acoes = []
+        elif acao in (ACTION_UPSERT, ACTION_DELETE):
+            acoes += [(acao, item_id) for item_id in ids]
+        else:
+            ignorados += 1
+    return {"clear": clear, **coalesce_actions(acoes), "ignored": ignorados}
+
+class EventLog:
+    """
+    Log durável dos eventos de escrita dos imóveis em um Redis Stream.
+    Diferente do pub/sub, um evento publicado com o integrador parado fica no stream até ser lido:
+    cada réplica do integrador lê pelo mesmo consumer group (o Redis guarda o offset do grupo),
+    confirma com XACK depois de aplicar no ChromaDB e reassume entregas de réplicas que morreram
+    antes do ack. A entrega é "ao menos uma vez", então o processamento precisa ser idempotente (upsert/delete).
+    """
+    def __init__(self, redis_client: redis.Redis, stream: str = EVENTS_STREAM_KEY, maxlen: int = EVENTS_STREAM_MAXLEN):
+        self.redis = redis_client
+        self.stream = stream
+        self.maxlen = maxlen
+        self.dead_letter_stream = f"{stream}.dead"
+        self.workers_key = f"{stream}.workers"
+
+    def publish(self, op: str, ids: List[str] = ()) -> str:
+        """
+        Acrescenta o evento ao stream (MAXLEN aproximado limita a memória) e retorna o id da entrada.
+        O evento leva só a operação e os IDs: o integrador lê o estado atual dos imóveis no MongoDB.
+        """
+        return self.redis.xadd(
+            self.stream, {"v": EVENTS_SCHEMA_VERSION, "op": op, "ids": json.dumps(list(ids))},
+            maxlen=self.maxlen, approximate=True
+        )
+
+    def ensure_group(self, group: str = EVENTS_CONSUMER_GROUP, start_id: str = "0"):
+        """Cria o consumer group (e o stream) se ainda não existir; start_id="0" processa o histórico retido"""
+        try:
+            self.redis.xgroup_create(self.stream, group, id=start_id, mkstream=True)
+        except ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    def replay_from(self, entry_id: str, group: str = EVENTS_CONSUMER_GROUP) -> bool:
+        """
+        Reposiciona o offset do grupo: as entradas depois de entry_id serão entregues de novo.
+        Vale uma vez por entry_id (gravado em {stream}.replay:{group}): reinícios com a mesma
+        INTEGRADOR_REPLAY_FROM ainda definida não repetem o replay. Retorna False se já foi aplicado.
+        """
+        chave = f"{self.stream}.replay:{group}"
+        if self.redis.get(chave) == entry_id:
+            return False
+        self.redis.xgroup_setid(self.stream, group, entry_id)
+        self.redis.set(chave, entry_id)
+        return True
+
+    def _entries(self, resposta) -> List[Entry]:
+        if not resposta:
+            return []
+        if isinstance(resposta, dict):  # RESP3
+            return [entry for entries in resposta.values() for entry in (entries[0] if entries else [])]
+        return [entry for _, entries in resposta for entry in entries]
+
+    def read(self, consumer: str, count: int = 100, block_ms: Optional[int] = 1000,
+             group: str = EVENTS_CONSUMER_GROUP) -> List[Entry]:
+        """Próximas entradas ainda não entregues a nenhum consumidor do grupo"""
+        return self._entries(self.redis.xreadgroup(group, consumer, {self.stream: ">"}, count=count, block=block_ms))
+
+    def read_pending(self, consumer: str, count: int = 100, group: str = EVENTS_CONSUMER_GROUP) -> List[Entry]:
+        """Entradas já entregues a este consumidor e ainda sem ack (ex.: reinício no meio de um lote)"""
+        return self._entries(self.redis.xreadgroup(group, consumer, {self.stream: "0"}, count=count))
+
+    def claim_stale(self, consumer: str, min_idle_ms: int = EVENTS_CLAIM_IDLE_MS, count: int = 100,
+                    group: str = EVENTS_CONSUMER_GROUP, in_flight: Collection[str] = ()) -> List[Entry]:
+        """
+        Reassume entregas paradas há mais de min_idle_ms (réplica que caiu antes do ack).
+        Entradas que já excederam EVENTS_MAX_DELIVERIES vão para o dead letter em vez de voltar ao processamento.
+        in_flight são entradas deste consumidor ainda em processamento (ex.: na fila de um worker lento):
+        o XCLAIM JUSTID zera o tempo ocioso delas sem contar entrega, então não são reassumidas nem descartadas.
+        """
+        if in_flight:
+            self.redis.xclaim(self.stream, group, consumer, 0, list(in_flight), justid=True)
+        resposta = self.redis.xautoclaim(self.stream, group, consumer, min_idle_ms, start_id="0-0", count=count)
+        entries = [entry for entry in (resposta[1] if resposta else []) if entry[0] not in in_flight]
+        if not entries:
+            return []
+
+        validas = []
+        for entry_id, campos in entries:
+            if campos is None:
+                # A entrada foi cortada pelo MAXLEN enquanto estava pendente
+                self.ack([entry_id], group)
+            elif self.deliveries(entry_id, group) > EVENTS_MAX_DELIVERIES:
+                self.dead_letter(entry_id, campos, group)
+            else:
+                validas.append((entry_id, campos))
+        return validas
+
+    def deliveries(self, entry_id: str, group: str = EVENTS_CONSUMER_GROUP) -> int:
+        """
+        Quantas vezes a entrada já foi entregue. A consulta é pela entrada exata: num intervalo com count,
+        outras pendências do consumidor (ex.: em processamento) podem ocupar o limite e esconder a entrada
+        """
+        pendentes = self.redis.xpending_range(self.stream, group, min=entry_id, max=entry_id, count=1)
+        return pendentes[0]["times_delivered"] if pendentes else 0
+
+    def dead_letter(self, entry_id: str, campos: Dict[str, str], group: str = EVENTS_CONSUMER_GROUP,
+                    error: Optional[str] = None):
+        """
+        Move para o stream de dead letter um evento que falha repetidamente (ou que nem pode ser lido,
+        com error preenchido) e confirma o original
+        """
+        motivo = error or f"excedeu {EVENTS_MAX_DELIVERIES} entregas"
+        logger.error(f"Evento {entry_id} ({campos.get('op', campos.get('type'))}) enviado ao dead letter: {motivo}")
+        self.redis.xadd(self.dead_letter_stream, {**campos, "original_id": entry_id, **({"error": error} if error else {})},
+                        maxlen=self.maxlen, approximate=True)
+        self.ack([entry_id], group)
+
+    def ack(self, entry_ids: List[str], group: str = EVENTS_CONSUMER_GROUP) -> int:
+        if not entry_ids:
+            return 0
+        return self.redis.xack(self.stream, group, *entry_ids)
+
+    def report_worker(self, worker: str, metricas: Dict[str, Any]):
+        """Métricas de um worker do integrador (fila, lag, processados), lidas em stats()"""
+        self.redis.hset(self.workers_key, worker, json.dumps(metricas))
+
+    def stats(self, group: str = EVENTS_CONSUMER_GROUP) -> Dict[str, Any]:
+        """Tamanho do stream, pendências e atraso (lag) do grupo e métricas por worker do integrador"""
+        try:
+            grupos = {info["name"]: info for info in self.redis.xinfo_groups(self.stream)}
+            length = self.redis.xlen(self.stream)
+        except ResponseError:
+            return {"stream": self.stream, "length": 0, "group": None, "workers": {}}
+        info = grupos.get(group)
+        return {
+            "stream": self.stream,
+            "length": length,
+            "workers": {
+                worker: json.loads(metricas) for worker, metricas in (self.redis.hgetall(self.workers_key) or {}).items()
+            },
+            "group": None if info is None else {
+                "name": group,
+                "consumers": info.get("consumers"),
+                "pending": info.get("pending"),
+                "last_delivered_id": info.get("last-delivered-id"),
+                "lag": info.get("lag")
+            }
+        }
@@ -1,50 +1,172 @@
 from ..services.embedding_service import EmbeddingService
 from ..repositories.chroma_repository import ChromaRepository
 from ..models import ImovelInDB
-from typing import List
+from ..atributos import extrair_atributos
+from ..config import SYNC_CHUNK_SIZE, EMBEDDING_BATCH_SIZE
+from typing import List, Dict, Any, Callable, Optional
+import hashlib
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Incrementar quando o formato da metadata mudar: força a reindexação no próximo sync incremental
+METADATA_VERSION = 2
 
 class IndexingService:
     def __init__(self, embedding_service: EmbeddingService, chroma_repo: ChromaRepository):
         self.embedding_service = embedding_service
         self.chroma_repo = chroma_repo
 
+    @staticmethod
+    def build_document(imovel: ImovelInDB) -> str:
+        """Texto indexado de um imóvel: título + descrição + especificações"""
+        return f"{imovel.titulo} {imovel.descricao} {' '.join(imovel.especificacoes)}"
+
+    @staticmethod
+    def content_hash(document: str) -> str:
+        """Hash do texto indexado (e da versão da metadata); permite detectar se o imóvel mudou desde a última indexação"""
+        return hashlib.sha256(f"{METADATA_VERSION}:{document}".encode("utf-8")).hexdigest()
+
+    @classmethod
+    def build_metadata(cls, imovel: ImovelInDB) -> Dict[str, Any]:
+        # Converter metadatas para formato compatível com ChromaDB
+        return {
+            "id": str(imovel.id),
+            "titulo": imovel.titulo,
+            "descricao": imovel.descricao,
+            "especificacoes": " | ".join(imovel.especificacoes),  # Converter lista para string
+            "content_hash": cls.content_hash(cls.build_document(imovel)),
+            # Atributos tipados (preço, quartos, área, bairro...) para os filtros where da busca
+            **extrair_atributos(imovel.titulo, imovel.descricao, imovel.especificacoes)
+        }
+
     def index_imoveis(self, imoveis: List[ImovelInDB]):
-        contents = [f"{imovel.titulo} {imovel.descricao} {' '.join(imovel.especificacoes)}" for imovel in imoveis]
+        contents = [self.build_document(imovel) for imovel in imoveis]
         embeddings = self.embedding_service.create_embeddings(contents)
         ids = [str(imovel.id) for imovel in imoveis]
-        
-        # Converter metadatas para formato compatível com ChromaDB
-        metadatas = []
-        for imovel in imoveis:
-            metadata = {
-                "id": str(imovel.id),
-                "titulo": imovel.titulo,
-                "descricao": imovel.descricao,
-                "especificacoes": " | ".join(imovel.especificacoes)  # Converter lista para string
-            }
-            metadatas.append(metadata)
-
-        self.chroma_repo.add_documents(ids=ids, documents=contents, metadatas=metadatas)
-    
+        metadatas = [self.build_metadata(imovel) for imovel in imoveis]
+
+        self.chroma_repo.add_documents(ids=ids, documents=contents, metadatas=metadatas, embeddings=embeddings)
+
     def index_single_imovel(self, imovel: ImovelInDB):
         """Indexa um único imóvel"""
-        content = f"{imovel.titulo} {imovel.descricao} {' '.join(imovel.especificacoes)}"
+        content = self.build_document(imovel)
         embedding = self.embedding_service.create_embeddings([content])[0]
         imovel_id = str(imovel.id)
-        
-        metadata = {
-            "id": imovel_id,
-            "titulo": imovel.titulo,
-            "descricao": imovel.descricao,
-            "especificacoes": " | ".join(imovel.especificacoes)
-        }
-        
+
+        self.chroma_repo.upsert_documents(
+            ids=[imovel_id],
+            documents=[content],
+            metadatas=[self.build_metadata(imovel)],
+            embeddings=[embedding]
+        )
+
+    def upsert_imoveis(self, imoveis: List[ImovelInDB], batch_size: int = EMBEDDING_BATCH_SIZE):
+        """Indexa um lote de imóveis: um encode em lote e um único upsert no ChromaDB"""
+        if not imoveis:
+            return
+        contents = [self.build_document(imovel) for imovel in imoveis]
+        embeddings = self.embedding_service.create_embeddings(contents, batch_size=batch_size)
+
         self.chroma_repo.upsert_documents(
-            ids=[imovel_id], 
-            documents=[content], 
-            metadatas=[metadata]
+            ids=[str(imovel.id) for imovel in imoveis],
+            documents=contents,
+            metadatas=[self.build_metadata(imovel) for imovel in imoveis],
+            embeddings=embeddings
         )
-    
+
+    def changed_imoveis(self, imoveis: List[ImovelInDB]) -> List[ImovelInDB]:
+        """Filtra apenas imóveis novos ou cujo content_hash difere do que está no ChromaDB"""
+        indexados = self.chroma_repo.get_metadatas([str(imovel.id) for imovel in imoveis])
+        alterados = []
+        for imovel in imoveis:
+            metadata = indexados.get(str(imovel.id)) or {}
+            if metadata.get("content_hash") != self.content_hash(self.build_document(imovel)):
+                alterados.append(imovel)
+        return alterados
+
+    def sync_from_mongo(
+        self,
+        mongo_repo,
+        chunk_size: int = SYNC_CHUNK_SIZE,
+        batch_size: int = EMBEDDING_BATCH_SIZE,
+        full: bool = False,
+        progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None
+    ) -> Dict[str, Any]:
+        """
+        Reindexação em streaming:
+        1. Lê o MongoDB pelo cursor em blocos de chunk_size documentos
+        2. Descarta os imóveis cujo content_hash não mudou (a menos que full=True)
+        3. Gera os embeddings dos restantes em lotes de batch_size e faz um upsert em lote por bloco,
+           gravando os atributos tipados também no MongoDB
+        4. Remove do ChromaDB os IDs que não existem mais no MongoDB
+        Retorna estatísticas de progresso e throughput.
+        """
+        stats = {
+            "total": 0, "synced": 0, "unchanged": 0, "deleted": 0, "failed": 0,
+            "chunks": 0, "elapsed_seconds": 0.0, "docs_per_second": 0.0
+        }
+        inicio = time.perf_counter()
+        vistos = set()
+
+        def flush(chunk: List[ImovelInDB]):
+            try:
+                pendentes = chunk if full else self.changed_imoveis(chunk)
+                self.upsert_imoveis(pendentes, batch_size=batch_size)
+                # Mantém os atributos tipados também no MongoDB (preenche documentos antigos)
+                mongo_repo.set_atributos_imoveis({
+                    str(imovel.id): extrair_atributos(imovel.titulo, imovel.descricao, imovel.especificacoes)
+                    for imovel in pendentes
+                })
+                stats["synced"] += len(pendentes)
+                stats["unchanged"] += len(chunk) - len(pendentes)
+            except Exception as e:
+                logger.error(f"Erro ao indexar bloco de {len(chunk)} imóveis: {e}")
+                stats["failed"] += len(chunk)
+            stats["chunks"] += 1
+            stats["elapsed_seconds"] = time.perf_counter() - inicio
+            stats["docs_per_second"] = stats["synced"] / stats["elapsed_seconds"] if stats["elapsed_seconds"] else 0.0
+            logger.info(
+                f"Sync: bloco {stats['chunks']} - {stats['synced']} indexados, {stats['unchanged']} inalterados "
+                f"de {stats['total']} ({stats['docs_per_second']:.1f} docs/s)"
+            )
+            if progress_callback:
+                progress_callback(dict(stats))
+
+        chunk = []
+        for data in mongo_repo.iter_imoveis(batch_size=chunk_size):
+            stats["total"] += 1
+            vistos.add(str(data["id"]))
+            try:
+                chunk.append(ImovelInDB(
+                    id=str(data["id"]),
+                    titulo=data["titulo"],
+                    descricao=data["descricao"],
+                    especificacoes=data.get("especificacoes", [])
+                ))
+            except Exception as e:
+                logger.error(f"Erro ao processar imóvel {data.get('id', 'N/A')}: {e}")
+                stats["failed"] += 1
+                continue
+
+            if len(chunk) >= chunk_size:
+                flush(chunk)
+                chunk = []
+
+        if chunk:
+            flush(chunk)
+
+        # Imóveis removidos do MongoDB saem do índice
+        orfaos = [imovel_id for imovel_id in self.chroma_repo.iter_ids() if imovel_id not in vistos]
+        for i in range(0, len(orfaos), chunk_size):
+            self.chroma_repo.delete_documents(orfaos[i:i + chunk_size])
+        stats["deleted"] = len(orfaos)
+
+        stats["elapsed_seconds"] = time.perf_counter() - inicio
+        stats["docs_per_second"] = stats["synced"] / stats["elapsed_seconds"] if stats["elapsed_seconds"] else 0.0
+        return stats
+
     def delete_imovel_from_index(self, imovel_id: str):
         """Remove um imóvel do índice de busca"""
         self.chroma_repo.delete_document(imovel_id)
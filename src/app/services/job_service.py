@@ -0,0 +1,108 @@
+from celery.result import AsyncResult
+from typing import Dict, Any, Optional
+from uuid import uuid4
+from ..celery_app import celery_app
+from ..config import JOB_LOCK_TTL_SECONDS, JOB_RESULT_TTL_SECONDS
+import redis
+import time
+
+# Estado gravado no backend do Celery quando o job é cancelado durante a execução
+JOB_CANCELLED = "CANCELLED"
+
+class JobCancelled(Exception):
+    """Levantada dentro do job quando o cancelamento foi solicitado"""
+
+class JobService:
+    """
+    Controle dos jobs em background:
+    - no máximo um job ativo por tipo (sync, seed, clear), via lock no Redis
+    - cancelamento cooperativo: o job consulta a flag a cada bloco processado
+    - status/progresso lidos do result backend do Celery
+    """
+    def __init__(self, redis_client: redis.Redis):
+        self.redis = redis_client
+
+    @staticmethod
+    def _lock_key(kind: str) -> str:
+        return f"jobs:lock:{kind}"
+
+    @staticmethod
+    def _job_key(job_id: str) -> str:
+        return f"jobs:{job_id}"
+
+    @staticmethod
+    def _cancel_key(job_id: str) -> str:
+        return f"jobs:cancel:{job_id}"
+
+    def active_job(self, kind: str) -> Optional[str]:
+        return self.redis.get(self._lock_key(kind))
+
+    def enqueue(self, kind: str, task, **kwargs) -> Optional[str]:
+        """Enfileira o job e retorna seu ID, ou None se já existe um job do mesmo tipo em andamento"""
+        job_id = str(uuid4())
+        if not self.redis.set(self._lock_key(kind), job_id, nx=True, ex=JOB_LOCK_TTL_SECONDS):
+            return None
+
+        self.redis.hset(self._job_key(job_id), mapping={"kind": kind, "created_at": time.time()})
+        self.redis.expire(self._job_key(job_id), JOB_RESULT_TTL_SECONDS)
+        try:
+            task.apply_async(kwargs=kwargs, task_id=job_id)
+        except Exception:
+            self.release(kind, job_id)
+            raise
+        return job_id
+
+    def release(self, kind: str, job_id: str):
+        """Libera a vaga do tipo, se ainda pertencer a este job"""
+        if self.redis.get(self._lock_key(kind)) == job_id:
+            self.redis.delete(self._lock_key(kind))
+        self.redis.delete(self._cancel_key(job_id))
+
+    def cancel(self, job_id: str) -> bool:
+        """Solicita o cancelamento; jobs ainda na fila são revogados e liberam a vaga imediatamente"""
+        job = self.redis.hgetall(self._job_key(job_id))
+        if not job:
+            return False
+
+        result = AsyncResult(job_id, app=celery_app)
+        if result.ready():
+            return True
+
+        self.redis.set(self._cancel_key(job_id), 1, ex=JOB_LOCK_TTL_SECONDS)
+        celery_app.control.revoke(job_id)
+        if result.state == "PENDING":
+            # Nunca vai rodar: ninguém mais liberaria o lock
+            self.redis.delete(self._lock_key(job["kind"]))
+        return True
+
+    def is_cancelled(self, job_id: str) -> bool:
+        return bool(self.redis.exists(self._cancel_key(job_id)))
+
+    def check_cancelled(self, job_id: str):
+        if self.is_cancelled(job_id):
+            raise JobCancelled(job_id)
+
+    def get_status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = self.redis.hgetall(self._job_key(job_id))
+        if not job:
+            return None
+
+        result = AsyncResult(job_id, app=celery_app)
+        status = {
+            "job_id": job_id,
+            "kind": job["kind"],
+            "created_at": float(job["created_at"]),
+            "state": result.state,
+            "progress": None,
+            "result": None,
+            "error": None
+        }
+        if result.state == "PENDING" and self.is_cancelled(job_id):
+            status["state"] = JOB_CANCELLED
+        elif result.state == "SUCCESS":
+            status["result"] = result.result
+        elif result.state == "FAILURE":
+            status["error"] = str(result.result)
+        elif isinstance(result.info, dict):
+            status["progress"] = result.info
+        return status
@@ -0,0 +1,106 @@
+from concurrent.futures import Future, InvalidStateError
+from typing import Callable, Dict, List
+import logging
+import queue
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+class QueryBatcher:
+    """
+    Micro-batching de encodes concorrentes: agrupa as consultas que chegam dentro de max_wait_ms
+    (ou até max_batch_size itens) em uma única chamada ao modelo e devolve a cada chamador o seu vetor.
+    """
+    def __init__(self, encode_fn: Callable[[List[str]], List[List[float]]], max_wait_ms: float, max_batch_size: int):
+        self.encode_fn = encode_fn
+        self.max_wait_seconds = max_wait_ms / 1000
+        self.max_batch_size = max_batch_size
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.batches = 0
+        self.queries = 0
+        self.histogram: Dict[int, int] = {}
+
+    def submit(self, text: str) -> Future:
+        """Enfileira uma consulta; o Future recebe o embedding quando o lote dela for processado"""
+        self._ensure_started()
+        future = Future()
+        self._queue.put((text, future))
+        return future
+
+    def encode(self, text: str) -> List[float]:
+        return self.submit(text).result()
+
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="query-batcher", daemon=True)
+                self._thread.start()
+
+    def _collect(self) -> list:
+        """Bloqueia até a primeira consulta e junta as que chegarem dentro da janela"""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait_seconds
+        while len(batch) < self.max_batch_size:
+            restante = deadline - time.monotonic()
+            if restante <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=restante))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            try:
+                self._process(self._collect())
+            except Exception as e:
+                # Nenhum lote pode derrubar a thread: as consultas seguintes ficariam esperando para sempre
+                logger.error(f"Erro no micro-batching de consultas: {e}")
+
+    def _process(self, batch: list):
+        # Consultas canceladas (request abortado) saem do lote; as demais não podem mais ser canceladas
+        batch = [(text, future) for text, future in batch if future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        try:
+            embeddings = self.encode_fn([text for text, _ in batch])
+        except Exception as e:
+            logger.error(f"Erro no encode do lote de {len(batch)} consultas: {e}")
+            for _, future in batch:
+                self._resolve(future.set_exception, e)
+            return
+
+        for (_, future), embedding in zip(batch, embeddings):
+            self._resolve(future.set_result, embedding)
+        self._record(len(batch))
+
+    @staticmethod
+    def _resolve(setter, valor):
+        try:
+            setter(valor)
+        except InvalidStateError:
+            pass  # Future já resolvido por outro caminho; não afeta os demais do lote
+
+    def _record(self, size: int):
+        with self._stats_lock:
+            self.batches += 1
+            self.queries += size
+            self.histogram[size] = self.histogram.get(size, 0) + 1
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return {
+                "max_wait_ms": self.max_wait_seconds * 1000,
+                "max_batch_size": self.max_batch_size,
+                "batches": self.batches,
+                "queries": self.queries,
+                "avg_batch_size": self.queries / self.batches if self.batches else 0.0,
+                "batch_size_histogram": dict(sorted(self.histogram.items()))
+            }
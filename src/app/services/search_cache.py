@@ -0,0 +1,61 @@
+from typing import Dict, Any, Optional
+from ..config import SEARCH_CACHE_SIZE, SEARCH_CACHE_TTL_SECONDS, SEARCH_INDEX_VERSION_KEY
+from .ttl_cache import TTLCache
+import json
+import logging
+import redis
+
+logger = logging.getLogger(__name__)
+
+class SearchCache:
+    """
+    Cache das respostas completas de busca (top-k do ChromaDB + hidratação no MongoDB).
+    A chave inclui a versão do índice (contador no Redis): qualquer escrita em imóveis,
+    sync ou limpeza do ChromaDB incrementa a versão e torna as entradas antigas inalcançáveis.
+    """
+    def __init__(self, redis_client: redis.Redis, max_size: int = SEARCH_CACHE_SIZE,
+                 ttl_seconds: int = SEARCH_CACHE_TTL_SECONDS):
+        self.redis = redis_client
+        self.cache = TTLCache(max_size=max_size, ttl_seconds=ttl_seconds)
+
+    def index_version(self) -> Optional[int]:
+        """Versão atual do índice; None se o Redis estiver indisponível (nesse caso o cache é ignorado)"""
+        try:
+            return int(self.redis.get(SEARCH_INDEX_VERSION_KEY) or 0)
+        except Exception as e:
+            logger.warning(f"Versão do índice indisponível, cache de busca ignorado: {e}")
+            return None
+
+    def bump_version(self):
+        """Invalida todas as buscas em cache (chamado após escritas no índice)"""
+        self.cache.clear()
+        try:
+            self.redis.incr(SEARCH_INDEX_VERSION_KEY)
+        except Exception as e:
+            logger.warning(f"Não foi possível incrementar a versão do índice: {e}")
+
+    @staticmethod
+    def _key(query_key: str, n_results: int, filters: Optional[Dict[str, Any]], version: int):
+        # query_key vem de EmbeddingService.cache_key: mesma identidade de consulta do cache de embeddings
+        return (
+            query_key,
+            n_results,
+            json.dumps(filters or {}, sort_keys=True, default=str),
+            version
+        )
+
+    def get(self, query_key: str, n_results: int, filters: Optional[Dict[str, Any]],
+            version: Optional[int]) -> Optional[Dict[str, Any]]:
+        if version is None:
+            return None
+        return self.cache.get(self._key(query_key, n_results, filters, version))
+
+    def set(self, query_key: str, n_results: int, filters: Optional[Dict[str, Any]], version: Optional[int],
+            response: Dict[str, Any]):
+        """Guarda a resposta sob a versão lida ANTES da busca: se houve escrita no meio, a entrada já nasce obsoleta"""
+        if version is None:
+            return
+        self.cache.set(self._key(query_key, n_results, filters, version), response)
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.cache.stats(), "index_version": self.index_version()}
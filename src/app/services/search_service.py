@@ -1,48 +1,163 @@
-from typing import List, Dict, Any
-from ..repositories.mongo_repository import MongoRepository
+from typing import List, Dict, Any, Optional, Tuple
+from ..repositories.async_mongo_repository import AsyncMongoRepository
 from ..repositories.chroma_repository import ChromaRepository
 from ..services.embedding_service import EmbeddingService
+from ..models import SearchFilters
+from ..atributos import normalizar_texto
+from ..config import SEARCH_RRF_K, SEARCH_HYBRID_CANDIDATES_MULTIPLIER
+import asyncio
+import time
+
+# Campos retornados na hidratação dos resultados da busca
+HYDRATION_PROJECTION = {
+    "titulo": 1, "descricao": 1, "especificacoes": 1,
+    "preco": 1, "quartos": 1, "area_m2": 1, "bairro": 1, "cidade": 1, "tipo": 1, "finalidade": 1
+}
+
+# Modos de recuperação do /search/?mode=
+SEARCH_MODE_SEMANTIC = "semantic"
+SEARCH_MODE_LEXICAL = "lexical"
+SEARCH_MODE_HYBRID = "hybrid"
 
 class SearchService:
-    def __init__(self, embedding_service: EmbeddingService, chroma_repo: ChromaRepository, mongo_repo: MongoRepository):
+    def __init__(self, embedding_service: EmbeddingService, chroma_repo: ChromaRepository,
+                 async_mongo_repo: AsyncMongoRepository):
         self.embedding_service = embedding_service
         self.chroma_repo = chroma_repo
-        self.mongo_repo = mongo_repo
+        self.async_mongo_repo = async_mongo_repo
+        self.timings: Dict[str, float] = {}
 
-    def search(self, query: str, n_results: int = 5) -> List[Dict[str, Any]]:
-        """
-        Fluxo correto:
-        1. Query → Embedding
-        2. ChromaDB → Similaridade Cosseno → Top 5 IDs
-        3. MongoDB → Buscar conteúdo completo por IDs
-        """
-        # 1. Transformar query em embedding
-        query_embedding = self.embedding_service.create_embeddings([query])[0]
-        
-        # 2. Buscar IDs similares no ChromaDB (similaridade de cosseno)
-        chroma_results = self.chroma_repo.query(query_embeddings=[query_embedding], n_results=n_results)
-        
+    @staticmethod
+    def build_where(filters: Optional[SearchFilters]) -> Optional[Dict[str, Any]]:
+        """Converte os filtros em um where do ChromaDB (intervalos numéricos e igualdade nos textos normalizados)"""
+        if filters is None:
+            return None
+        condicoes = []
+        for campo, minimo, maximo in (
+            ("preco", filters.preco_min, filters.preco_max),
+            ("quartos", filters.quartos_min, filters.quartos_max),
+            ("area_m2", filters.area_min, filters.area_max),
+        ):
+            if minimo is not None:
+                condicoes.append({campo: {"$gte": minimo}})
+            if maximo is not None:
+                condicoes.append({campo: {"$lte": maximo}})
+        for campo in ("bairro", "cidade", "tipo", "finalidade"):
+            valor = getattr(filters, campo)
+            if valor:
+                condicoes.append({campo: {"$eq": normalizar_texto(valor)}})
+
+        if not condicoes:
+            return None
+        return condicoes[0] if len(condicoes) == 1 else {"$and": condicoes}
+
+    @staticmethod
+    def _ranked_ids(chroma_results: Dict[str, Any]) -> Tuple[List[str], Dict[str, float]]:
+        """Extrai os IDs na ordem do ChromaDB e o score de similaridade (1 - distância) de cada um"""
         # ChromaDB retorna: {'ids': [['id1', 'id2']], 'distances': [[0.1, 0.2]], ...}
         if not chroma_results.get('ids') or not chroma_results['ids'][0]:
-            return []
-        
-        # 3. Obter os IDs mais similares
+            return [], {}
+
         similar_ids = chroma_results['ids'][0]
         distances = chroma_results.get('distances', [[]])[0] if chroma_results.get('distances') else []
-        
-        # 4. Buscar conteúdo completo no MongoDB usando os IDs
-        imoveis = []
-        for i, imovel_id in enumerate(similar_ids):
-            try:
-                # Buscar dados completos no MongoDB
-                imovel_data = self.mongo_repo.get_imovel_by_id(imovel_id)
-                if imovel_data:
-                    # Adicionar score de similaridade se disponível
-                    if i < len(distances):
-                        imovel_data['similarity_score'] = 1 - distances[i]  # Converter distância para similaridade
-                    imoveis.append(imovel_data)
-            except Exception as e:
-                print(f"Erro ao buscar imóvel {imovel_id} no MongoDB: {e}")
-                continue
-        
+        scores = {imovel_id: 1 - distances[i] for i, imovel_id in enumerate(similar_ids) if i < len(distances)}
+        return similar_ids, scores
+
+    @staticmethod
+    def build_mongo_filter(filters: Optional[SearchFilters]) -> Dict[str, Any]:
+        """Mesmos filtros de build_where, sobre os atributos tipados gravados no MongoDB"""
+        filtro: Dict[str, Any] = {}
+        if filters is None:
+            return filtro
+        for campo, minimo, maximo in (
+            ("preco", filters.preco_min, filters.preco_max),
+            ("quartos", filters.quartos_min, filters.quartos_max),
+            ("area_m2", filters.area_min, filters.area_max),
+        ):
+            intervalo = {}
+            if minimo is not None:
+                intervalo["$gte"] = minimo
+            if maximo is not None:
+                intervalo["$lte"] = maximo
+            if intervalo:
+                filtro[campo] = intervalo
+        for campo in ("bairro", "cidade", "tipo", "finalidade"):
+            valor = getattr(filters, campo)
+            if valor:
+                filtro[campo] = normalizar_texto(valor)
+        return filtro
+
+    @staticmethod
+    def reciprocal_rank_fusion(rankings: List[List[str]], k: int = SEARCH_RRF_K) -> List[Tuple[str, float]]:
+        """Reciprocal-rank fusion: score(d) = Σ 1 / (k + posição de d em cada ranking), posições a partir de 1"""
+        scores: Dict[str, float] = {}
+        for ranking in rankings:
+            for posicao, imovel_id in enumerate(ranking, start=1):
+                scores[imovel_id] = scores.get(imovel_id, 0.0) + 1.0 / (k + posicao)
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+    async def _timed(self, etapa: str, awaitable):
+        inicio = time.perf_counter()
+        try:
+            return await awaitable
+        finally:
+            self.timings[etapa] = (time.perf_counter() - inicio) * 1000
+
+    async def _semantic_ranking(self, query: str, n_results: int,
+                                filters: Optional[SearchFilters]) -> Tuple[List[str], Dict[str, float]]:
+        query_embedding = await self._timed("encode_ms", self.embedding_service.aembed_query(query))
+        chroma_results = await self._timed("chroma_ms", asyncio.to_thread(
+            self.chroma_repo.query, query_embeddings=[query_embedding], n_results=n_results,
+            where=self.build_where(filters)
+        ))
+        return self._ranked_ids(chroma_results)
+
+    async def _lexical_ranking(self, query: str, n_results: int,
+                               filters: Optional[SearchFilters]) -> Tuple[List[str], Dict[str, float]]:
+        ranking = await self._timed("lexical_ms", self.async_mongo_repo.text_search_ids(
+            query, n_results, self.build_mongo_filter(filters)
+        ))
+        return [imovel_id for imovel_id, _ in ranking], dict(ranking)
+
+    async def asearch(self, query: str, n_results: int = 5, filters: Optional[SearchFilters] = None,
+                      mode: str = SEARCH_MODE_SEMANTIC) -> List[Dict[str, Any]]:
+        """
+        Fluxo: Query → Embedding → ChromaDB (filtros de metadata + similaridade cosseno) → IDs → MongoDB (conteúdo completo),
+        sem bloquear o event loop: encode no executor do EmbeddingService, ChromaDB (cliente síncrono) em thread
+        e hidratação com o MongoDB assíncrono em uma única consulta (a ordem do ranking é preservada).
+        mode: "semantic" (ChromaDB), "lexical" (índice de texto do MongoDB) ou "hybrid"
+        (os dois em paralelo, fundidos por reciprocal-rank fusion). Tempos por etapa ficam em self.timings.
+        """
+        self.timings = {}
+        inicio = time.perf_counter()
+        scores: Dict[str, Dict[str, float]] = {}
+
+        if mode == SEARCH_MODE_LEXICAL:
+            ids, scores["lexical_score"] = await self._lexical_ranking(query, n_results, filters)
+        elif mode == SEARCH_MODE_HYBRID:
+            candidatos = n_results * SEARCH_HYBRID_CANDIDATES_MULTIPLIER
+            (semantic_ids, scores["similarity_score"]), (lexical_ids, scores["lexical_score"]) = await asyncio.gather(
+                self._semantic_ranking(query, candidatos, filters),
+                self._lexical_ranking(query, candidatos, filters)
+            )
+            fused = self.reciprocal_rank_fusion([semantic_ids, lexical_ids])[:n_results]
+            ids = [imovel_id for imovel_id, _ in fused]
+            scores["fusion_score"] = dict(fused)
+        else:
+            ids, scores["similarity_score"] = await self._semantic_ranking(query, n_results, filters)
+
+        if not ids:
+            self.timings["total_ms"] = (time.perf_counter() - inicio) * 1000
+            return []
+
+        # Erros na hidratação sobem para a rota: uma lista vazia aqui seria guardada no cache como resposta válida
+        imoveis = await self._timed("hydration_ms", self.async_mongo_repo.get_imoveis_by_ids(
+            ids, projection=HYDRATION_PROJECTION
+        ))
+
+        for imovel_data in imoveis:
+            for campo, por_id in scores.items():
+                if imovel_data["id"] in por_id:
+                    imovel_data[campo] = por_id[imovel_data["id"]]
+        self.timings["total_ms"] = (time.perf_counter() - inicio) * 1000
         return imoveis
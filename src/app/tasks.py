@@ -0,0 +1,94 @@
+from celery.exceptions import Ignore
+from typing import List, Dict, Any, Callable
+from .celery_app import celery_app
+from .config import SYNC_CHUNK_SIZE, EMBEDDING_BATCH_SIZE, CHROMA_PATH
+from .database import get_mongo_repo, get_redis_client, get_search_cache, init_embedding_service
+from .models import ImovelInDB
+from .repositories.chroma_repository import ChromaRepository
+from .services.indexing_service import IndexingService
+from .services.job_service import JobService, JobCancelled, JOB_CANCELLED
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Tipos de job: cada tipo tem no máximo um job ativo por vez
+JOB_SYNC = "sync"
+JOB_SEED = "seed"
+JOB_CLEAR = "clear"
+
+def _run_job(task, kind: str, body: Callable[[Callable[[Dict[str, Any]], None]], Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Executa o corpo do job publicando progresso, tratando cancelamento e liberando a vaga do tipo ao final.
+    Cada bloco concluído altera o índice, então também invalida o cache de buscas.
+    """
+    job_id = task.request.id
+    jobs = JobService(get_redis_client())
+    search_cache = get_search_cache()
+
+    def report(progress: Dict[str, Any]):
+        search_cache.bump_version()
+        jobs.check_cancelled(job_id)
+        task.update_state(state="PROGRESS", meta=progress)
+
+    try:
+        return body(report)
+    except JobCancelled:
+        logger.info(f"Job {kind} {job_id} cancelado")
+        task.update_state(state=JOB_CANCELLED, meta={"cancelled": True})
+        raise Ignore()
+    finally:
+        search_cache.bump_version()
+        jobs.release(kind, job_id)
+
+def _indexing_service() -> IndexingService:
+    # O worker carrega o modelo uma vez por processo, como a API
+    return IndexingService(
+        embedding_service=init_embedding_service(warm_up=False),
+        chroma_repo=ChromaRepository(path=CHROMA_PATH)
+    )
+
+@celery_app.task(bind=True, name="imoveis.sync")
+def sync_imoveis_job(self, chunk_size: int = SYNC_CHUNK_SIZE, batch_size: int = EMBEDDING_BATCH_SIZE,
+                     full: bool = False) -> Dict[str, Any]:
+    """Sincronização MongoDB → ChromaDB (ver IndexingService.sync_from_mongo)"""
+    def body(report):
+        return _indexing_service().sync_from_mongo(
+            get_mongo_repo(), chunk_size=chunk_size, batch_size=batch_size, full=full, progress_callback=report
+        )
+    return _run_job(self, JOB_SYNC, body)
+
+@celery_app.task(bind=True, name="imoveis.seed")
+def seed_imoveis_job(self, imoveis: List[Dict[str, Any]], chunk_size: int = SYNC_CHUNK_SIZE,
+                     batch_size: int = EMBEDDING_BATCH_SIZE) -> Dict[str, Any]:
+    """Carga em massa: insere os imóveis no MongoDB e indexa no ChromaDB, bloco a bloco"""
+    def body(report):
+        mongo_repo = get_mongo_repo()
+        indexing_service = _indexing_service()
+        stats = {"total": len(imoveis), "inserted": 0, "indexed": 0, "chunks": 0}
+
+        for i in range(0, len(imoveis), chunk_size):
+            chunk = imoveis[i:i + chunk_size]
+            ids = mongo_repo.add_imoveis(chunk)
+            stats["inserted"] += len(ids)
+
+            indexing_service.upsert_imoveis(
+                [ImovelInDB(id=imovel_id, **imovel) for imovel_id, imovel in zip(ids, chunk)],
+                batch_size=batch_size
+            )
+            stats["indexed"] += len(ids)
+            stats["chunks"] += 1
+            report(dict(stats))
+        return stats
+    return _run_job(self, JOB_SEED, body)
+
+@celery_app.task(bind=True, name="imoveis.clear")
+def clear_imoveis_job(self) -> Dict[str, Any]:
+    """Remove todos os imóveis do MongoDB e limpa o índice do ChromaDB"""
+    def body(report):
+        # Cancelamento só antes de apagar: entre o MongoDB e o ChromaDB o job vai até o fim
+        report({"deleted_count": 0})
+        # O repositório registra o evento de clear no stream do integrador
+        deleted_count = get_mongo_repo().delete_all_imoveis()
+        ChromaRepository(path=CHROMA_PATH).clear()
+        return {"deleted_count": deleted_count}
+    return _run_job(self, JOB_CLEAR, body)
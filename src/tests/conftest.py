@@ -1,24 +1,81 @@
 import pytest
 from fastapi.testclient import TestClient
-from unittest.mock import Mock, patch
+from unittest.mock import Mock, AsyncMock, patch
 import sys
 import os
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
 
 from main import app
-
-@pytest.fixture
-def client():
-    """Cliente de teste para a API FastAPI"""
-    return TestClient(app)
+from src.app.database import get_mongo_repo, get_redis_client, get_embedding_service, get_job_service, get_search_cache, get_async_mongo_repo, get_event_log
+from src.app.repositories.mongo_repository import MongoRepository
 
 @pytest.fixture
 def mock_mongo_repo():
     """Mock do repositório MongoDB"""
     mock = Mock()
+    mock.cidades_filter.side_effect = MongoRepository.cidades_filter
+    mock.corretores_filter.side_effect = MongoRepository.corretores_filter
+    return mock
+
+@pytest.fixture
+def mock_async_mongo_repo():
+    """Mock do repositório MongoDB assíncrono (rotas async)"""
+    mock = Mock()
+    mock.get_imoveis_by_ids = AsyncMock(return_value=[])
+    mock.search_imoveis_text = AsyncMock(return_value=[])
+    return mock
+
+@pytest.fixture
+def mock_redis():
+    """Mock do cliente Redis compartilhado"""
+    mock = Mock()
+    return mock
+
+@pytest.fixture
+def mock_embedding_service():
+    """Mock do modelo de embeddings compartilhado"""
+    mock = Mock()
+    mock.create_embeddings.return_value = [[0.1, 0.2, 0.3]]
+    mock.embed_query.return_value = [0.1, 0.2, 0.3]
+    mock.aembed_query = AsyncMock(return_value=[0.1, 0.2, 0.3])
+    # Modelo padrão é uncased: a chave ignora caixa e espaços
+    mock.cache_key.side_effect = lambda text: " ".join(text.lower().split())
     return mock
 
+@pytest.fixture
+def mock_job_service():
+    """Mock do controle de jobs em background"""
+    mock = Mock()
+    return mock
+
+@pytest.fixture
+def mock_search_cache():
+    """Mock do cache de buscas (sempre miss)"""
+    mock = Mock()
+    mock.get.return_value = None
+    return mock
+
+@pytest.fixture
+def mock_event_log():
+    """Mock do stream de eventos do integrador"""
+    mock = Mock()
+    return mock
+
+@pytest.fixture
+def client(mock_mongo_repo, mock_async_mongo_repo, mock_redis, mock_embedding_service, mock_job_service,
+           mock_search_cache, mock_event_log):
+    """Cliente de teste para a API FastAPI com as dependências compartilhadas substituídas por mocks"""
+    app.dependency_overrides[get_mongo_repo] = lambda: mock_mongo_repo
+    app.dependency_overrides[get_async_mongo_repo] = lambda: mock_async_mongo_repo
+    app.dependency_overrides[get_redis_client] = lambda: mock_redis
+    app.dependency_overrides[get_embedding_service] = lambda: mock_embedding_service
+    app.dependency_overrides[get_job_service] = lambda: mock_job_service
+    app.dependency_overrides[get_search_cache] = lambda: mock_search_cache
+    app.dependency_overrides[get_event_log] = lambda: mock_event_log
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+
 @pytest.fixture
 def mock_chroma_repo():
     """Mock do repositório ChromaDB"""
@@ -4,13 +4,11 @@ from unittest.mock import patch, Mock
 class TestCidadesRoutes:
     """Testes para as rotas de cidades"""
     
-    @patch('src.app.routers.cidades.MongoRepository')
-    def test_create_cidade_success(self, mock_mongo_class, client, sample_cidade):
+    def test_create_cidade_success(self, client, mock_mongo_repo, sample_cidade):
         """Testa criação bem-sucedida de uma cidade"""
 
-        mock_mongo = Mock()
+        mock_mongo = mock_mongo_repo
         mock_mongo.add_cidade.return_value = "507f1f77bcf86cd799439013"
-        mock_mongo_class.return_value = mock_mongo
         
         response = client.post("/cidades/", json=sample_cidade)
         
@@ -23,12 +21,11 @@ class TestCidadesRoutes:
         
         mock_mongo.add_cidade.assert_called_once()
     
-    @patch('src.app.routers.cidades.MongoRepository')
-    def test_read_cidades_success(self, mock_mongo_class, client, sample_cidade_in_db):
+    def test_read_cidades_success(self, client, mock_mongo_repo, sample_cidade_in_db):
         """Testa listagem de cidades"""
-        mock_mongo = Mock()
-        mock_mongo.get_all_cidades.return_value = [sample_cidade_in_db]
-        mock_mongo_class.return_value = mock_mongo
+        mock_mongo = mock_mongo_repo
+        mock_mongo.count_cidades.return_value = 1
+        mock_mongo.get_cidades_page.return_value = [sample_cidade_in_db]
     
         response = client.get("/cidades/")
         
@@ -39,13 +36,11 @@ class TestCidadesRoutes:
         assert data[0]["nome"] == sample_cidade_in_db["nome"]
         assert data[0]["estado"] == sample_cidade_in_db["estado"]
     
-    @patch('src.app.routers.cidades.MongoRepository')
-    def test_read_cidade_by_id_success(self, mock_mongo_class, client, sample_cidade_in_db):
+    def test_read_cidade_by_id_success(self, client, mock_mongo_repo, sample_cidade_in_db):
         """Testa busca de cidade por ID"""
         
-        mock_mongo = Mock()
+        mock_mongo = mock_mongo_repo
         mock_mongo.get_cidade_by_id.return_value = sample_cidade_in_db
-        mock_mongo_class.return_value = mock_mongo
         
         cidade_id = sample_cidade_in_db["id"]
         response = client.get(f"/cidades/{cidade_id}")
@@ -56,24 +51,20 @@ class TestCidadesRoutes:
         assert data["nome"] == sample_cidade_in_db["nome"]
         assert data["estado"] == sample_cidade_in_db["estado"]
     
-    @patch('src.app.routers.cidades.MongoRepository')
-    def test_read_cidade_by_id_not_found(self, mock_mongo_class, client):
+    def test_read_cidade_by_id_not_found(self, client, mock_mongo_repo):
         """Testa busca de cidade inexistente"""
-        mock_mongo = Mock()
+        mock_mongo = mock_mongo_repo
         mock_mongo.get_cidade_by_id.return_value = None
-        mock_mongo_class.return_value = mock_mongo
         
         response = client.get("/cidades/507f1f77bcf86cd799439999")
         
         assert response.status_code == 404
         assert response.json()["detail"] == "Cidade not found"
     
-    @patch('src.app.routers.cidades.MongoRepository')
-    def test_update_cidade_success(self, mock_mongo_class, client, sample_cidade, sample_cidade_in_db):
+    def test_update_cidade_success(self, client, mock_mongo_repo, sample_cidade, sample_cidade_in_db):
         """Testa atualização de cidade"""
-        mock_mongo = Mock()
+        mock_mongo = mock_mongo_repo
         mock_mongo.get_cidade_by_id.return_value = sample_cidade_in_db
-        mock_mongo_class.return_value = mock_mongo
         
         cidade_id = sample_cidade_in_db["id"]
         updated_data = {**sample_cidade, "populacao": 1600000}
@@ -86,12 +77,10 @@ class TestCidadesRoutes:
         
         mock_mongo.update_cidade.assert_called_once()
     
-    @patch('src.app.routers.cidades.MongoRepository')
-    def test_delete_cidade_success(self, mock_mongo_class, client, sample_cidade_in_db):
+    def test_delete_cidade_success(self, client, mock_mongo_repo, sample_cidade_in_db):
         """Testa exclusão de cidade"""
-        mock_mongo = Mock()
+        mock_mongo = mock_mongo_repo
         mock_mongo.get_cidade_by_id.return_value = sample_cidade_in_db
-        mock_mongo_class.return_value = mock_mongo
         
         cidade_id = sample_cidade_in_db["id"]
         response = client.delete(f"/cidades/{cidade_id}")
@@ -103,49 +92,38 @@ class TestCidadesRoutes:
         
         mock_mongo.delete_cidade.assert_called_once_with(cidade_id)
     
-    @patch('src.app.routers.cidades.MongoRepository')
-    def test_read_cidades_by_estado_success(self, mock_mongo_class, client, sample_cidade_in_db):
-        """Testa busca de cidades por estado"""
-        mock_mongo = Mock()
-        mock_mongo.get_all_cidades.return_value = [
+    def test_read_cidades_by_estado_success(self, client, mock_mongo_repo, sample_cidade_in_db):
+        """Testa busca de cidades por estado (filtro resolvido no MongoDB, sigla normalizada)"""
+        mock_mongo = mock_mongo_repo
+        cidades_go = [
             sample_cidade_in_db,
             {
                 "id": "507f1f77bcf86cd799439014",
                 "nome": "Anápolis",
                 "estado": "GO",
                 "regiao": "Centro-Oeste"
-            },
-            {
-                "id": "507f1f77bcf86cd799439015",
-                "nome": "São Paulo",
-                "estado": "SP",
-                "regiao": "Sudeste"
             }
         ]
-        mock_mongo_class.return_value = mock_mongo
+        mock_mongo.find_cidades.return_value = cidades_go
+        mock_mongo.count_cidades.return_value = 2
         
-        response = client.get("/cidades/estado/GO")
+        response = client.get("/cidades/estado/go")
         
         assert response.status_code == 200
         data = response.json()
         assert len(data) == 2 
-        assert all(cidade["estado"] == "GO" for cidade in data)
         assert data[0]["nome"] == "Goiânia"
         assert data[1]["nome"] == "Anápolis"
+        assert response.headers["X-Total-Count"] == "2"
+        mock_mongo.find_cidades.assert_called_once_with({"estado": "GO"}, limit=None, after=None, projection=None)
+        mock_mongo.count_cidades.assert_called_once_with({"estado": "GO"})
+        mock_mongo.get_all_cidades.assert_not_called()
     
-    @patch('src.app.routers.cidades.MongoRepository')
-    def test_read_cidades_by_estado_empty(self, mock_mongo_class, client):
+    def test_read_cidades_by_estado_empty(self, client, mock_mongo_repo):
         """Testa busca de cidades por estado sem resultados"""
-        mock_mongo = Mock()
-        mock_mongo.get_all_cidades.return_value = [
-            {
-                "id": "507f1f77bcf86cd799439015",
-                "nome": "São Paulo",
-                "estado": "SP",
-                "regiao": "Sudeste"
-            }
-        ]
-        mock_mongo_class.return_value = mock_mongo
+        mock_mongo = mock_mongo_repo
+        mock_mongo.find_cidades.return_value = []
+        mock_mongo.count_cidades.return_value = 0
         
         response = client.get("/cidades/estado/AC")
         
@@ -153,6 +131,47 @@ class TestCidadesRoutes:
         data = response.json()
         assert len(data) == 0
     
+    def test_read_cidades_filtered(self, client, mock_mongo_repo, sample_cidade_in_db):
+        """Testa listagem com filtros de região e faixa de população, paginada"""
+        mock_mongo = mock_mongo_repo
+        mock_mongo.find_cidades.return_value = [sample_cidade_in_db]
+        mock_mongo.count_cidades.return_value = 3
+        
+        response = client.get("/cidades/?regiao=Centro-Oeste&populacao_min=100000&populacao_max=2000000&limit=1")
+        
+        assert response.status_code == 200
+        assert len(response.json()) == 1
+        assert response.headers["X-Next-Cursor"] == sample_cidade_in_db["id"]
+        filtro = {"regiao": "Centro-Oeste", "populacao": {"$gte": 100000, "$lte": 2000000}}
+        mock_mongo.find_cidades.assert_called_once_with(filtro, limit=1, after=None, projection=None)
+        mock_mongo.get_cidades_page.assert_not_called()
+    
+    def test_read_corretores_by_cidade(self, client, mock_mongo_repo, sample_cidade_in_db, sample_corretor_in_db):
+        """Testa corretores que atendem uma cidade (filtro no MongoDB)"""
+        mock_mongo = mock_mongo_repo
+        mock_mongo.get_cidade_by_id.return_value = sample_cidade_in_db
+        mock_mongo.find_corretores.return_value = [sample_corretor_in_db]
+        mock_mongo.count_corretores.return_value = 1
+        
+        cidade_id = sample_cidade_in_db["id"]
+        response = client.get(f"/cidades/{cidade_id}/corretores?ativo=true")
+        
+        assert response.status_code == 200
+        assert response.json()[0]["id"] == sample_corretor_in_db["id"]
+        assert response.headers["X-Total-Count"] == "1"
+        mock_mongo.find_corretores.assert_called_once_with(
+            {"cidades_atendidas": cidade_id, "ativo": True}, expand_cidades=False, limit=None, after=None, projection=None
+        )
+    
+    def test_read_corretores_by_cidade_not_found(self, client, mock_mongo_repo):
+        """Testa corretores de uma cidade inexistente"""
+        mock_mongo_repo.get_cidade_by_id.return_value = None
+        
+        response = client.get("/cidades/507f1f77bcf86cd799439999/corretores")
+        
+        assert response.status_code == 404
+        mock_mongo_repo.find_corretores.assert_not_called()
+    
     def test_cidade_validation(self, client):
         """Testa validação de dados da cidade"""
         invalid_cidade = {
@@ -164,21 +183,18 @@ class TestCidadesRoutes:
         
         assert response.status_code == 422  # Unprocessable Entity
     
-    def test_cidade_minimal_data(self, client):
+    def test_cidade_minimal_data(self, client, mock_mongo_repo):
         """Testa criação de cidade com dados mínimos"""
         minimal_cidade = {
             "nome": "Aparecida de Goiânia",
             "estado": "GO"
         }
         
-        with patch('src.app.routers.cidades.MongoRepository') as mock_mongo_class:
-            mock_mongo = Mock()
-            mock_mongo.add_cidade.return_value = "507f1f77bcf86cd799439016"
-            mock_mongo_class.return_value = mock_mongo
-            
-            response = client.post("/cidades/", json=minimal_cidade)
-            
-            assert response.status_code == 200
-            data = response.json()
-            assert data["nome"] == minimal_cidade["nome"]
-            assert data["estado"] == minimal_cidade["estado"]
\ No newline at end of file
+        mock_mongo_repo.add_cidade.return_value = "507f1f77bcf86cd799439016"
+        
+        response = client.post("/cidades/", json=minimal_cidade)
+        
+        assert response.status_code == 200
+        data = response.json()
+        assert data["nome"] == minimal_cidade["nome"]
+        assert data["estado"] == minimal_cidade["estado"]
\ No newline at end of file
@@ -4,12 +4,10 @@ from unittest.mock import patch, Mock
 class TestCorretoresRoutes:
     """Testes para as rotas de corretores"""
     
-    @patch('src.app.routers.corretores.MongoRepository')
-    def test_create_corretor_success(self, mock_mongo_class, client, sample_corretor):
+    def test_create_corretor_success(self, client, mock_mongo_repo, sample_corretor):
         """Testa criação bem-sucedida de um corretor"""
-        mock_mongo = Mock()
+        mock_mongo = mock_mongo_repo
         mock_mongo.add_corretor.return_value = "507f1f77bcf86cd799439012"
-        mock_mongo_class.return_value = mock_mongo
         
         response = client.post("/corretores/", json=sample_corretor)
         
@@ -22,12 +20,21 @@ class TestCorretoresRoutes:
         
         mock_mongo.add_corretor.assert_called_once()
     
-    @patch('src.app.routers.corretores.MongoRepository')
-    def test_read_corretores_success(self, mock_mongo_class, client, sample_corretor_in_db):
+    def test_create_corretor_duplicate_creci(self, client, mock_mongo_repo, sample_corretor):
+        """Testa que o índice único de CRECI vira 409"""
+        from pymongo.errors import DuplicateKeyError
+        mock_mongo_repo.add_corretor.side_effect = DuplicateKeyError("E11000 duplicate key")
+        
+        response = client.post("/corretores/", json=sample_corretor)
+        
+        assert response.status_code == 409
+        assert sample_corretor["creci"] in response.json()["detail"]
+    
+    def test_read_corretores_success(self, client, mock_mongo_repo, sample_corretor_in_db):
         """Testa listagem de corretores"""
-        mock_mongo = Mock()
-        mock_mongo.get_all_corretores.return_value = [sample_corretor_in_db]
-        mock_mongo_class.return_value = mock_mongo
+        mock_mongo = mock_mongo_repo
+        mock_mongo.count_corretores.return_value = 1
+        mock_mongo.get_corretores_page.return_value = [sample_corretor_in_db]
         
         response = client.get("/corretores/")
         
@@ -38,12 +45,51 @@ class TestCorretoresRoutes:
         assert data[0]["nome"] == sample_corretor_in_db["nome"]
         assert data[0]["creci"] == sample_corretor_in_db["creci"]
     
-    @patch('src.app.routers.corretores.MongoRepository')
-    def test_read_corretor_by_id_success(self, mock_mongo_class, client, sample_corretor_in_db):
+    def test_read_corretores_by_cidade_expanded(self, client, mock_mongo_repo, sample_corretor_in_db):
+        """Testa filtro por cidade atendida com as cidades expandidas na mesma resposta"""
+        mock_mongo = mock_mongo_repo
+        cidade_id = sample_corretor_in_db["cidades_atendidas"][0]
+        mock_mongo.count_corretores.return_value = 1
+        mock_mongo.find_corretores.return_value = [
+            {**sample_corretor_in_db, "cidades": [{"id": cidade_id, "nome": "Goiânia", "estado": "GO"}]}
+        ]
+        
+        response = client.get(f"/corretores/?cidade={cidade_id}&expand=cidades")
+        
+        assert response.status_code == 200
+        data = response.json()
+        assert data[0]["cidades"][0]["nome"] == "Goiânia"
+        mock_mongo.find_corretores.assert_called_once_with(
+            {"cidades_atendidas": cidade_id}, expand_cidades=True, limit=None, after=None, projection=None
+        )
+        mock_mongo.count_corretores.assert_called_once_with({"cidades_atendidas": cidade_id})
+        mock_mongo.get_corretores_page.assert_not_called()
+    
+    def test_read_corretores_invalid_expand(self, client):
+        """Testa expansão não suportada"""
+        response = client.get("/corretores/?expand=imoveis")
+        
+        assert response.status_code == 422
+    
+    def test_bulk_create_corretores_duplicate_creci(self, client, mock_mongo_repo, sample_corretor):
+        """Testa carga em massa com CRECI duplicado reportado no item"""
+        mock_mongo_repo.bulk_add_corretores.return_value = [
+            {"id": "507f1f77bcf86cd799439012", "status": "created"},
+            {"id": "507f1f77bcf86cd799439013", "status": "error", "error": "E11000 duplicate key error"}
+        ]
+        
+        response = client.post("/corretores/bulk", json=[sample_corretor, sample_corretor])
+        
+        assert response.status_code == 200
+        data = response.json()
+        assert data["counts"] == {"created": 1, "error": 1}
+        assert data["items"][1]["index"] == 1
+        assert "duplicate" in data["items"][1]["error"]
+    
+    def test_read_corretor_by_id_success(self, client, mock_mongo_repo, sample_corretor_in_db):
         """Testa busca de corretor por ID"""
-        mock_mongo = Mock()
+        mock_mongo = mock_mongo_repo
         mock_mongo.get_corretor_by_id.return_value = sample_corretor_in_db
-        mock_mongo_class.return_value = mock_mongo
         
         corretor_id = sample_corretor_in_db["id"]
         response = client.get(f"/corretores/{corretor_id}")
@@ -53,24 +99,20 @@ class TestCorretoresRoutes:
         assert data["id"] == corretor_id
         assert data["nome"] == sample_corretor_in_db["nome"]
     
-    @patch('src.app.routers.corretores.MongoRepository')
-    def test_read_corretor_by_id_not_found(self, mock_mongo_class, client):
+    def test_read_corretor_by_id_not_found(self, client, mock_mongo_repo):
         """Testa busca de corretor inexistente"""
-        mock_mongo = Mock()
+        mock_mongo = mock_mongo_repo
         mock_mongo.get_corretor_by_id.return_value = None
-        mock_mongo_class.return_value = mock_mongo
         
         response = client.get("/corretores/507f1f77bcf86cd799439999")
         
         assert response.status_code == 404
         assert response.json()["detail"] == "Corretor not found"
     
-    @patch('src.app.routers.corretores.MongoRepository')
-    def test_update_corretor_success(self, mock_mongo_class, client, sample_corretor, sample_corretor_in_db):
+    def test_update_corretor_success(self, client, mock_mongo_repo, sample_corretor, sample_corretor_in_db):
         """Testa atualização de corretor"""
-        mock_mongo = Mock()
+        mock_mongo = mock_mongo_repo
         mock_mongo.get_corretor_by_id.return_value = sample_corretor_in_db
-        mock_mongo_class.return_value = mock_mongo
         
         corretor_id = sample_corretor_in_db["id"]
         updated_data = {**sample_corretor, "nome": "João Silva Atualizado"}
@@ -83,24 +125,20 @@ class TestCorretoresRoutes:
         
         mock_mongo.update_corretor.assert_called_once()
     
-    @patch('src.app.routers.corretores.MongoRepository')
-    def test_update_corretor_not_found(self, mock_mongo_class, client, sample_corretor):
+    def test_update_corretor_not_found(self, client, mock_mongo_repo, sample_corretor):
         """Testa atualização de corretor inexistente"""
-        mock_mongo = Mock()
+        mock_mongo = mock_mongo_repo
         mock_mongo.get_corretor_by_id.return_value = None
-        mock_mongo_class.return_value = mock_mongo
         
         response = client.put("/corretores/507f1f77bcf86cd799439999", json=sample_corretor)
         
         assert response.status_code == 404
         assert response.json()["detail"] == "Corretor not found"
     
-    @patch('src.app.routers.corretores.MongoRepository')
-    def test_delete_corretor_success(self, mock_mongo_class, client, sample_corretor_in_db):
+    def test_delete_corretor_success(self, client, mock_mongo_repo, sample_corretor_in_db):
         """Testa exclusão de corretor"""
-        mock_mongo = Mock()
+        mock_mongo = mock_mongo_repo
         mock_mongo.get_corretor_by_id.return_value = sample_corretor_in_db
-        mock_mongo_class.return_value = mock_mongo
         
         corretor_id = sample_corretor_in_db["id"]
         response = client.delete(f"/corretores/{corretor_id}")
@@ -112,12 +150,10 @@ class TestCorretoresRoutes:
         
         mock_mongo.delete_corretor.assert_called_once_with(corretor_id)
     
-    @patch('src.app.routers.corretores.MongoRepository')
-    def test_delete_corretor_not_found(self, mock_mongo_class, client):
+    def test_delete_corretor_not_found(self, client, mock_mongo_repo):
         """Testa exclusão de corretor inexistente"""
-        mock_mongo = Mock()
+        mock_mongo = mock_mongo_repo
         mock_mongo.get_corretor_by_id.return_value = None
-        mock_mongo_class.return_value = mock_mongo
         
         response = client.delete("/corretores/507f1f77bcf86cd799439999")
         
@@ -0,0 +1,206 @@
+import json
+import pytest
+from unittest.mock import Mock
+from redis.exceptions import ResponseError
+from src.app.services.event_log import EventLog, coalesce_events, coalesce_changes, coalesce_actions, shard_for
+
+class TestEventLog:
+    """Testes unitários do stream de eventos do integrador"""
+
+    @pytest.fixture
+    def events(self, mock_redis):
+        return EventLog(mock_redis, stream="imoveis.events", maxlen=1000)
+
+    def test_publish_appends_to_stream(self, events, mock_redis):
+        """Testa o formato versionado e compacto (operação + IDs) com MAXLEN aproximado"""
+        mock_redis.xadd.return_value = "1-0"
+
+        assert events.publish("upsert", ["abc"]) == "1-0"
+        mock_redis.xadd.assert_called_once_with(
+            "imoveis.events", {"v": "1", "op": "upsert", "ids": '["abc"]'}, maxlen=1000, approximate=True
+        )
+
+    def test_ensure_group_ignores_existing_group(self, events, mock_redis):
+        """Testa que criar o grupo é idempotente"""
+        mock_redis.xgroup_create.side_effect = ResponseError("BUSYGROUP Consumer Group name already exists")
+
+        events.ensure_group("integrador")
+
+        mock_redis.xgroup_create.assert_called_once_with("imoveis.events", "integrador", id="0", mkstream=True)
+
+    def test_replay_from_is_applied_once_per_id(self, events, mock_redis):
+        """Testa que reinícios com a mesma INTEGRADOR_REPLAY_FROM não repetem o replay"""
+        aplicados = {}
+        mock_redis.get.side_effect = aplicados.get
+        mock_redis.set.side_effect = aplicados.__setitem__
+
+        assert events.replay_from("0", group="integrador") is True
+        assert events.replay_from("0", group="integrador") is False
+        assert events.replay_from("5-0", group="integrador") is True
+
+        setids = [chamada.args for chamada in mock_redis.xgroup_setid.call_args_list]
+        assert setids == [("imoveis.events", "integrador", "0"), ("imoveis.events", "integrador", "5-0")]
+
+    def test_read_returns_new_entries(self, events, mock_redis):
+        """Testa a leitura pelo consumer group ('>' = entradas ainda não entregues)"""
+        mock_redis.xreadgroup.return_value = [["imoveis.events", [("1-0", {"type": "imoveis.delete", "data": "{}"})]]]
+
+        entries = events.read("replica-1", count=10, block_ms=5, group="integrador")
+
+        assert entries == [("1-0", {"type": "imoveis.delete", "data": "{}"})]
+        mock_redis.xreadgroup.assert_called_once_with(
+            "integrador", "replica-1", {"imoveis.events": ">"}, count=10, block=5
+        )
+
+    def test_claim_stale_dead_letters_poison_entries(self, events, mock_redis):
+        """Testa que entradas com entregas demais vão para o dead letter e entradas cortadas são confirmadas"""
+        campos = {"type": "imoveis.create", "data": "{}"}
+        mock_redis.xautoclaim.return_value = ["0-0", [("1-0", campos), ("2-0", None), ("3-0", campos)], []]
+        entregas = {"1-0": 2, "2-0": 1, "3-0": 99}
+        mock_redis.xpending_range.side_effect = lambda stream, group, min, max, count: [
+            {"message_id": min, "times_delivered": entregas[min]}
+        ]
+
+        entries = events.claim_stale("replica-2", min_idle_ms=100, group="integrador")
+
+        assert entries == [("1-0", campos)]
+        mock_redis.xadd.assert_called_once_with(
+            "imoveis.events.dead", {**campos, "original_id": "3-0"}, maxlen=1000, approximate=True
+        )
+        acks = [chamada.args[2:] for chamada in mock_redis.xack.call_args_list]
+        assert acks == [("2-0",), ("3-0",)]
+
+    def test_claim_stale_skips_in_flight_entries(self, events, mock_redis):
+        """Testa que entradas ainda em processamento têm o tempo ocioso renovado e não são reassumidas nem descartadas"""
+        campos = {"v": "1", "op": "upsert", "ids": '["a"]'}
+        mock_redis.xautoclaim.return_value = ["0-0", [("1-0", campos), ("2-0", campos)], []]
+        mock_redis.xpending_range.return_value = [{"message_id": "2-0", "times_delivered": 1}]
+
+        entries = events.claim_stale("replica-1", min_idle_ms=100, group="integrador", in_flight={"1-0": {}})
+
+        assert entries == [("2-0", campos)]
+        mock_redis.xclaim.assert_called_once_with("imoveis.events", "integrador", "replica-1", 0, ["1-0"], justid=True)
+        mock_redis.xadd.assert_not_called()
+
+    def test_claim_stale_counts_deliveries_per_claimed_entry(self, events, mock_redis):
+        """Testa que uma entrada em processamento no meio do intervalo não esconde as entregas das reassumidas"""
+        campos = {"v": "1", "op": "upsert", "ids": '["a"]'}
+        # 2-0 está em processamento; 1-0 e 3-0 são reassumidas e 3-0 já excedeu as entregas
+        pendentes = [
+            {"message_id": "1-0", "times_delivered": 2},
+            {"message_id": "2-0", "times_delivered": 1},
+            {"message_id": "3-0", "times_delivered": 99}
+        ]
+        mock_redis.xautoclaim.return_value = ["0-0", [("1-0", campos), ("2-0", campos), ("3-0", campos)], []]
+        mock_redis.xpending_range.side_effect = lambda stream, group, min, max, count: [
+            pendente for pendente in pendentes if min <= pendente["message_id"] <= max
+        ][:count]
+
+        entries = events.claim_stale("replica-1", min_idle_ms=100, group="integrador", in_flight={"2-0": {}})
+
+        assert entries == [("1-0", campos)]
+        mock_redis.xadd.assert_called_once_with(
+            "imoveis.events.dead", {**campos, "original_id": "3-0"}, maxlen=1000, approximate=True
+        )
+
+    def test_stats_reports_group_lag(self, events, mock_redis):
+        """Testa o resumo de pendências e lag do grupo"""
+        mock_redis.xinfo_groups.return_value = [
+            {"name": "integrador", "consumers": 2, "pending": 3, "last-delivered-id": "5-0", "lag": 7}
+        ]
+        mock_redis.xlen.return_value = 10
+        mock_redis.hgetall.return_value = {"integrador-1:0": json.dumps({"queue_depth": 2, "lag_ms": 35.0})}
+
+        stats = events.stats("integrador")
+
+        assert stats["length"] == 10
+        assert stats["workers"] == {"integrador-1:0": {"queue_depth": 2, "lag_ms": 35.0}}
+        assert stats["group"]["pending"] == 3
+        assert stats["group"]["lag"] == 7
+
+
+class TestCoalesceEvents:
+    """Testes da coalescência dos eventos por documento no integrador (formato atual e o anterior, ainda retido)"""
+
+    @staticmethod
+    def evento(tipo, data):
+        return {"type": tipo, "data": data if isinstance(data, str) else json.dumps(data)}
+
+    def test_create_then_updates_become_single_upsert(self):
+        """Testa que create+update do mesmo imóvel viram um único upsert"""
+        plano = coalesce_events([
+            self.evento("imoveis.create", {"_id": "a", "descricao": "x"}),
+            self.evento("imoveis.update", "a"),
+            self.evento("imoveis.update", {"_id": "a"}),
+        ])
+
+        assert plano == {"clear": False, "upsert": ["a"], "delete": [], "ignored": 0}
+
+    def test_last_action_wins(self):
+        """Testa que qualquer sequência terminada em delete vira delete, e delete seguido de create vira upsert"""
+        plano = coalesce_events([
+            self.evento("imoveis.create", "a"),
+            self.evento("imoveis.delete", {"_id": "a"}),
+            self.evento("imoveis.delete", "b"),
+            self.evento("imoveis.create", "b"),
+        ])
+
+        assert plano["upsert"] == ["b"]
+        assert plano["delete"] == ["a"]
+
+    def test_versioned_schema_and_unknown_versions(self):
+        """Testa o formato v1 e que versões desconhecidas são ignoradas"""
+        plano = coalesce_events([
+            {"v": "1", "op": "upsert", "ids": '["a", "b"]'},
+            {"v": "1", "op": "delete", "ids": '["b"]'},
+            {"v": "1", "op": "clear", "ids": "[]"},
+            {"v": "1", "op": "upsert", "ids": '["c"]'},
+            {"v": "2", "op": "upsert", "ids": '["d"]'},
+        ])
+
+        assert plano == {"clear": True, "upsert": ["c"], "delete": [], "ignored": 1}
+
+    def test_bulk_and_clear(self):
+        """Testa eventos em bloco e que o clear descarta o que veio antes dele no lote"""
+        plano = coalesce_events([
+            self.evento("imoveis.bulk", {"action": "upsert", "ids": ["a", "b"]}),
+            self.evento("imoveis.clear", {"action": "clear_all"}),
+            self.evento("imoveis.bulk", {"action": "delete", "ids": ["c"]}),
+            self.evento("imoveis.create", "d"),
+            self.evento("imoveis.desconhecido", "{}"),
+        ])
+
+        assert plano == {"clear": True, "upsert": ["d"], "delete": ["c"], "ignored": 1}
+
+    def test_coalesce_actions_keeps_last_action_per_id(self):
+        """Testa a coalescência usada por cada worker do pool"""
+        assert coalesce_actions([("upsert", "a"), ("delete", "b"), ("delete", "a"), ("upsert", "b")]) == {
+            "upsert": ["b"], "delete": ["a"]
+        }
+
+    def test_shard_for_is_stable(self):
+        """Testa que o mesmo _id sempre cai no mesmo worker (ordem por documento preservada)"""
+        ids = [f"507f1f77bcf86cd7994390{i:02d}" for i in range(50)]
+
+        shards = [shard_for(item_id, 4) for item_id in ids]
+
+        assert shards == [shard_for(item_id, 4) for item_id in ids]
+        assert set(shards) <= {0, 1, 2, 3}
+        assert len(set(shards)) > 1
+
+    def test_coalesce_changes_from_mongo_change_stream(self):
+        """Testa o mapeamento das alterações do change stream do MongoDB para o mesmo plano dos eventos"""
+        def change(operacao, item_id=None):
+            return {"operationType": operacao, **({"documentKey": {"_id": item_id}} if item_id else {})}
+
+        plano = coalesce_changes([
+            change("insert", "a"),
+            change("drop"),
+            change("invalidate"),
+            change("insert", "b"),
+            change("update", "b"),
+            change("replace", "c"),
+            change("delete", "c"),
+        ])
+
+        assert plano == {"clear": True, "upsert": ["b"], "delete": ["c"], "ignored": 1}
@@ -4,16 +4,10 @@ from unittest.mock import patch, Mock
 class TestImoveisRoutes:
     """Testes para as rotas de imóveis"""
     
-    @patch('src.app.routers.imoveis.MongoRepository')
-    @patch('src.app.routers.imoveis.MessageBrokerService')
-    def test_create_imovel_success(self, mock_broker, mock_mongo_class, client, sample_imovel):
-        """Testa criação bem-sucedida de um imóvel"""
-        mock_mongo = Mock()
+    def test_create_imovel_success(self, client, mock_mongo_repo, mock_event_log, sample_imovel):
+        """Testa criação bem-sucedida de um imóvel (o evento de indexação é publicado pelo repositório)"""
+        mock_mongo = mock_mongo_repo
         mock_mongo.add_imovel.return_value = "507f1f77bcf86cd799439011"
-        mock_mongo_class.return_value = mock_mongo
-        
-        mock_broker_instance = Mock()
-        mock_broker.return_value = mock_broker_instance
         
         response = client.post("/imoveis/", json=sample_imovel)
         
@@ -23,14 +17,13 @@ class TestImoveisRoutes:
         assert data["id"] == "507f1f77bcf86cd799439011"
         
         mock_mongo.add_imovel.assert_called_once()
-        mock_broker_instance.publish_imovel_event.assert_called_once()
+        mock_event_log.publish.assert_not_called()
     
-    @patch('src.app.routers.imoveis.MongoRepository')
-    def test_read_imoveis_success(self, mock_mongo_class, client, sample_imovel_in_db):
+    def test_read_imoveis_success(self, client, mock_mongo_repo, sample_imovel_in_db):
         """Testa listagem de imóveis"""
-        mock_mongo = Mock()
-        mock_mongo.get_all_imoveis.return_value = [sample_imovel_in_db]
-        mock_mongo_class.return_value = mock_mongo
+        mock_mongo = mock_mongo_repo
+        mock_mongo.count_imoveis.return_value = 1
+        mock_mongo.get_imoveis_page.return_value = [sample_imovel_in_db]
         
         response = client.get("/imoveis/")
         
@@ -40,12 +33,46 @@ class TestImoveisRoutes:
         assert data[0]["id"] == sample_imovel_in_db["id"]
         assert data[0]["titulo"] == sample_imovel_in_db["titulo"]
     
-    @patch('src.app.routers.imoveis.MongoRepository')
-    def test_read_imovel_by_id_success(self, mock_mongo_class, client, sample_imovel_in_db):
+    def test_read_imoveis_paginated(self, client, mock_mongo_repo, sample_imovel_in_db):
+        """Testa paginação por cursor e projeção de campos na listagem de imóveis"""
+        mock_mongo_repo.count_imoveis.return_value = 10
+        mock_mongo_repo.get_imoveis_page.return_value = [
+            {"id": "507f1f77bcf86cd799439011", "titulo": "Casa A"},
+            {"id": "507f1f77bcf86cd799439012", "titulo": "Casa B"}
+        ]
+        
+        response = client.get("/imoveis/?limit=2&after=507f1f77bcf86cd799439010&fields=titulo")
+        
+        assert response.status_code == 200
+        assert response.headers["X-Total-Count"] == "10"
+        assert response.headers["X-Next-Cursor"] == "507f1f77bcf86cd799439012"
+        mock_mongo_repo.get_imoveis_page.assert_called_once_with(
+            limit=2, after="507f1f77bcf86cd799439010", projection={"titulo": 1}
+        )
+    
+    def test_read_imoveis_last_page_has_no_cursor(self, client, mock_mongo_repo, sample_imovel_in_db):
+        """Testa que a última página não devolve X-Next-Cursor"""
+        mock_mongo_repo.count_imoveis.return_value = 1
+        mock_mongo_repo.get_imoveis_page.return_value = [sample_imovel_in_db]
+        
+        response = client.get("/imoveis/?limit=5")
+        
+        assert response.status_code == 200
+        assert "X-Next-Cursor" not in response.headers
+    
+    def test_read_imoveis_invalid_cursor(self, client, mock_mongo_repo):
+        """Testa cursor inválido na paginação"""
+        from bson.errors import InvalidId
+        mock_mongo_repo.get_imoveis_page.side_effect = InvalidId("Cursor inválido: abc")
+        
+        response = client.get("/imoveis/?limit=5&after=abc")
+        
+        assert response.status_code == 400
+    
+    def test_read_imovel_by_id_success(self, client, mock_mongo_repo, sample_imovel_in_db):
         """Testa busca de imóvel por ID"""
-        mock_mongo = Mock()
+        mock_mongo = mock_mongo_repo
         mock_mongo.get_imovel_by_id.return_value = sample_imovel_in_db
-        mock_mongo_class.return_value = mock_mongo
         
         imovel_id = sample_imovel_in_db["id"]
         response = client.get(f"/imoveis/{imovel_id}")
@@ -55,28 +82,20 @@ class TestImoveisRoutes:
         assert data["id"] == imovel_id
         assert data["titulo"] == sample_imovel_in_db["titulo"]
     
-    @patch('src.app.routers.imoveis.MongoRepository')
-    def test_read_imovel_by_id_not_found(self, mock_mongo_class, client):
+    def test_read_imovel_by_id_not_found(self, client, mock_mongo_repo):
         """Testa busca de imóvel inexistente"""
-        mock_mongo = Mock()
+        mock_mongo = mock_mongo_repo
         mock_mongo.get_imovel_by_id.return_value = None
-        mock_mongo_class.return_value = mock_mongo
         
         response = client.get("/imoveis/507f1f77bcf86cd799439999")
         
         assert response.status_code == 404
         assert response.json()["detail"] == "Imovel not found"
     
-    @patch('src.app.routers.imoveis.MongoRepository')
-    @patch('src.app.routers.imoveis.MessageBrokerService')
-    def test_update_imovel_success(self, mock_broker, mock_mongo_class, client, sample_imovel, sample_imovel_in_db):
+    def test_update_imovel_success(self, client, mock_mongo_repo, mock_event_log, sample_imovel, sample_imovel_in_db):
         """Testa atualização de imóvel"""
-        mock_mongo = Mock()
+        mock_mongo = mock_mongo_repo
         mock_mongo.get_imovel_by_id.return_value = sample_imovel_in_db
-        mock_mongo_class.return_value = mock_mongo
-        
-        mock_broker_instance = Mock()
-        mock_broker.return_value = mock_broker_instance
         
         imovel_id = sample_imovel_in_db["id"]
         updated_data = {**sample_imovel, "titulo": "Apartamento Atualizado"}
@@ -88,18 +107,12 @@ class TestImoveisRoutes:
         assert data["id"] == imovel_id
         
         mock_mongo.update_imovel.assert_called_once()
-        mock_broker_instance.publish_imovel_event.assert_called_once()
+        mock_event_log.publish.assert_not_called()
     
-    @patch('src.app.routers.imoveis.MongoRepository')
-    @patch('src.app.routers.imoveis.MessageBrokerService')
-    def test_delete_imovel_success(self, mock_broker, mock_mongo_class, client, sample_imovel_in_db):
+    def test_delete_imovel_success(self, client, mock_mongo_repo, mock_event_log, sample_imovel_in_db):
         """Testa exclusão de imóvel"""
-        mock_mongo = Mock()
+        mock_mongo = mock_mongo_repo
         mock_mongo.get_imovel_by_id.return_value = sample_imovel_in_db
-        mock_mongo_class.return_value = mock_mongo
-        
-        mock_broker_instance = Mock()
-        mock_broker.return_value = mock_broker_instance
         
         imovel_id = sample_imovel_in_db["id"]
         response = client.delete(f"/imoveis/{imovel_id}")
@@ -110,26 +123,21 @@ class TestImoveisRoutes:
         assert data["id"] == imovel_id
         
         mock_mongo.delete_imovel.assert_called_once_with(imovel_id)
-        mock_broker_instance.publish_imovel_event.assert_called_once()
+        mock_event_log.publish.assert_not_called()
     
-    @patch('src.app.routers.imoveis.MongoRepository')
     @patch('src.app.routers.imoveis.ChromaRepository')
-    @patch('src.app.routers.imoveis.EmbeddingService')
     @patch('src.app.routers.imoveis.IndexingService')
-    def test_sync_mongo_to_chroma(self, mock_indexing_class, mock_embedding_class, 
-                                  mock_chroma_class, mock_mongo_class, client, sample_imovel_in_db):
+    def test_sync_mongo_to_chroma(self, mock_indexing_class, mock_chroma_class, 
+                                  client, mock_mongo_repo, sample_imovel_in_db):
         """Testa sincronização MongoDB -> ChromaDB"""
-        mock_mongo = Mock()
-        mock_mongo.get_all_imoveis.return_value = [sample_imovel_in_db]
-        mock_mongo_class.return_value = mock_mongo
-        
         mock_chroma = Mock()
         mock_chroma_class.return_value = mock_chroma
         
-        mock_embedding = Mock()
-        mock_embedding_class.return_value = mock_embedding
-        
         mock_indexing = Mock()
+        mock_indexing.sync_from_mongo.return_value = {
+            "total": 1, "synced": 1, "unchanged": 0, "deleted": 0, "failed": 0, "chunks": 1,
+            "elapsed_seconds": 0.5, "docs_per_second": 2.0
+        }
         mock_indexing_class.return_value = mock_indexing
         
         response = client.post("/imoveis/sync")
@@ -138,4 +146,292 @@ class TestImoveisRoutes:
         data = response.json()
         assert data["synced"] == 1
         assert data["total"] == 1
-        assert "Sincronização concluída" in data["message"]
\ No newline at end of file
+        assert "Sincronização concluída" in data["message"]
+        mock_indexing.sync_from_mongo.assert_called_once()    
+    def test_export_imoveis_ndjson(self, client, mock_mongo_repo, sample_imovel_in_db):
+        """Testa exportação do catálogo em NDJSON"""
+        import json
+        outro = {**sample_imovel_in_db, "id": "507f1f77bcf86cd799439012"}
+        mock_mongo_repo.iter_imoveis.return_value = iter([sample_imovel_in_db, outro])
+        
+        response = client.get("/imoveis/export?batch_size=1")
+        
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        linhas = response.text.strip().split("\n")
+        assert len(linhas) == 2
+        assert json.loads(linhas[0])["id"] == sample_imovel_in_db["id"]
+        assert json.loads(linhas[1])["id"] == "507f1f77bcf86cd799439012"
+        mock_mongo_repo.iter_imoveis.assert_called_once_with(batch_size=1, projection=None)
+    
+    def test_export_imoveis_gzip(self, client, mock_mongo_repo, sample_imovel_in_db):
+        """Testa exportação comprimida em gzip"""
+        import gzip
+        import json
+        mock_mongo_repo.iter_imoveis.return_value = iter([sample_imovel_in_db])
+        
+        response = client.get("/imoveis/export?gzip=true")
+        
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/gzip"
+        conteudo = gzip.decompress(response.content).decode("utf-8")
+        assert json.loads(conteudo.strip())["titulo"] == sample_imovel_in_db["titulo"]
+
+    def test_bulk_create_imoveis_json(self, client, mock_mongo_repo, sample_imovel):
+        """Testa carga em massa via array JSON, com item inválido reportado sem abortar os demais"""
+        mock_mongo_repo.bulk_add_imoveis.return_value = [
+            {"id": "507f1f77bcf86cd799439011", "status": "created"},
+            {"id": "507f1f77bcf86cd799439012", "status": "created"}
+        ]
+        
+        response = client.post("/imoveis/bulk", json=[sample_imovel, {"titulo": "Sem descrição"}, sample_imovel])
+        
+        assert response.status_code == 200
+        data = response.json()
+        assert data["total"] == 3
+        assert data["counts"] == {"created": 2, "invalid": 1}
+        assert [item["status"] for item in data["items"]] == ["created", "invalid", "created"]
+        assert data["items"][2] == {"index": 2, "id": "507f1f77bcf86cd799439012", "status": "created"}
+        mock_mongo_repo.bulk_add_imoveis.assert_called_once_with([sample_imovel, sample_imovel])
+    
+    def test_bulk_create_imoveis_ndjson(self, client, mock_mongo_repo, sample_imovel):
+        """Testa carga em massa via NDJSON (um imóvel por linha)"""
+        import json
+        mock_mongo_repo.bulk_add_imoveis.return_value = [{"id": "507f1f77bcf86cd799439011", "status": "created"}]
+        
+        response = client.post(
+            "/imoveis/bulk",
+            content=json.dumps(sample_imovel) + "\n\n",
+            headers={"Content-Type": "application/x-ndjson"}
+        )
+        
+        assert response.status_code == 200
+        assert response.json()["counts"] == {"created": 1}
+        mock_mongo_repo.bulk_add_imoveis.assert_called_once_with([sample_imovel])
+    
+    def test_bulk_create_imoveis_malformed(self, client, mock_mongo_repo):
+        """Testa corpo que não é array JSON"""
+        response = client.post("/imoveis/bulk", json={"titulo": "x"})
+        
+        assert response.status_code == 400
+        mock_mongo_repo.bulk_add_imoveis.assert_not_called()
+    
+    def test_bulk_update_and_delete_imoveis(self, client, mock_mongo_repo, sample_imovel):
+        """Testa atualização e remoção em massa (itens sem id são inválidos)"""
+        mock_mongo_repo.bulk_update_imoveis.return_value = [{"id": "507f1f77bcf86cd799439011", "status": "updated"}]
+        mock_mongo_repo.bulk_delete_imoveis.return_value = [
+            {"id": "507f1f77bcf86cd799439011", "status": "deleted"},
+            {"id": "507f1f77bcf86cd799439099", "status": "not_found"}
+        ]
+        
+        response = client.put("/imoveis/bulk", json=[{"id": "507f1f77bcf86cd799439011", **sample_imovel}, sample_imovel])
+        
+        assert response.json()["counts"] == {"updated": 1, "invalid": 1}
+        mock_mongo_repo.bulk_update_imoveis.assert_called_once_with([("507f1f77bcf86cd799439011", sample_imovel)])
+        
+        response = client.request(
+            "DELETE", "/imoveis/bulk", json=["507f1f77bcf86cd799439011", {"id": "507f1f77bcf86cd799439099"}]
+        )
+        
+        assert response.json()["counts"] == {"deleted": 1, "not_found": 1}
+        mock_mongo_repo.bulk_delete_imoveis.assert_called_once_with(
+            ["507f1f77bcf86cd799439011", "507f1f77bcf86cd799439099"]
+        )
+
+
+class TestMongoRepositoryBulk:
+    """Testes unitários das operações em massa e dos eventos do MongoRepository"""
+    
+    @pytest.fixture
+    def repo(self, mock_redis):
+        from unittest.mock import MagicMock
+        from src.app.repositories.mongo_repository import MongoRepository
+        return MongoRepository(db_name="test", client=MagicMock(), redis_client=mock_redis)
+    
+    def test_bulk_add_imoveis_reports_errors_and_publishes_per_chunk(self, repo, mock_redis, sample_imovel):
+        """insert_many ordered=False: falhas viram erro do item e cada bloco publica um evento"""
+        import json
+        from pymongo.errors import BulkWriteError
+        repo.collection.insert_many.side_effect = [
+            None,
+            BulkWriteError({"writeErrors": [{"index": 0, "errmsg": "E11000 duplicate key"}]})
+        ]
+        
+        resultados = repo.bulk_add_imoveis([sample_imovel] * 3, chunk_size=2)
+        
+        assert [r["status"] for r in resultados] == ["created", "created", "error"]
+        assert resultados[2]["error"] == "E11000 duplicate key"
+        assert repo.collection.insert_many.call_count == 2
+        assert all(chamada.kwargs["ordered"] is False for chamada in repo.collection.insert_many.call_args_list)
+        eventos = [c.args[1] for c in mock_redis.xadd.call_args_list]
+        assert [evento["op"] for evento in eventos] == ["upsert"]
+        assert json.loads(eventos[0]["ids"]) == [resultados[0]["id"], resultados[1]["id"]]
+    
+    def test_bulk_delete_imoveis_single_delete_many(self, repo, mock_redis):
+        """Remove o bloco com um delete_many e marca IDs inexistentes como not_found"""
+        from bson import ObjectId
+        existente = "507f1f77bcf86cd799439011"
+        repo.collection.find.return_value = [{"_id": ObjectId(existente)}]
+        
+        resultados = repo.bulk_delete_imoveis([existente, "507f1f77bcf86cd799439099", "invalido"])
+        
+        assert [r["status"] for r in resultados] == ["deleted", "not_found", "not_found"]
+        repo.collection.delete_many.assert_called_once()
+        mock_redis.xadd.assert_called_once()
+        assert mock_redis.xadd.call_args.args[1] == {"v": "1", "op": "delete", "ids": '["%s"]' % existente}
+    
+    def test_single_writes_publish_one_event_each(self, repo, mock_redis, sample_imovel):
+        """Cada escrita publica exatamente um evento, no formato versionado"""
+        from bson import ObjectId
+        repo.collection.insert_one.return_value = Mock(inserted_id=ObjectId("507f1f77bcf86cd799439011"))
+        
+        repo.add_imovel(sample_imovel)
+        repo.update_imovel("507f1f77bcf86cd799439011", sample_imovel)
+        repo.delete_imovel("507f1f77bcf86cd799439011")
+        repo.delete_all_imoveis()
+        
+        eventos = [c.args[1] for c in mock_redis.xadd.call_args_list]
+        assert [(evento["op"], evento["ids"]) for evento in eventos] == [
+            ("upsert", '["507f1f77bcf86cd799439011"]'),
+            ("upsert", '["507f1f77bcf86cd799439011"]'),
+            ("delete", '["507f1f77bcf86cd799439011"]'),
+            ("clear", "[]"),
+        ]
+        assert all(evento["v"] == "1" for evento in eventos)
+
+class TestIndexingService:
+    """Testes unitários do IndexingService"""
+    
+    def test_index_imoveis_forwards_embeddings(self, mock_chroma_repo, mock_embedding_service, sample_imovel_in_db):
+        """Testa que os embeddings calculados são enviados ao ChromaDB (sem re-embedding)"""
+        from src.app.services.indexing_service import IndexingService
+        from src.app.models import ImovelInDB
+        
+        imovel = ImovelInDB(**sample_imovel_in_db)
+        IndexingService(mock_embedding_service, mock_chroma_repo).index_imoveis([imovel])
+        
+        kwargs = mock_chroma_repo.add_documents.call_args.kwargs
+        assert kwargs["embeddings"] == [[0.1, 0.2, 0.3]]
+        assert kwargs["ids"] == [sample_imovel_in_db["id"]]
+    
+    def test_index_single_imovel_forwards_embedding(self, mock_chroma_repo, mock_embedding_service, sample_imovel_in_db):
+        """Testa que a indexação individual também envia o embedding calculado"""
+        from src.app.services.indexing_service import IndexingService
+        from src.app.models import ImovelInDB
+        
+        imovel = ImovelInDB(**sample_imovel_in_db)
+        IndexingService(mock_embedding_service, mock_chroma_repo).index_single_imovel(imovel)
+        
+        kwargs = mock_chroma_repo.upsert_documents.call_args.kwargs
+        assert kwargs["embeddings"] == [[0.1, 0.2, 0.3]]
+    
+    def test_sync_from_mongo_indexes_in_chunks(self, mock_mongo_repo, mock_chroma_repo, mock_embedding_service):
+        """Testa que a sincronização faz um encode e um upsert por bloco"""
+        from src.app.services.indexing_service import IndexingService
+        
+        documentos = [
+            {"id": f"507f1f77bcf86cd79943901{i}", "titulo": f"Casa {i}", "descricao": "Casa", "especificacoes": []}
+            for i in range(5)
+        ]
+        mock_mongo_repo.iter_imoveis.return_value = iter(documentos)
+        mock_embedding_service.create_embeddings.side_effect = lambda texts, batch_size=None: [[0.0]] * len(texts)
+        mock_chroma_repo.get_metadatas.return_value = {}
+        mock_chroma_repo.iter_ids.return_value = iter([])
+        progresso = []
+        
+        stats = IndexingService(mock_embedding_service, mock_chroma_repo).sync_from_mongo(
+            mock_mongo_repo, chunk_size=2, batch_size=8, progress_callback=progresso.append
+        )
+        
+        assert stats["total"] == 5
+        assert stats["synced"] == 5
+        assert stats["chunks"] == 3
+        assert mock_chroma_repo.upsert_documents.call_count == 3
+        assert mock_embedding_service.create_embeddings.call_count == 3
+        assert [p["synced"] for p in progresso] == [2, 4, 5]
+    
+    def test_sync_from_mongo_is_incremental(self, mock_mongo_repo, mock_chroma_repo, mock_embedding_service):
+        """Testa que só imóveis alterados são reindexados e que os removidos saem do índice"""
+        from src.app.services.indexing_service import IndexingService
+        from src.app.models import ImovelInDB
+        
+        inalterado = {"id": "507f1f77bcf86cd799439011", "titulo": "Casa", "descricao": "Igual", "especificacoes": []}
+        alterado = {"id": "507f1f77bcf86cd799439012", "titulo": "Casa", "descricao": "Nova", "especificacoes": []}
+        mock_mongo_repo.iter_imoveis.return_value = iter([inalterado, alterado])
+        mock_chroma_repo.get_metadatas.return_value = {
+            inalterado["id"]: IndexingService.build_metadata(ImovelInDB(**inalterado)),
+            alterado["id"]: {"content_hash": "hash-antigo"}
+        }
+        mock_chroma_repo.iter_ids.return_value = iter([inalterado["id"], alterado["id"], "507f1f77bcf86cd799439099"])
+        mock_embedding_service.create_embeddings.side_effect = lambda texts, batch_size=None: [[0.0]] * len(texts)
+        
+        stats = IndexingService(mock_embedding_service, mock_chroma_repo).sync_from_mongo(mock_mongo_repo)
+        
+        assert stats["synced"] == 1
+        assert stats["unchanged"] == 1
+        assert stats["deleted"] == 1
+        assert mock_chroma_repo.upsert_documents.call_args.kwargs["ids"] == [alterado["id"]]
+        mock_chroma_repo.delete_documents.assert_called_once_with(["507f1f77bcf86cd799439099"])
+    
+    def test_build_metadata_includes_typed_attributes(self):
+        """Testa que preço, quartos, área, bairro, cidade e tipo viram metadata filtrável"""
+        from src.app.services.indexing_service import IndexingService
+        from src.app.models import ImovelInDB
+        
+        imovel = ImovelInDB(
+            id="507f1f77bcf86cd799439011",
+            titulo="Apartamento no Setor Bueno",
+            descricao="Apartamento para alugar",
+            especificacoes=["R$ 2.000,00", "80m²", "3 quartos", "Setor Bueno, Goiânia - GO"]
+        )
+        
+        metadata = IndexingService.build_metadata(imovel)
+        
+        assert metadata["preco"] == 2000.0
+        assert metadata["quartos"] == 3
+        assert metadata["area_m2"] == 80.0
+        assert metadata["bairro"] == "setor bueno"
+        assert metadata["cidade"] == "goiania"
+        assert metadata["tipo"] == "apartamento"
+        assert metadata["finalidade"] == "aluguel"
+
+
+class TestExtrairAtributos:
+    """Testes do parser de atributos das especificações"""
+    
+    def test_preco_label_wins_over_other_amounts(self):
+        """Testa que o preço rotulado vence o condomínio que aparece antes"""
+        from src.app.atributos import extrair_atributos
+        
+        atributos = extrair_atributos("", "", ["Condomínio: R$ 450", "Preço: R$ 1.200.000,00"])
+        
+        assert atributos["preco"] == 1200000.0
+    
+    def test_other_costs_are_not_the_price(self):
+        """Testa que IPTU, condomínio e taxas sozinhos não viram preço"""
+        from src.app.atributos import extrair_atributos
+        
+        assert "preco" not in extrair_atributos("", "", ["Área: 30m2", "IPTU R$ 80"])
+        assert "preco" not in extrair_atributos("", "", ["Valor do condomínio: R$ 450"])
+        assert "preco" not in extrair_atributos("", "", ["Taxa de limpeza R$ 90"])
+    
+    def test_bare_amount_is_a_fallback(self):
+        """Testa que um R$ solto é o preço quando não há rótulo nem outros valores na linha"""
+        from src.app.atributos import extrair_atributos
+        
+        assert extrair_atributos("", "", ["R$ 2.000,00", "IPTU R$ 80"])["preco"] == 2000.0
+        assert extrair_atributos("", "", ["Preço: 350000"])["preco"] == 350000.0
+        assert extrair_atributos("Casa de condomínio, R$ 500.000", "", [])["preco"] == 500000.0
+    
+    @pytest.mark.parametrize("texto, esperado", [
+        ("1.200.000,00", 1200000.0),
+        ("1.234,56", 1234.56),
+        ("2,000.00", 2000.0),
+        ("350.000", 350000.0),
+        ("350000", 350000.0),
+    ])
+    def test_parse_numero_brazilian_formats(self, texto, esperado):
+        """Testa os formatos de número brasileiros e americanos"""
+        from src.app.atributos import parse_numero
+        
+        assert parse_numero(texto) == esperado
@@ -0,0 +1,271 @@
+import pytest
+from unittest.mock import Mock, patch
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../integrador/src')))
+
+import listener
+
+
+def evento(op, *ids):
+    return {"v": "1", "op": op, "ids": "[" + ", ".join(f'"{item_id}"' for item_id in ids) + "]"}
+
+
+class TestRedisListener:
+    """Testes do listener do integrador (processo único)"""
+
+    @pytest.fixture
+    def consumer(self, mock_redis):
+        with patch.object(listener.redis, "Redis", return_value=mock_redis), \
+                patch.object(listener, "Indexador") as mock_indexador_class:
+            consumer = listener.RedisListener(consumer_name="integrador-1")
+        consumer.events = Mock()
+        consumer.indexador = mock_indexador_class.return_value
+        return consumer
+
+    def test_batch_is_applied_and_acked_once(self, consumer):
+        """Testa o caminho normal: um apply do lote coalescido e um único ack"""
+        consumer.process_batch([("1-0", evento("upsert", "a")), ("2-0", evento("delete", "b"))])
+
+        consumer.indexador.apply.assert_called_once_with({"clear": False, "upsert": ["a"], "delete": ["b"], "ignored": 0})
+        consumer.events.ack.assert_called_once_with(["1-0", "2-0"])
+
+    def test_failed_batch_only_keeps_poison_entry_pending(self, consumer):
+        """Testa que, se o lote falha, só a entrada que falha de novo sozinha fica sem ack"""
+        consumer.indexador.apply.side_effect = Exception("ImovelInDB inválido")
+        consumer.indexador.apply_each.return_value = {"2-0": "ImovelInDB inválido"}
+
+        consumer.process_batch([("1-0", evento("upsert", "a")), ("2-0", evento("upsert", "b")), ("3-0", evento("delete", "c"))])
+
+        planos = consumer.indexador.apply_each.call_args.args[0]
+        assert [entry_id for entry_id, _ in planos] == ["1-0", "2-0", "3-0"]
+        assert planos[1][1]["upsert"] == ["b"]
+        consumer.events.ack.assert_called_once_with(["1-0", "3-0"])
+
+    def test_malformed_entry_is_dead_lettered(self, consumer):
+        """Testa que uma entrada ilegível vai direto para o dead letter em vez de derrubar o listener"""
+        consumer.process_batch([("1-0", {"v": "1", "op": "upsert", "ids": "{não é json"}), ("2-0", evento("upsert", "a"))])
+
+        entry_id, campos = consumer.events.dead_letter.call_args.args
+        assert entry_id == "1-0"
+        assert "error" in consumer.events.dead_letter.call_args.kwargs
+        consumer.indexador.apply.assert_called_once_with({"clear": False, "upsert": ["a"], "delete": [], "ignored": 0})
+        consumer.events.ack.assert_called_once_with(["2-0"])
+
+
+class TestShardedDispatcher:
+    """Testes do dispatcher do modo pool (acks, barreira do clear e reinício de workers), com filas em processo"""
+
+    @pytest.fixture
+    def dispatcher(self, mock_redis):
+        import queue
+        import worker_pool
+        with patch.object(listener.redis, "Redis", return_value=mock_redis), \
+                patch.object(worker_pool, "ChromaRepository"):
+            dispatcher = worker_pool.ShardedDispatcher(workers=2, consumer_name="integrador-1")
+        dispatcher.filas = [queue.Queue(maxsize=8) for _ in range(2)]
+        dispatcher.resultados = queue.Queue()
+        dispatcher.processos = [Mock(**{"is_alive.return_value": True}) for _ in range(2)]
+        dispatcher.events = Mock()
+        return dispatcher
+
+    @staticmethod
+    def ids_por_shard():
+        """Um _id que cai no worker 0 e outro no worker 1"""
+        from src.app.services.event_log import shard_for
+        ids = [f"507f1f77bcf86cd7994390{i:02d}" for i in range(50)]
+        return next(i for i in ids if shard_for(i, 2) == 0), next(i for i in ids if shard_for(i, 2) == 1)
+
+    @staticmethod
+    def resultado(indice, entry_ids, falhas=None):
+        return (indice, entry_ids, falhas or {}, {"actions": 1, "batch_ms": 1.0, "lag_ms": 1.0})
+
+    def test_ack_only_after_every_shard_succeeds(self, dispatcher):
+        """Testa que uma entrada com IDs em dois workers só recebe ack quando os dois terminam"""
+        id_0, id_1 = self.ids_por_shard()
+
+        dispatcher.process_batch([("1-0", evento("upsert", id_0, id_1))])
+        assert dispatcher.filas[0].qsize() == 1 and dispatcher.filas[1].qsize() == 1
+
+        dispatcher.resultados.put(self.resultado(0, ["1-0"]))
+        dispatcher.collect_results()
+        dispatcher.events.ack.assert_not_called()
+
+        dispatcher.resultados.put(self.resultado(1, ["1-0"]))
+        dispatcher.collect_results()
+        dispatcher.events.ack.assert_called_once_with(["1-0"])
+        assert dispatcher.pendentes == {}
+
+    def test_no_ack_when_one_shard_errors(self, dispatcher):
+        """Testa que a falha em um worker deixa a entrada sem ack (volta por claim_stale)"""
+        id_0, id_1 = self.ids_por_shard()
+
+        dispatcher.process_batch([("1-0", evento("upsert", id_0, id_1))])
+        dispatcher.resultados.put(self.resultado(0, ["1-0"]))
+        dispatcher.resultados.put(self.resultado(1, ["1-0"], {"1-0": "ImovelInDB inválido"}))
+        dispatcher.collect_results()
+
+        dispatcher.events.ack.assert_not_called()
+        assert dispatcher.pendentes == {}
+        assert dispatcher.metricas[1]["errors"] == 1
+
+    def test_clear_drains_workers_before_clearing(self, dispatcher):
+        """Testa a barreira do clear: o que veio antes termina (e recebe ack) antes do ChromaDB ser limpo"""
+        id_0, _ = self.ids_por_shard()
+        ordem = Mock()
+        dispatcher.events = ordem.events
+        dispatcher.chroma = ordem.chroma
+        # Resultado do worker 0 para a entrada anterior ao clear, lido pelo drain()
+        dispatcher.resultados.put(self.resultado(0, ["1-0"]))
+
+        dispatcher.process_batch([("1-0", evento("upsert", id_0)), ("2-0", evento("clear"))])
+
+        chamadas = [(chamada[0], chamada.args) for chamada in ordem.mock_calls
+                    if chamada[0] in ("events.ack", "chroma.clear")]
+        assert chamadas == [("events.ack", (["1-0"],)), ("chroma.clear", ()), ("events.ack", (["2-0"],))]
+        assert dispatcher.filas[0].qsize() == 1
+
+    def test_dead_worker_entries_are_dropped_and_worker_restarted(self, dispatcher):
+        """Testa que as entradas de um worker morto saem de pendentes (voltam por claim_stale) e ele é reiniciado"""
+        id_0, id_1 = self.ids_por_shard()
+        dispatcher.process_batch([("1-0", evento("upsert", id_0)), ("2-0", evento("upsert", id_1))])
+        dispatcher.processos[0].is_alive.return_value = False
+
+        with patch.object(dispatcher, "_start_worker") as mock_start:
+            dispatcher.collect_results()
+
+        assert list(dispatcher.pendentes) == ["2-0"]
+        mock_start.assert_called_once_with(0)
+        assert dispatcher.metricas[0]["restarts"] == 1
+
+    def test_in_flight_entries_are_not_reclaimed(self, dispatcher):
+        """Testa que as entradas ainda com os workers são passadas ao claim_stale"""
+        id_0, _ = self.ids_por_shard()
+        dispatcher.process_batch([("1-0", evento("upsert", id_0))])
+        dispatcher.events.claim_stale.return_value = []
+        dispatcher.events.read.return_value = []
+
+        dispatcher.next_batch()
+
+        assert list(dispatcher.events.claim_stale.call_args.kwargs["in_flight"]) == ["1-0"]
+
+    def test_worker_retries_failed_batch_per_entry(self):
+        """Testa que o worker reaplica um lote que falhou entrada por entrada e só reporta as que falham de novo"""
+        import queue
+        import worker_pool
+
+        fila, resultados = queue.Queue(), queue.Queue()
+        fila.put((0.0, [("1-0", "upsert", "a"), ("2-0", "upsert", "b"), ("2-0", "delete", "c")]))
+        fila.put(None)
+        with patch("indexador.Indexador") as mock_indexador_class, patch.object(worker_pool.signal, "signal"):
+            mock_indexador = mock_indexador_class.return_value
+            mock_indexador.apply.side_effect = Exception("ImovelInDB inválido")
+            mock_indexador.apply_each.return_value = {"2-0": "ImovelInDB inválido"}
+            worker_pool._worker_main(0, fila, resultados, batch_size=10)
+
+        indice, entry_ids, falhas, _ = resultados.get_nowait()
+        assert (indice, entry_ids, falhas) == (0, ["1-0", "2-0"], {"2-0": "ImovelInDB inválido"})
+        mock_indexador.apply_each.assert_called_once_with([
+            ("1-0", {"upsert": ["a"], "delete": []}),
+            ("2-0", {"upsert": ["b"], "delete": ["c"]})
+        ])
+
+
+class FakeChangeStream:
+    """Cursor de change stream em memória: cada alteração avança o resume token; sem alterações, o stream termina"""
+
+    def __init__(self, changes, token_inicial="t0"):
+        self.changes = list(changes)
+        self.resume_token = {"_data": token_inicial}
+        self.alive = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def try_next(self):
+        if not self.changes:
+            self.alive = False
+            return None
+        change = self.changes.pop(0)
+        self.resume_token = change["_id"]
+        return change
+
+
+def alteracao(token, operacao, item_id):
+    return {"_id": {"_data": token}, "operationType": operacao, "documentKey": {"_id": item_id}}
+
+
+class TestChangeStreamIndexer:
+    """Testes do modo change stream do integrador (resume token e ressincronização)"""
+
+    @pytest.fixture
+    def indexer(self, mock_redis):
+        import change_stream
+        tokens = {}
+        mock_redis.get.side_effect = tokens.get
+        mock_redis.set.side_effect = tokens.__setitem__
+        mock_redis.delete.side_effect = lambda chave: tokens.pop(chave, None)
+        with patch.object(change_stream, "Indexador") as mock_indexador_class:
+            mock_indexador_class.return_value.mongo.redis = mock_redis
+            indexer = change_stream.ChangeStreamIndexer(batch_size=10, flush_interval_ms=50)
+        indexer.tokens = tokens
+        return indexer
+
+    def test_token_is_saved_only_after_apply(self, indexer):
+        """Testa que o resume token só avança depois que o lote foi aplicado no ChromaDB"""
+        from bson import json_util
+        from src.app.config import CHANGE_STREAM_TOKEN_KEY
+        indexer.collection.watch.return_value = FakeChangeStream([alteracao("t1", "insert", "a"), alteracao("t2", "delete", "b")])
+        indexer.indexador.apply.side_effect = Exception("ChromaDB indisponível")
+
+        with pytest.raises(Exception):
+            indexer._watch({"_data": "t0"})
+        assert CHANGE_STREAM_TOKEN_KEY not in indexer.tokens
+
+        indexer.indexador.apply.side_effect = None
+        indexer.collection.watch.return_value = FakeChangeStream([alteracao("t1", "insert", "a"), alteracao("t2", "delete", "b")])
+        indexer._watch({"_data": "t0"})
+
+        indexer.indexador.apply.assert_called_with(
+            {"clear": False, "upsert": ["a"], "delete": ["b"], "ignored": 0}, skip_unchanged=True
+        )
+        assert json_util.loads(indexer.tokens[CHANGE_STREAM_TOKEN_KEY]) == {"_data": "t2"}
+
+    def test_first_run_saves_pre_sync_token(self, indexer):
+        """Testa que, sem token, o sync roda antes e o token salvo é o do início do stream (alterações durante o sync não se perdem)"""
+        from bson import json_util
+        from src.app.config import CHANGE_STREAM_TOKEN_KEY
+        indexer.collection.watch.return_value = FakeChangeStream([], token_inicial="t0")
+        salvos_durante_sync = []
+        indexer.resync = Mock(side_effect=lambda: salvos_durante_sync.append(dict(indexer.tokens)))
+
+        indexer._watch(None)
+
+        assert salvos_durante_sync == [{}]
+        assert json_util.loads(indexer.tokens[CHANGE_STREAM_TOKEN_KEY]) == {"_data": "t0"}
+
+    def test_history_lost_drops_token_and_resyncs(self, indexer):
+        """Testa que um token fora do oplog (códigos 280/286) é descartado e o stream reabre com ressincronização"""
+        from bson import json_util
+        from pymongo.errors import OperationFailure
+        from src.app.config import CHANGE_STREAM_TOKEN_KEY
+        indexer.tokens[CHANGE_STREAM_TOKEN_KEY] = json_util.dumps({"_data": "antigo"})
+        indexer.resync = Mock()
+
+        def watch(pipeline, start_after=None, **kwargs):
+            if start_after is not None:
+                raise OperationFailure("Resume of change stream was not possible", code=286)
+            indexer.stopping = True
+            return FakeChangeStream([], token_inicial="novo")
+        indexer.collection.watch.side_effect = watch
+
+        indexer.listen()
+
+        starts = [chamada.kwargs["start_after"] for chamada in indexer.collection.watch.call_args_list]
+        assert starts == [{"_data": "antigo"}, None]
+        indexer.resync.assert_called_once()
+        assert json_util.loads(indexer.tokens[CHANGE_STREAM_TOKEN_KEY]) == {"_data": "novo"}
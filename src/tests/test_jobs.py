@@ -0,0 +1,105 @@
+import pytest
+from unittest.mock import patch, Mock
+
+class TestJobsRoutes:
+    """Testes para as rotas de jobs em background"""
+    
+    def test_sync_in_background_returns_job_id(self, client, mock_job_service):
+        """Testa que ?background=true enfileira o sync e responde 202"""
+        mock_job_service.enqueue.return_value = "job-123"
+        
+        response = client.post("/imoveis/sync?background=true&full=true")
+        
+        assert response.status_code == 202
+        data = response.json()
+        assert data["job_id"] == "job-123"
+        assert data["kind"] == "sync"
+        assert mock_job_service.enqueue.call_args.kwargs["full"] is True
+    
+    def test_enqueue_conflict_when_job_running(self, client, mock_job_service):
+        """Testa o limite de um job ativo por tipo"""
+        mock_job_service.enqueue.return_value = None
+        mock_job_service.active_job.return_value = "job-antigo"
+        
+        response = client.delete("/imoveis/all?background=true")
+        
+        assert response.status_code == 409
+        assert "job-antigo" in response.json()["detail"]
+    
+    def test_seed_enqueues_imoveis(self, client, mock_job_service, sample_imovel):
+        """Testa a carga em massa como job"""
+        mock_job_service.enqueue.return_value = "job-seed"
+        
+        response = client.post("/imoveis/seed", json=[sample_imovel, sample_imovel])
+        
+        assert response.status_code == 202
+        assert len(mock_job_service.enqueue.call_args.kwargs["imoveis"]) == 2
+    
+    def test_read_job_status(self, client, mock_job_service):
+        """Testa a consulta de status/progresso"""
+        mock_job_service.get_status.return_value = {
+            "job_id": "job-123", "kind": "sync", "state": "PROGRESS",
+            "progress": {"synced": 10, "total": 100}, "result": None, "error": None
+        }
+        
+        response = client.get("/jobs/job-123")
+        
+        assert response.status_code == 200
+        assert response.json()["progress"]["synced"] == 10
+    
+    def test_read_job_not_found(self, client, mock_job_service):
+        """Testa job inexistente"""
+        mock_job_service.get_status.return_value = None
+        
+        response = client.get("/jobs/inexistente")
+        
+        assert response.status_code == 404
+    
+    def test_cancel_job(self, client, mock_job_service):
+        """Testa a solicitação de cancelamento"""
+        mock_job_service.cancel.return_value = True
+        
+        response = client.delete("/jobs/job-123")
+        
+        assert response.status_code == 200
+        mock_job_service.cancel.assert_called_once_with("job-123")
+
+
+class TestClearJob:
+    """Testes do job que remove todos os imóveis"""
+    
+    def _run(self, mock_job_service):
+        from src.app import tasks
+        
+        with patch.object(tasks, "JobService", return_value=mock_job_service), \
+             patch.object(tasks, "get_redis_client"), patch.object(tasks, "get_search_cache"), \
+             patch.object(tasks, "get_mongo_repo") as mock_get_mongo, \
+             patch.object(tasks, "ChromaRepository") as mock_chroma_cls, \
+             patch.object(tasks.clear_imoveis_job, "update_state"):
+            mock_get_mongo.return_value.delete_all_imoveis.return_value = 3
+            try:
+                resultado = tasks.clear_imoveis_job.apply(task_id="job-123").get(propagate=False)
+            finally:
+                mock_job_service.release.assert_called_once_with(tasks.JOB_CLEAR, "job-123")
+        return resultado, mock_get_mongo.return_value, mock_chroma_cls
+    
+    def test_clear_deletes_mongo_and_chroma(self, mock_job_service):
+        """Testa que o job apaga o MongoDB e o ChromaDB do CHROMA_PATH configurado"""
+        from src.app.config import CHROMA_PATH
+        
+        resultado, mock_mongo, mock_chroma_cls = self._run(mock_job_service)
+        
+        assert resultado == {"deleted_count": 3}
+        mock_mongo.delete_all_imoveis.assert_called_once()
+        mock_chroma_cls.assert_called_once_with(path=CHROMA_PATH)
+        mock_chroma_cls.return_value.clear.assert_called_once()
+    
+    def test_cancel_before_delete_keeps_both_stores(self, mock_job_service):
+        """Testa que o cancelamento é verificado antes do MongoDB, nunca entre os dois apagamentos"""
+        from src.app.services.job_service import JobCancelled
+        mock_job_service.check_cancelled.side_effect = JobCancelled("job-123")
+        
+        _, mock_mongo, mock_chroma_cls = self._run(mock_job_service)
+        
+        mock_mongo.delete_all_imoveis.assert_not_called()
+        mock_chroma_cls.return_value.clear.assert_not_called()
@@ -22,4 +22,20 @@ class TestMainRoute:
         data = response.json()
         assert "openapi" in data
         assert data["info"]["title"] == "SPD Imóveis API"
-        assert data["info"]["description"] == "API de busca semântica de imóveis"
\ No newline at end of file
+        assert data["info"]["description"] == "API de busca semântica de imóveis"
+    def test_embedding_health_endpoint(self, client):
+        """Testa o endpoint de status do modelo de embeddings"""
+        response = client.get("/health/embedding")
+        assert response.status_code == 200
+        data = response.json()
+        assert "ready" in data
+        assert data["model_name"] == "all-MiniLM-L6-v2"
+    
+    def test_indexes_health_endpoint(self, client, mock_mongo_repo):
+        """Testa o relatório de índices do MongoDB"""
+        mock_mongo_repo.index_report.return_value = {
+            "cidades": {"missing": ["estado_nome"], "undeclared": [], "unused": [], "accesses": {}}
+        }
+        response = client.get("/health/indexes")
+        assert response.status_code == 200
+        assert response.json()["cidades"]["missing"] == ["estado_nome"]
@@ -1,5 +1,5 @@
 import pytest
-from unittest.mock import patch, Mock
+from unittest.mock import patch, Mock, AsyncMock
 
 class TestSearchRoutes:
     """Testes para as rotas de busca"""
@@ -12,56 +12,44 @@ class TestSearchRoutes:
         assert data["message"] == "Search endpoint is working"
         assert data["test"] is True
     
-    @patch('src.app.routers.search.MongoRepository')
     @patch('src.app.routers.search.ChromaRepository')
     @patch('src.app.routers.search.SearchService')
     def test_search_imoveis_success(self, mock_search_class, mock_chroma_class, 
-                                   mock_mongo_class, client, sample_imovel_in_db):
+                                   client, mock_mongo_repo, sample_imovel_in_db):
         """Testa busca semântica de imóveis"""
-        mock_mongo = Mock()
-        mock_mongo_class.return_value = mock_mongo
+        mock_mongo = mock_mongo_repo
         
         mock_chroma = Mock()
         mock_chroma_class.return_value = mock_chroma
         
         mock_search = Mock()
-        mock_search.search.return_value = {
-            "results": [sample_imovel_in_db],
-            "metadata": {
-                "query": "casa com piscina",
-                "total_results": 1
-            }
-        }
+        mock_search.timings = {}
+        mock_search.asearch = AsyncMock(return_value=[sample_imovel_in_db])
         mock_search_class.return_value = mock_search
         
         response = client.get("/search/?query=casa com piscina&n_results=5")
         
         assert response.status_code == 200
         data = response.json()
-        assert "results" in data
         assert len(data["results"]) == 1
         assert data["results"][0]["id"] == sample_imovel_in_db["id"]
+        assert data["total_found"] == 1
+        assert data["cached"] is False
+        assert data["search_type"] == "semantic_cosine_similarity"
     
-    @patch('src.app.routers.search.MongoRepository')
     @patch('src.app.routers.search.ChromaRepository')
     @patch('src.app.routers.search.SearchService')
     def test_search_imoveis_no_results(self, mock_search_class, mock_chroma_class, 
-                                      mock_mongo_class, client):
+                                      client, mock_mongo_repo):
         """Testa busca sem resultados"""
-        mock_mongo = Mock()
-        mock_mongo_class.return_value = mock_mongo
+        mock_mongo = mock_mongo_repo
         
         mock_chroma = Mock()
         mock_chroma_class.return_value = mock_chroma
         
         mock_search = Mock()
-        mock_search.search.return_value = {
-            "results": [],
-            "metadata": {
-                "query": "castelo medieval",
-                "total_results": 0
-            }
-        }
+        mock_search.timings = {}
+        mock_search.asearch = AsyncMock(return_value=[])
         mock_search_class.return_value = mock_search
         
         response = client.get("/search/?query=castelo medieval")
@@ -69,11 +57,43 @@ class TestSearchRoutes:
         assert response.status_code == 200
         data = response.json()
         assert data["results"] == []
-        assert data["metadata"]["total_results"] == 0
+        assert data["total_found"] == 0
+        assert data["cached"] is False
+        assert data["search_type"] == "semantic_cosine_similarity"
+    
+    @patch('src.app.routers.search.ChromaRepository')
+    def test_hydration_error_is_not_cached(self, mock_chroma_class, client, mock_async_mongo_repo, mock_search_cache):
+        """Testa que uma falha na hidratação no MongoDB não vira uma resposta vazia guardada no cache"""
+        mock_chroma_class.return_value.query.return_value = {"ids": [["507f1f77bcf86cd799439011"]], "distances": [[0.1]]}
+        mock_async_mongo_repo.get_imoveis_by_ids.side_effect = Exception("MongoDB indisponível")
+        mock_async_mongo_repo.search_imoveis_text.side_effect = Exception("MongoDB indisponível")
+        
+        response = client.get("/search/?query=casa&n_results=5")
+        
+        assert response.status_code == 200
+        assert "error" in response.json()
+        mock_search_cache.set.assert_not_called()
+    
+    @patch('src.app.routers.search.ChromaRepository')
+    def test_search_falls_back_to_text_index(self, mock_chroma_class, client, mock_async_mongo_repo, sample_imovel_in_db):
+        """Testa que, com o ChromaDB fora do ar, a busca usa o índice de texto com projeção e limite"""
+        mock_chroma_class.side_effect = Exception("ChromaDB indisponível")
+        mock_async_mongo_repo.search_imoveis_text.return_value = [sample_imovel_in_db]
+        
+        response = client.get("/search/?query=setor bueno&n_results=5&cidade=Goiânia")
+        
+        assert response.status_code == 200
+        data = response.json()
+        assert data["search_type"] == "textual_fallback"
+        assert data["total_found"] == 1
+        args, kwargs = mock_async_mongo_repo.search_imoveis_text.call_args
+        assert args == ("setor bueno", 5)
+        assert kwargs["filtro"] == {"cidade": "goiania"}
+        assert "titulo" in kwargs["projection"]
     
     @patch('src.app.routers.search.LLMRerankingService')
-    def test_rerank_with_feedback_success(self, mock_llm_class, client, sample_imovel_in_db):
-        """Testa re-ranking com feedback do usuário"""
+    def test_rerank_with_feedback_success(self, mock_llm_class, client, mock_mongo_repo, sample_imovel_in_db):
+        """Testa re-ranking com feedback do usuário (selecionados hidratados com uma única consulta $in)"""
         mock_llm = Mock()
         mock_llm.rerank_properties.return_value = {
             "decision_reasoning": "Selecionei imóveis similares aos curtidos",
@@ -98,17 +118,20 @@ class TestSearchRoutes:
             ]
         }
         
+        mock_mongo_repo.get_imoveis_by_ids.return_value = [dict(rerank_data["remaining_properties"][0])]
+        
         response = client.post("/rerank/", json=rerank_data)
         
         assert response.status_code == 200
         data = response.json()
-        assert "decision_reasoning" in data
-        assert "selected_properties" in data
-        assert len(data["selected_properties"]) == 1
-        assert data["selected_properties"][0]["id"] == "507f1f77bcf86cd799439014"
+        assert data["decision_reasoning"] == "Selecionei imóveis similares aos curtidos"
+        assert data["total_found"] == 1
+        assert data["reranked_results"][0]["id"] == "507f1f77bcf86cd799439014"
+        assert data["reranked_results"][0]["llm_reason"] == "Similar ao que foi curtido"
+        mock_mongo_repo.get_imoveis_by_ids.assert_called_once_with(["507f1f77bcf86cd799439014"])
     
     @patch('src.app.routers.search.LLMRerankingService')
-    def test_rerank_with_llm_failure(self, mock_llm_class, client, sample_imovel_in_db):
+    def test_rerank_with_llm_failure(self, mock_llm_class, client, mock_mongo_repo, sample_imovel_in_db):
         """Testa re-ranking quando LLM falha (usa fallback)"""
         mock_llm = Mock()
         mock_llm.rerank_properties.return_value = {
@@ -134,8 +157,237 @@ class TestSearchRoutes:
             ]
         }
         
+        mock_mongo_repo.get_imoveis_by_ids.return_value = [dict(rerank_data["remaining_properties"][0])]
+        
         response = client.post("/rerank/", json=rerank_data)
         
         assert response.status_code == 200
         data = response.json()
-        assert "Fallback" in data["selected_properties"][0]["reason"] or "IA não configurada" in data["decision_reasoning"]
\ No newline at end of file
+        assert "IA não configurada" in data["decision_reasoning"]
+        assert data["reranked_results"][0]["llm_reason"] == "Fallback conservador - LLM indisponível"
+
+class TestSearchCache:
+    """Testes do cache de respostas do /search/"""
+    
+    @patch('src.app.routers.search.SearchService')
+    def test_search_served_from_cache(self, mock_search_class, client, mock_search_cache, sample_imovel_in_db):
+        """Testa que uma busca em cache não toca ChromaDB nem MongoDB"""
+        mock_search_cache.index_version.return_value = 3
+        mock_search_cache.get.return_value = {"query": "casa", "results": [sample_imovel_in_db], "total_found": 1}
+        
+        response = client.get("/search/?query=casa&n_results=5")
+        
+        assert response.status_code == 200
+        data = response.json()
+        assert data["cached"] is True
+        assert data["total_found"] == 1
+        mock_search_class.assert_not_called()
+        mock_search_cache.get.assert_called_once_with("casa", 5, {"mode": "semantic"}, 3)
+    
+    @patch('src.app.routers.search.SearchService')
+    def test_cache_key_follows_embedding_cache_key(self, mock_search_class, client, mock_search_cache, mock_embedding_service):
+        """Testa que a chave do cache de respostas é a do cache de embeddings (modelo cased: a caixa conta)"""
+        mock_embedding_service.cache_key.side_effect = lambda text: " ".join(text.split())
+        mock_search_cache.index_version.return_value = 3
+        mock_search_cache.get.return_value = {"query": "Casa", "results": [], "total_found": 0}
+        
+        client.get("/search/?query=Casa&n_results=5")
+        
+        mock_search_cache.get.assert_called_once_with("Casa", 5, {"mode": "semantic"}, 3)
+    
+    def test_version_bump_invalidates_entries(self):
+        """Testa que escritas (nova versão do índice) tornam as entradas antigas inalcançáveis"""
+        from src.app.services.search_cache import SearchCache
+        
+        versao = {"valor": 0}
+        mock_redis = Mock()
+        mock_redis.get.side_effect = lambda key: versao["valor"]
+        mock_redis.incr.side_effect = lambda key: versao.update(valor=versao["valor"] + 1)
+        cache = SearchCache(mock_redis, max_size=10, ttl_seconds=60)
+        
+        cache.set("casa com piscina", 5, None, cache.index_version(), {"total_found": 1})
+        assert cache.get("casa com piscina", 5, None, cache.index_version()) == {"total_found": 1}
+        
+        cache.bump_version()
+        assert cache.get("casa com piscina", 5, None, cache.index_version()) is None
+
+class TestSearchService:
+    """Testes unitários do SearchService"""
+    
+    def test_search_hydrates_in_single_query_preserving_rank(self, mock_chroma_repo, mock_async_mongo_repo,
+                                                             mock_embedding_service):
+        """Testa que a hidratação usa uma única consulta e mantém a ordem do ChromaDB"""
+        import asyncio
+        from src.app.services.search_service import SearchService
+        
+        mock_chroma_repo.query.return_value = {
+            "ids": [["id-b", "id-a"]],
+            "distances": [[0.1, 0.4]]
+        }
+        mock_async_mongo_repo.get_imoveis_by_ids.return_value = [
+            {"id": "id-b", "titulo": "Casa B"},
+            {"id": "id-a", "titulo": "Casa A"}
+        ]
+        
+        service = SearchService(mock_embedding_service, mock_chroma_repo, mock_async_mongo_repo)
+        results = asyncio.run(service.asearch("casa com piscina", n_results=2))
+        
+        mock_async_mongo_repo.get_imoveis_by_ids.assert_awaited_once()
+        assert mock_async_mongo_repo.get_imoveis_by_ids.call_args[0][0] == ["id-b", "id-a"]
+        assert [r["id"] for r in results] == ["id-b", "id-a"]
+        assert results[0]["similarity_score"] == pytest.approx(0.9)
+        assert results[1]["similarity_score"] == pytest.approx(0.6)
+    
+    def test_asearch_uses_async_hydration(self, mock_chroma_repo, mock_async_mongo_repo, mock_embedding_service):
+        """Testa o caminho assíncrono: encode no executor e hidratação pelo MongoDB assíncrono"""
+        import asyncio
+        from src.app.services.search_service import SearchService
+        
+        mock_chroma_repo.query.return_value = {"ids": [["id-a"]], "distances": [[0.25]]}
+        mock_async_mongo_repo.get_imoveis_by_ids.return_value = [{"id": "id-a", "titulo": "Casa A"}]
+        
+        service = SearchService(mock_embedding_service, mock_chroma_repo, mock_async_mongo_repo)
+        results = asyncio.run(service.asearch("casa", n_results=1))
+        
+        mock_embedding_service.aembed_query.assert_awaited_once_with("casa")
+        mock_async_mongo_repo.get_imoveis_by_ids.assert_awaited_once()
+        assert results[0]["similarity_score"] == pytest.approx(0.75)
+    
+    def test_build_where_pushes_filters_to_chroma(self):
+        """Testa a conversão dos filtros em where do ChromaDB"""
+        from src.app.services.search_service import SearchService
+        from src.app.models import SearchFilters
+        
+        assert SearchService.build_where(SearchFilters()) is None
+        assert SearchService.build_where(SearchFilters(quartos_min=3)) == {"quartos": {"$gte": 3}}
+        assert SearchService.build_where(SearchFilters(preco_max=2000, cidade="Goiânia")) == {
+            "$and": [{"preco": {"$lte": 2000}}, {"cidade": {"$eq": "goiania"}}]
+        }
+    
+    def test_search_route_forwards_filters(self, client, mock_search_cache):
+        """Testa que os filtros da rota chegam ao ChromaDB e entram na chave do cache"""
+        with patch('src.app.routers.search.ChromaRepository') as mock_chroma_class:
+            mock_chroma_class.return_value.query.return_value = {"ids": [[]], "distances": [[]]}
+            
+            response = client.get("/search/?query=apartamento&quartos_min=3&preco_max=2000")
+        
+        assert response.status_code == 200
+        assert response.json()["filters"] == {"preco_max": 2000.0, "quartos_min": 3}
+        where = mock_chroma_class.return_value.query.call_args.kwargs["where"]
+        assert where == {"$and": [{"preco": {"$lte": 2000.0}}, {"quartos": {"$gte": 3}}]}
+    
+    def test_reciprocal_rank_fusion(self):
+        """Testa que documentos bem colocados nos dois rankings sobem na fusão"""
+        from src.app.services.search_service import SearchService
+        
+        fused = SearchService.reciprocal_rank_fusion([["a", "b", "c"], ["c", "a", "d"]], k=60)
+        
+        assert [imovel_id for imovel_id, _ in fused] == ["a", "c", "b", "d"]
+        assert fused[0][1] == pytest.approx(1 / 61 + 1 / 62)
+    
+    def test_asearch_hybrid_runs_both_rankings(self, mock_chroma_repo, mock_async_mongo_repo, mock_embedding_service):
+        """Testa o modo híbrido: ChromaDB e índice de texto consultados e fundidos por RRF"""
+        import asyncio
+        from src.app.services.search_service import SearchService
+        
+        mock_chroma_repo.query.return_value = {"ids": [["id-a", "id-b"]], "distances": [[0.1, 0.2]]}
+        mock_async_mongo_repo.text_search_ids = AsyncMock(return_value=[("id-b", 2.5), ("id-c", 1.0)])
+        mock_async_mongo_repo.get_imoveis_by_ids.side_effect = lambda ids, projection=None: [{"id": i} for i in ids]
+        
+        service = SearchService(mock_embedding_service, mock_chroma_repo, mock_async_mongo_repo)
+        results = asyncio.run(service.asearch("rua 10", n_results=2, mode="hybrid"))
+        
+        assert [r["id"] for r in results] == ["id-b", "id-a"]
+        assert results[0]["lexical_score"] == 2.5
+        assert "fusion_score" in results[0]
+        assert mock_chroma_repo.query.call_args.kwargs["n_results"] == 6
+        assert "lexical_ms" in service.timings and "chroma_ms" in service.timings
+
+class TestEmbeddingService:
+    """Testes unitários do cache de consultas do EmbeddingService"""
+    
+    @patch('src.app.services.embedding_service.SentenceTransformer')
+    def test_embed_query_uses_lru_cache(self, mock_model_class):
+        """Testa que consultas repetidas (com caixa/espaços diferentes) não passam pelo modelo de novo"""
+        import numpy as np
+        from src.app.services.embedding_service import EmbeddingService
+        
+        mock_model_class.return_value.encode.return_value = np.array([[0.1, 0.2, 0.3]])
+        mock_model_class.return_value.tokenizer.do_lower_case = True
+        service = EmbeddingService(cache_size=2, cache_ttl_seconds=60)
+        
+        primeiro = service.embed_query("Casa com piscina")
+        segundo = service.embed_query("  casa   com PISCINA ")
+        
+        assert primeiro == segundo
+        assert mock_model_class.return_value.encode.call_count == 1
+        stats = service.cache_stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+    
+    @patch('src.app.services.embedding_service.SentenceTransformer')
+    def test_embed_query_keeps_case_for_cased_models(self, mock_model_class):
+        """Testa que o texto original é o que vai para o modelo e que, em modelos cased, a caixa separa as entradas do cache"""
+        import numpy as np
+        from src.app.services.embedding_service import EmbeddingService
+        
+        mock_model_class.return_value.encode.return_value = np.array([[0.1, 0.2, 0.3]])
+        mock_model_class.return_value.tokenizer.do_lower_case = False
+        service = EmbeddingService(cache_size=2, cache_ttl_seconds=60, microbatch_max_wait_ms=0)
+        
+        service.embed_query("Casa em Goiânia")
+        service.embed_query("casa em goiânia")
+        
+        textos = [chamada.args[0] for chamada in mock_model_class.return_value.encode.call_args_list]
+        assert textos == [["Casa em Goiânia"], ["casa em goiânia"]]
+    
+    @patch('src.app.services.embedding_service.SentenceTransformer')
+    def test_embed_query_shares_hits_through_redis(self, mock_model_class):
+        """Testa a camada compartilhada no Redis entre workers"""
+        import json
+        from src.app.services.embedding_service import EmbeddingService
+        
+        mock_redis = Mock()
+        mock_redis.get.return_value = json.dumps([0.5, 0.5])
+        service = EmbeddingService(redis_client=mock_redis)
+        
+        assert service.embed_query("casa com piscina") == [0.5, 0.5]
+        mock_model_class.return_value.encode.assert_not_called()
+        assert service.cache_stats()["redis_hits"] == 1
+    
+    def test_query_batcher_groups_concurrent_encodes(self):
+        """Testa que consultas concorrentes viram um único encode e cada chamador recebe o seu vetor"""
+        from concurrent.futures import ThreadPoolExecutor
+        from src.app.services.query_batcher import QueryBatcher
+        
+        lotes = []
+        def encode(texts):
+            lotes.append(list(texts))
+            return [[float(len(text))] for text in texts]
+        
+        batcher = QueryBatcher(encode, max_wait_ms=200, max_batch_size=4)
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            resultados = list(pool.map(batcher.encode, ["a", "bb", "ccc", "dddd"]))
+        
+        assert resultados == [[1.0], [2.0], [3.0], [4.0]]
+        assert len(lotes) == 1
+        assert batcher.stats()["batch_size_histogram"] == {4: 1}
+    
+    def test_query_batcher_survives_cancelled_futures(self):
+        """Testa que uma consulta cancelada (request abortado) sai do lote e não derruba a thread do batcher"""
+        import time
+        from src.app.services.query_batcher import QueryBatcher
+        
+        lotes = []
+        def encode(texts):
+            lotes.append(list(texts))
+            return [[float(len(text))] for text in texts]
+        
+        batcher = QueryBatcher(encode, max_wait_ms=100, max_batch_size=4)
+        cancelada = batcher.submit("abortada")
+        assert cancelada.cancel()
+        time.sleep(0.3)
+        
+        assert batcher.submit("casa").result(timeout=2) == [4.0]
+        assert batcher._thread.is_alive()
+        assert lotes == [["casa"]]
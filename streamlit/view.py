@@ -13,7 +13,7 @@ st.set_page_config(page_title="SPD Imóveis", page_icon="🏠", layout="wide")
 def get_preview_imoveis() -> List[Dict[str, Any]]:
     """Busca 5 imóveis de preview"""
     try:
-        response = requests.get(f"{FASTAPI_BASE_URL}/imoveis/", timeout=5)
+        response = requests.get(f"{FASTAPI_BASE_URL}/imoveis/", params={"limit": 5}, timeout=5)
         if response.status_code == 200:
             data = response.json()
             if isinstance(data, list):
@@ -835,7 +835,8 @@ def main():
         with tab1:
             st.subheader("Lista de Corretores")
             try:
-                response = requests.get(f"{FASTAPI_BASE_URL}/corretores/")
+                # Nomes das cidades atendidas vêm na mesma resposta ($lookup na API)
+                response = requests.get(f"{FASTAPI_BASE_URL}/corretores/", params={"expand": "cidades"})
                 if response.status_code == 200:
                     corretores = response.json()
                     
@@ -853,6 +854,10 @@ def main():
                                     if corretor.get('especialidades'):
                                         st.write(f"🎯 Especialidades: {', '.join(corretor['especialidades'])}")
                                     
+                                    if corretor.get('cidades'):
+                                        nomes_cidades = [f"{c['nome']} - {c['estado']}" for c in corretor['cidades']]
+                                        st.write(f"🏙️ Cidades: {', '.join(nomes_cidades)}")
+                                    
                                     status = "✅ Ativo" if corretor.get('ativo', True) else "❌ Inativo"
                                     st.write(f"Status: {status}")
                                 